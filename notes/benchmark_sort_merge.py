@@ -0,0 +1,56 @@
+from __future__ import absolute_import, print_function, division
+
+
+# Compare the k-way merge used to combine sorted chunks in petl.sort() and
+# petl.mergesort() with the previous implementations (rows wrapped in _Keyed
+# for forward merges, shortlist min/max for reverse merges).
+#
+#   $ python notes/benchmark_sort_merge.py [nrows]
+
+import sys
+import random
+import timeit
+from collections import deque
+
+
+from petl.comparison import sortable_itemgetter
+from petl.transform.sorts import _mergesorted, _heapqmergesorted, \
+    _shortlistmergesorted
+
+
+def runs(nrows, nruns, seed=42):
+    rnd = random.Random(seed)
+    rows = [(rnd.randint(0, nrows), 'x%s' % i) for i in range(nrows)]
+    size = max(1, nrows // nruns)
+    chunks = [sorted(rows[i:i+size]) for i in range(0, nrows, size)]
+    return chunks
+
+
+def consume(it):
+    deque(it, maxlen=0)
+
+
+def main(nrows=200000):
+    getkey = sortable_itemgetter([(int,)], 0)
+    print('%s rows' % nrows)
+    print('%8s %8s %10s %10s %8s' % ('runs', 'reverse', 'old (s)', 'new (s)',
+                                     'speedup'))
+    for nruns in 64, 512, 4096:
+        chunks = runs(nrows, nruns)
+        for reverse in False, True:
+            chunkset = [list(reversed(c)) for c in chunks] if reverse \
+                else chunks
+            if reverse:
+                old = lambda: consume(_shortlistmergesorted(getkey, True,
+                                                            *chunkset))
+            else:
+                old = lambda: consume(_heapqmergesorted(getkey, *chunkset))
+            new = lambda: consume(_mergesorted(getkey, reverse, *chunkset))
+            told = min(timeit.repeat(old, number=1, repeat=1))
+            tnew = min(timeit.repeat(new, number=1, repeat=3))
+            print('%8s %8s %10.3f %10.3f %7.1fx' % (nruns, reverse, told,
+                                                    tnew, told / tnew))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,260 @@
+from __future__ import absolute_import, print_function, division
+
+
+import math
+
+
+class _Nothing(object):
+    # state of aggregators which have seen no values yet, N.B., the class
+    # itself is used so it is still the same object after pickling
+    pass
+
+
+class Aggregator(object):
+    """Base class for incremental aggregators, which can be used wherever
+    :func:`petl.transform.reductions.aggregate` accepts an aggregation
+    function. An aggregator computes its result from a state, which is
+    created by ``init()``, updated with each value in turn by
+    ``update(state, value)`` (which returns the new state), combined with the
+    state for a later sequence of values by ``merge(state, other)`` (which
+    also returns the new state), and turned into the result by
+    ``finalize(state)``. States must be picklable.
+
+    When every aggregation is an aggregator, :func:`aggregate` updates the
+    states as it reads each group, rather than holding the group's rows in
+    memory. Aggregators are also callable, like an aggregation function,
+    e.g.::
+
+        >>> from petl.aggregators import Mean
+        >>> Mean()([1, 2, 3, 4])
+        2.5
+
+    """
+
+    def init(self):
+        raise NotImplementedError
+
+    def update(self, state, value):
+        raise NotImplementedError
+
+    def merge(self, state, other):
+        raise NotImplementedError
+
+    def finalize(self, state):
+        return state
+
+    def __call__(self, values):
+        update = self.update
+        state = self.init()
+        for v in values:
+            state = update(state, v)
+        return self.finalize(state)
+
+    def __repr__(self):
+        return '%s()' % type(self).__name__
+
+
+class Count(Aggregator):
+    """Count values, like :func:`len`."""
+
+    def init(self):
+        return 0
+
+    def update(self, state, value):
+        return state + 1
+
+    def merge(self, state, other):
+        return state + other
+
+
+class Sum(Aggregator):
+    """Add up values, like :func:`sum`."""
+
+    def init(self):
+        return 0
+
+    def update(self, state, value):
+        return state + value
+
+    def merge(self, state, other):
+        return state + other
+
+
+class Mean(Aggregator):
+    """Arithmetic mean of values, or `None` if there are none."""
+
+    def init(self):
+        return 0, 0
+
+    def update(self, state, value):
+        return state[0] + 1, state[1] + value
+
+    def merge(self, state, other):
+        return state[0] + other[0], state[1] + other[1]
+
+    def finalize(self, state):
+        n, total = state
+        if n == 0:
+            return None
+        return total / n
+
+
+class Min(Aggregator):
+    """Smallest value, like :func:`min` (the first of equal values), or `None`
+    if there are none."""
+
+    def init(self):
+        return _Nothing
+
+    def update(self, state, value):
+        if state is _Nothing or value < state:
+            return value
+        return state
+
+    def merge(self, state, other):
+        if state is _Nothing or (other is not _Nothing and other < state):
+            return other
+        return state
+
+    def finalize(self, state):
+        return None if state is _Nothing else state
+
+
+class Max(Aggregator):
+    """Largest value, like :func:`max` (the first of equal values), or `None`
+    if there are none."""
+
+    def init(self):
+        return _Nothing
+
+    def update(self, state, value):
+        if state is _Nothing or value > state:
+            return value
+        return state
+
+    def merge(self, state, other):
+        if state is _Nothing or (other is not _Nothing and other > state):
+            return other
+        return state
+
+    def finalize(self, state):
+        return None if state is _Nothing else state
+
+
+class First(Aggregator):
+    """First value, or `None` if there are none."""
+
+    def init(self):
+        return _Nothing
+
+    def update(self, state, value):
+        return value if state is _Nothing else state
+
+    def merge(self, state, other):
+        return other if state is _Nothing else state
+
+    def finalize(self, state):
+        return None if state is _Nothing else state
+
+
+class Last(Aggregator):
+    """Last value, or `None` if there are none."""
+
+    def init(self):
+        return _Nothing
+
+    def update(self, state, value):
+        return value
+
+    def merge(self, state, other):
+        return state if other is _Nothing else other
+
+    def finalize(self, state):
+        return None if state is _Nothing else state
+
+
+class Variance(Aggregator):
+    """Variance of values, divided by the number of values less `ddof`, so by
+    default the sample variance, like :func:`statistics.variance`. Computed
+    with Welford's method, which is numerically stable. The result is `None`
+    if there are no more than `ddof` values. If `sqrt` is True the result is
+    the standard deviation."""
+
+    def __init__(self, ddof=1, sqrt=False):
+        self.ddof = ddof
+        self.sqrt = sqrt
+
+    def __repr__(self):
+        return 'Variance(ddof=%r, sqrt=%r)' % (self.ddof, self.sqrt)
+
+    def init(self):
+        # count, mean and sum of squared differences from the mean
+        return 0, 0.0, 0.0
+
+    def update(self, state, value):
+        n, mean, m2 = state
+        n += 1
+        delta = value - mean
+        mean += delta / n
+        return n, mean, m2 + delta * (value - mean)
+
+    def merge(self, state, other):
+        n1, mean1, m21 = state
+        n2, mean2, m22 = other
+        n = n1 + n2
+        if n == 0:
+            return state
+        delta = mean2 - mean1
+        return (n, mean1 + delta * n2 / n,
+                m21 + m22 + delta * delta * n1 * n2 / n)
+
+    def finalize(self, state):
+        n, _, m2 = state
+        if n <= self.ddof:
+            return None
+        var = m2 / (n - self.ddof)
+        return math.sqrt(var) if self.sqrt else var
+
+
+class CountDistinct(Aggregator):
+    """Number of distinct values. N.B., the distinct values are held in
+    memory."""
+
+    def init(self):
+        return set()
+
+    def update(self, state, value):
+        state.add(value)
+        return state
+
+    def merge(self, state, other):
+        state |= other
+        return state
+
+    def finalize(self, state):
+        return len(state)
+
+
+class StrJoin(Aggregator):
+    """Join values as strings separated by `sep`, like
+    :func:`petl.util.misc.strjoin`."""
+
+    def __init__(self, sep=', '):
+        self.sep = sep
+
+    def __repr__(self):
+        return 'StrJoin(%r)' % self.sep
+
+    def init(self):
+        return []
+
+    def update(self, state, value):
+        state.append(str(value))
+        return state
+
+    def merge(self, state, other):
+        state.extend(other)
+        return state
+
+    def finalize(self, state):
+        return self.sep.join(state)
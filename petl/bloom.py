@@ -0,0 +1,140 @@
+from __future__ import absolute_import, print_function, division
+
+
+import math
+import logging
+import operator
+from petl.compat import next
+
+
+from petl.errors import ArgumentError
+from petl.util.base import asindices
+from petl.spill import parsesize
+import petl.config as config
+
+
+logger = logging.getLogger(__name__)
+debug = logger.debug
+
+
+_mask64 = (1 << 64) - 1
+
+
+def _mix(h):
+    # spread the bits of a hash value, hashes of small ints are the ints
+    # themselves so nearby keys would otherwise set nearby bits
+    h = ((h & _mask64) * 0x9E3779B97F4A7C15) & _mask64
+    h ^= h >> 31
+    h = (h * 0xBF58476D1CE4E5B9) & _mask64
+    return h ^ (h >> 29)
+
+
+class BloomFilter(object):
+    """Probabilistic set of values, which can say for certain that a value
+    was never added, but may wrongly report that a value was added with a
+    probability of about `error_rate` once `capacity` values have been
+    added. Values are hashed with :func:`hash`, so values which compare equal
+    (e.g., ``1`` and ``1.0``) are treated alike.
+
+    The filter uses no more than `maxbytes` bytes (an int or a string such as
+    ``'16MB'``), at the cost of a higher error rate if the capacity requires
+    more. If `error_rate` or `maxbytes` is `None`, the value of
+    `petl.config.bloom_error_rate` or `petl.config.bloom_maxbytes` is used.
+
+    If an unhashable value is added the filter can no longer exclude
+    anything. The number of values tested with ``in`` which may have been
+    added and which were definitely not added are counted in the `hits` and
+    `misses` attributes.
+
+    """
+
+    def __init__(self, capacity, error_rate=None, maxbytes=None):
+        if error_rate is None:
+            error_rate = config.bloom_error_rate
+        if maxbytes is None:
+            maxbytes = config.bloom_maxbytes
+        maxbytes = parsesize(maxbytes)
+        if not 0 < error_rate < 1:
+            raise ArgumentError('error_rate must be between 0 and 1, found %r'
+                                % error_rate)
+        capacity = max(1, capacity)
+        nbits = int(math.ceil(-capacity * math.log(error_rate)
+                              / math.log(2) ** 2))
+        if maxbytes is not None:
+            nbits = min(nbits, maxbytes * 8)
+        self.nbits = max(64, nbits)
+        self.nhashes = max(1, int(round(self.nbits / capacity
+                                        * math.log(2))))
+        self.bits = bytearray((self.nbits + 7) // 8)
+        self.capacity = capacity
+        self.saturated = False
+        self.hits = 0
+        self.misses = 0
+        debug('bloom filter with %s bits, %s hashes for %s values',
+              self.nbits, self.nhashes, capacity)
+
+    def __repr__(self):
+        return 'BloomFilter(capacity=%r, nbits=%r, nhashes=%r, hits=%r, ' \
+               'misses=%r)' % (self.capacity, self.nbits, self.nhashes,
+                               self.hits, self.misses)
+
+    def _indices(self, value):
+        h = _mix(hash(value))
+        h1 = h & 0xffffffff
+        h2 = (h >> 32) | 1
+        nbits = self.nbits
+        return [(h1 + i * h2) % nbits for i in range(self.nhashes)]
+
+    def add(self, value):
+        try:
+            indices = self._indices(value)
+        except TypeError:
+            # can't tell where an unhashable value would have been put
+            self.saturated = True
+            return
+        bits = self.bits
+        for i in indices:
+            bits[i >> 3] |= 1 << (i & 7)
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value):
+        if self.saturated:
+            self.hits += 1
+            return True
+        try:
+            h = _mix(hash(value))
+        except TypeError:
+            self.hits += 1
+            return True
+        # N.B., inlined from _indices so most misses return after one or two
+        # probes
+        h1 = h & 0xffffffff
+        h2 = (h >> 32) | 1
+        bits = self.bits
+        nbits = self.nbits
+        for _ in range(self.nhashes):
+            i = h1 % nbits
+            if not bits[i >> 3] & (1 << (i & 7)):
+                self.misses += 1
+                return False
+            h1 += h2
+        self.hits += 1
+        return True
+
+
+def keybloomfilter(table, key, error_rate=None, maxbytes=None):
+    """Construct a :class:`BloomFilter` holding the values of the given `key`
+    field or fields in `table`. The table is iterated twice, once to count
+    the rows so the filter can be sized, then to add the key values."""
+
+    it = iter(table)
+    next(it)
+    capacity = sum(1 for _ in it)
+    bf = BloomFilter(capacity, error_rate=error_rate, maxbytes=maxbytes)
+    it = iter(table)
+    getkey = operator.itemgetter(*asindices(next(it), key))
+    bf.update(getkey(row) for row in it)
+    return bf
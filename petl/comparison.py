@@ -2,6 +2,8 @@ from __future__ import absolute_import, print_function, division
 
 
 import operator
+import itertools
+from datetime import datetime, date
 
 
 from petl.compat import text_type, binary_type, numeric_types
@@ -107,3 +109,182 @@ def comparable_itemgetter(*args):
     f = operator.itemgetter(*args)
     g = lambda x: Comparable(f(x))
     return g
+
+
+# families of types whose values can be compared with each other natively with
+# the same results as wrapping them in Comparable
+_native_families = (
+    tuple(numeric_types),
+    (text_type,),
+    (binary_type,),
+    (datetime,),
+    (date,),
+)
+_native_types = dict((t, fam) for fam in _native_families for t in fam)
+
+
+def _nativefamily(values):
+    family = None
+    for v in values:
+        if v is None:
+            continue
+        fam = _native_types.get(type(v))
+        if fam is None:
+            return None
+        if fam == (datetime,) and v.tzinfo is not None:
+            # naive and aware datetimes cannot be compared natively
+            return None
+        if family is None:
+            family = fam
+        elif fam != family:
+            return None
+    return family
+
+
+def sample_keytypes(rows, indices, n=1000):
+    """Return a list with one entry per key field giving the family of types
+    found in the first `n` of the given `rows` for that field, or `None` if
+    the field holds values that need to be wrapped as :class:`Comparable`
+    (i.e., the types are mixed, or there are no values other than `None` in
+    the sample)."""
+
+    rows = list(itertools.islice(rows, n))
+    keytypes = list()
+    for i in indices:
+        try:
+            keytypes.append(_nativefamily(row[i] for row in rows))
+        except IndexError:
+            # short rows, let the key function deal with them
+            keytypes.append(None)
+    return keytypes
+
+
+def combine_keytypes(*keytypes):
+    """Combine lists of key types sampled from different tables, so that key
+    functions built from the result can be compared across the tables."""
+
+    combined = list()
+    for families in zip(*keytypes):
+        first = families[0]
+        if all(fam == first for fam in families[1:]):
+            combined.append(first)
+        else:
+            combined.append(None)
+    return combined
+
+
+def _nativeencoder(family):
+    # values are encoded as a pair of a flag and the value, so that None sorts
+    # before anything else without having to compare None with other values,
+    # and any value of a type outside the sampled family is wrapped as
+    # Comparable, which takes care of comparisons with native values
+    if family is None:
+        def encode(v):
+            if v is None:
+                return 0, None
+            return 1, Comparable(v)
+    elif family == (datetime,):
+        def encode(v):
+            if type(v) is datetime and v.tzinfo is None:
+                return 1, v
+            if v is None:
+                return 0, None
+            return 1, Comparable(v)
+    else:
+        def encode(v):
+            if type(v) in family:
+                return 1, v
+            if v is None:
+                return 0, None
+            return 1, Comparable(v)
+    return encode
+
+
+def native_itemgetter(keytypes, *args):
+    """Return a key function for the items at the given indices that orders
+    values in the same way as :func:`comparable_itemgetter`, but builds plain
+    tuples which can be compared natively wherever the values belong to the
+    family of types given in `keytypes` for the field (see
+    :func:`sample_keytypes`)."""
+
+    encoders = [_nativeencoder(fam) for fam in keytypes]
+    if len(args) == 1:
+        index = args[0]
+        encode = encoders[0]
+        return lambda row: encode(row[index])
+    pairs = list(zip(args, encoders))
+
+    def getkey(row):
+        key = ()
+        for i, enc in pairs:
+            key += enc(row[i])
+        return key
+
+    return getkey
+
+
+def sortable_itemgetter(keytypes, *args):
+    """Return a key function for the items at the given indices, using
+    :func:`native_itemgetter` if any of the fields hold values of a single
+    family of types, otherwise falling back to :func:`comparable_itemgetter`.
+    """
+
+    if any(fam is not None for fam in keytypes):
+        return native_itemgetter(keytypes, *args)
+    return comparable_itemgetter(*args)
+
+
+class Descending(object):
+    """Wrapper class which reverses the ordering of the wrapped key, used to
+    sort some fields of a compound key in descending order and others in
+    ascending order in a single pass."""
+
+    __slots__ = ['key']
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __gt__(self, other):
+        return self.key < other.key
+
+    def __le__(self, other):
+        return not (self.key < other.key)
+
+    def __ge__(self, other):
+        return not (other.key < self.key)
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __ne__(self, other):
+        return not (self.key == other.key)
+
+    def __repr__(self):
+        return 'Descending(' + repr(self.key) + ')'
+
+
+def directional_itemgetter(keytypes, reverse, *args):
+    """Return a key function for the items at the given indices, like
+    :func:`native_itemgetter`, where the values of fields for which the
+    corresponding item of `reverse` is true are ordered in descending
+    order."""
+
+    encoders = [_nativeencoder(fam) for fam in keytypes]
+    parts = list(zip(args, encoders, reverse))
+
+    def getkey(row):
+        return tuple(Descending(enc(row[i])) if rev else enc(row[i])
+                     for i, enc, rev in parts)
+
+    return getkey
+
+
+def peek_sample(it, n=1000):
+    """Take a sample of up to `n` rows from the iterator `it`, returning
+    the sample and an iterator over all rows including the sample."""
+
+    sample = list(itertools.islice(it, n))
+    return sample, itertools.chain(sample, it)
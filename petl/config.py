@@ -16,6 +16,93 @@ display_limit = 5
 display_index_header = False
 display_vrepr = text_type
 sort_buffersize = 100000
+sort_memory_limit = None
+"""
+Default memory limit for the sort buffer used by
+:func:`petl.transform.sorts.sort`, as a number of bytes or a string such as
+``'512MB'``. If `None`, the sort buffer is limited by `sort_buffersize` rows
+instead.
+"""
+sort_workers = None
+"""
+Default number of worker processes used by :func:`petl.transform.sorts.sort`
+to sort and spill chunks in parallel when the table does not fit within the
+sort buffer. If `None` or 1, chunks are sorted in the current process.
+"""
+sort_merge_fanin = 256
+"""
+Maximum number of sorted chunk files merged at once by
+:func:`petl.transform.sorts.sort`. If a sort spills more chunks than this,
+groups of chunks are first merged into larger chunk files, so the number of
+files held open during any one merge is bounded.
+"""
+sort_algorithm = 'auto'  # alternatives: 'radix', 'comparison'
+"""
+Default engine used by :func:`petl.transform.sorts.sort` to sort tables
+which fit within the sort buffer. With 'auto', integer keys are sorted with
+numpy when it is installed, see :func:`petl.transform.sorts.sort`.
+"""
+join_strategy = 'sort'  # alternatives: 'hash', 'auto'
+"""
+Default strategy used by :func:`petl.transform.joins.join`.
+"""
+hashjoin_memory_limit = None
+"""
+Default memory limit for the table loaded into memory by the hash join
+functions in :mod:`petl.transform.hashjoins`, as a number of bytes or a
+string such as ``'512MB'``. If exceeded, both tables are hash-partitioned into
+temporary files and joined one partition at a time. If `None`, tables are
+always joined in memory.
+"""
+hashjoin_workers = None
+"""
+Default number of worker processes used by
+:func:`petl.transform.hashjoins.hashjoin` to join hash partitions of the
+tables in parallel. If `None` or 1, tables are joined in the current process.
+"""
+hashjoin_partitions = 32
+"""
+Number of partitions the tables are split into when a hash join exceeds its
+memory limit.
+"""
+aggregate_workers = None
+"""
+Default number of worker processes used by
+:func:`petl.transform.reductions.aggregate` to compute partial aggregates in
+parallel. If `None` or 1, tables are aggregated in the current process.
+"""
+aggregate_batchsize = 10000
+"""
+Number of rows handed to a worker process at a time by
+:func:`petl.transform.reductions.aggregate` when aggregating in parallel.
+"""
+bloom_error_rate = 0.01
+"""
+Default false positive rate of the Bloom filters used to discard rows
+before joining, see :class:`petl.bloom.BloomFilter`.
+"""
+bloom_maxbytes = '64MB'
+"""
+Default maximum size of the Bloom filters used to discard rows before
+joining, as a number of bytes or a string such as ``'16MB'``.
+"""
+spill_codec = 'pickle'
+"""
+Default codec used to write rows to temporary files by operations which do
+not fit in memory, such as :func:`petl.transform.sorts.sort`. Either a
+:class:`petl.spill.SpillCodec` or a string naming a serializer ('pickle' or
+'marshal') optionally followed by a compression ('zlib', 'lzma' or 'bz2'),
+e.g., ``'marshal+zlib'``.
+"""
+spill_blocksize = 4096
+"""
+Number of rows serialized together as one block when writing rows to
+temporary files.
+"""
+diskdict_cachesize = 100000
+"""
+Default number of items held in memory by a :class:`petl.util.lookups.DiskDict`.
+"""
 failonerror=False # False, True, 'inline'
 """
 Controls what happens when unhandled exceptions are raised in a
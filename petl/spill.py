@@ -0,0 +1,291 @@
+from __future__ import absolute_import, print_function, division
+
+
+import os
+import re
+import sys
+import struct
+import marshal
+import logging
+import itertools
+from tempfile import NamedTemporaryFile
+
+
+from petl.compat import pickle, string_types, integer_types
+from petl.errors import ArgumentError
+import petl.config as config
+
+
+logger = logging.getLogger(__name__)
+debug = logger.debug
+
+
+# each block is preceded by a header giving the serializer used for the block
+# and the length in bytes of the (possibly compressed) payload
+_header = struct.Struct('>BI')
+_PICKLE = 0
+_MARSHAL = 1
+
+
+def _compressor(compression):
+    if compression is None:
+        return None, None
+    elif compression == 'zlib':
+        import zlib
+        return (lambda b: zlib.compress(b, 1)), zlib.decompress
+    elif compression == 'lzma':
+        import lzma
+        return (lambda b: lzma.compress(b, preset=1)), lzma.decompress
+    elif compression == 'bz2':
+        import bz2
+        return (lambda b: bz2.compress(b, 1)), bz2.decompress
+    else:
+        raise ArgumentError('unknown spill compression %r' % compression)
+
+
+class SpillCodec(object):
+    """Codec used to write rows to temporary files when an operation does not
+    fit in memory, and read them back again.
+
+    Rows are written in blocks of up to `blocksize` rows, each block being
+    serialized in a single call with either :mod:`pickle` or :mod:`marshal`
+    and optionally compressed with `compression`, one of 'zlib', 'lzma' or
+    'bz2'. The :mod:`marshal` serializer is faster but only supports the
+    builtin types, blocks holding any other values are pickled instead.
+
+    Any object providing `dump(rows, f)` and `load(f)` methods can be used in
+    place of a codec.
+
+    """
+
+    def __init__(self, serializer='pickle', compression=None, blocksize=None):
+        if serializer not in ('pickle', 'marshal'):
+            raise ArgumentError('unknown spill serializer %r' % serializer)
+        # check compression is available now rather than when spilling
+        _compressor(compression)
+        self.serializer = serializer
+        self.compression = compression
+        if blocksize is None:
+            self.blocksize = config.spill_blocksize
+        else:
+            self.blocksize = blocksize
+
+    def __repr__(self):
+        return 'SpillCodec(%r, %r, %r)' % (self.serializer, self.compression,
+                                           self.blocksize)
+
+    def dump(self, rows, f):
+        """Write the given `rows` to the binary file `f`."""
+
+        compress, _ = _compressor(self.compression)
+        usemarshal = self.serializer == 'marshal'
+        it = iter(rows)
+        while True:
+            block = list(itertools.islice(it, self.blocksize))
+            if not block:
+                break
+            kind = _PICKLE
+            if usemarshal:
+                try:
+                    payload = marshal.dumps(block)
+                    kind = _MARSHAL
+                except ValueError:
+                    # unmarshallable object
+                    payload = pickle.dumps(block, -1)
+            else:
+                payload = pickle.dumps(block, -1)
+            if compress is not None:
+                payload = compress(payload)
+            f.write(_header.pack(kind, len(payload)))
+            f.write(payload)
+
+    def load(self, f):
+        """Iterate over the rows in the binary file `f`."""
+
+        _, decompress = _compressor(self.compression)
+        while True:
+            header = f.read(_header.size)
+            if not header:
+                break
+            kind, size = _header.unpack(header)
+            payload = f.read(size)
+            if decompress is not None:
+                payload = decompress(payload)
+            if kind == _MARSHAL:
+                block = marshal.loads(payload)
+            else:
+                block = pickle.loads(payload)
+            for row in block:
+                yield row
+
+
+def getcodec(codec=None):
+    """Resolve the `codec` argument of a spilling operation. This may be a
+    codec object, `None` to use `petl.config.spill_codec`, or a string
+    naming a serializer optionally followed by a compression, e.g.,
+    'pickle', 'marshal', 'pickle+zlib' or 'marshal+lzma'."""
+
+    if codec is None:
+        codec = config.spill_codec
+    if isinstance(codec, string_types):
+        parts = codec.split('+')
+        if len(parts) > 2:
+            raise ArgumentError('invalid spill codec %r' % codec)
+        return SpillCodec(*parts)
+    return codec
+
+
+_sizeunits = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+_sizepattern = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([KMGT]?)(?:I?B)?\s*$',
+                          re.IGNORECASE)
+
+
+def parsesize(size):
+    """Convert a memory size given as a number of bytes or a string such as
+    '512MB' or '2G' into a number of bytes. Units are powers of 1024. `None`
+    is returned unchanged."""
+
+    if size is None or isinstance(size, integer_types):
+        return size
+    if isinstance(size, float):
+        return int(size)
+    match = _sizepattern.match(size)
+    if match is None:
+        raise ArgumentError('invalid memory size %r' % size)
+    number, unit = match.groups()
+    return int(float(number) * _sizeunits[unit.upper()])
+
+
+_pointersize = struct.calcsize('P')
+
+
+def rowsize(row, getsizeof=sys.getsizeof):
+    """Estimate the memory used by a row held in a list, including its
+    values. Values shared between rows are counted once per row, so this may
+    overestimate."""
+
+    return (_pointersize + getsizeof(row)
+            + sum(getsizeof(v) for v in row))
+
+
+def readchunk(it, maxrows=None, maxbytes=None):
+    """Read the next chunk of rows from the iterator `it`, stopping after
+    `maxrows` rows or once the estimated size of the rows read reaches
+    `maxbytes`, whichever comes first (`None` means no limit)."""
+
+    if maxbytes is None:
+        return list(itertools.islice(it, 0, maxrows))
+    rows = list()
+    nbytes = 0
+    for row in itertools.islice(it, 0, maxrows):
+        rows.append(row)
+        nbytes += rowsize(row)
+        if nbytes >= maxbytes:
+            break
+    debug('read chunk of %s rows, estimated %s bytes', len(rows), nbytes)
+    return rows
+
+
+def dumpchunk(rows, codec, tempdir=None):
+    """Write `rows` with the given `codec` to a new temporary file in
+    `tempdir`, returning the file name. The file is not deleted on close,
+    the caller is responsible for wrapping the name with
+    :class:`NamedTempFileDeleteOnGC` or otherwise deleting it."""
+
+    with NamedTemporaryFile(dir=tempdir, delete=False, mode='wb') as f:
+        debug('created temporary chunk file %s' % f.name)
+        try:
+            codec.dump(rows, f)
+            f.flush()
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    return f.name
+
+
+def iterchunk(fn, codec):
+    """Iterate over the rows in a file written by :func:`dumpchunk`."""
+
+    # reopen so iterators from file cache are independent
+    debug('iterchunk, opening %s' % fn)
+    with open(fn, 'rb') as f:
+        for row in codec.load(f):
+            yield row
+    debug('end of iterchunk, closed %s' % fn)
+
+
+class NamedTempFileDeleteOnGC(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def delete(self, unlink=os.unlink, log=logger.debug):
+        name = self.name
+        try:
+            log('deleting %s' % name)
+            unlink(name)
+        except Exception as e:
+            log('exception deleting %s: %s' % (name, e))
+            raise
+        else:
+            log('deleted %s' % name)
+
+    def __del__(self):
+        self.delete()
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return self.name
+
+
+def partitionrows(rows, getkey, nparts, codec, tempdir=None, salt=0):
+    """Write `rows` to `nparts` temporary files with the given `codec`,
+    choosing the file for each row by hashing the value returned by `getkey`
+    for the row, so rows with equal keys are written to the same file in the
+    order they were read. A different `salt` gives a different partitioning,
+    e.g., to split a partition that is still too big. Returns a list with a
+    :class:`NamedTempFileDeleteOnGC` for each partition, or `None` where no
+    rows fell in the partition."""
+
+    files = [None] * nparts
+    buffers = [[] for _ in range(nparts)]
+    nbuffered = 0
+    blocksize = getattr(codec, 'blocksize', config.spill_blocksize)
+
+    def flush():
+        for i, buf in enumerate(buffers):
+            if buf:
+                if files[i] is None:
+                    files[i] = NamedTemporaryFile(dir=tempdir, delete=False,
+                                                  mode='wb')
+                    debug('created temporary partition file %s'
+                          % files[i].name)
+                codec.dump(buf, files[i])
+                del buf[:]
+
+    try:
+        for row in rows:
+            k = getkey(row)
+            if salt:
+                k = salt, k
+            buffers[hash(k) % nparts].append(row)
+            nbuffered += 1
+            # bound the number of rows held in memory across all partitions
+            if nbuffered >= blocksize:
+                flush()
+                nbuffered = 0
+        flush()
+    except BaseException:
+        for f in files:
+            if f is not None:
+                f.close()
+                os.unlink(f.name)
+        raise
+    for f in files:
+        if f is not None:
+            f.close()
+    return [None if f is None else NamedTempFileDeleteOnGC(f.name)
+            for f in files]
@@ -0,0 +1,69 @@
+from __future__ import absolute_import, print_function, division
+
+
+import pickle
+import math
+import random
+
+
+from petl.test.helpers import eq_
+from petl.aggregators import Count, Sum, Mean, Min, Max, First, Last, \
+    Variance, CountDistinct, StrJoin
+
+
+def test_aggregators():
+
+    rnd = random.Random(42)
+    values = [rnd.randint(0, 20) for _ in range(100)]
+    mean = sum(values) / len(values)
+    ss = sum((v - mean) ** 2 for v in values)
+    cases = [
+        (Count(), len(values)),
+        (Sum(), sum(values)),
+        (Mean(), mean),
+        (Min(), min(values)),
+        (Max(), max(values)),
+        (First(), values[0]),
+        (Last(), values[-1]),
+        (Variance(), ss / (len(values) - 1)),
+        (Variance(ddof=0, sqrt=True), math.sqrt(ss / len(values))),
+        (CountDistinct(), len(set(values))),
+        (StrJoin('-'), '-'.join(map(str, values))),
+    ]
+    for agg, expect in cases:
+        actual = agg(values)
+        if isinstance(expect, float):
+            assert abs(expect - actual) < 1e-9, (agg, expect, actual)
+        else:
+            eq_(expect, actual)
+        # merging states for consecutive slices gives the same result,
+        # including empty slices
+        for splits in (0, 100), (30, 30), (1, 99), (50, 70):
+            state = agg.init()
+            for lo, hi in zip((0,) + splits, splits + (len(values),)):
+                part = agg.init()
+                for v in values[lo:hi]:
+                    part = agg.update(part, v)
+                # states survive a round trip to another process
+                part = pickle.loads(pickle.dumps(part))
+                state = agg.merge(state, part)
+            actual = agg.finalize(state)
+            if isinstance(expect, float):
+                assert abs(expect - actual) < 1e-9, (agg, expect, actual)
+            else:
+                eq_(expect, actual)
+
+
+def test_aggregators_empty():
+
+    eq_(0, Count()([]))
+    eq_(0, Sum()([]))
+    for agg in Mean(), Min(), Max(), First(), Last(), Variance():
+        eq_(None, agg([]))
+    eq_(None, Variance()([1]))
+    eq_(0.0, Variance(ddof=0)([1]))
+    eq_(0, CountDistinct()([]))
+    eq_('', StrJoin()([]))
+    # first of equal values, like min() and max()
+    eq_(1.0, Min()([1.0, 1, 2]))
+    eq_(2.0, Max()([1, 2.0, 2]))
@@ -0,0 +1,61 @@
+from __future__ import absolute_import, print_function, division
+
+
+from petl.test.helpers import eq_
+from petl.errors import ArgumentError
+from petl.bloom import BloomFilter, keybloomfilter
+
+
+def test_bloomfilter():
+
+    bf = BloomFilter(1000, error_rate=0.01)
+    bf.update(range(1000))
+    for i in range(1000):
+        assert i in bf
+    eq_(1000, bf.hits)
+    # values which compare equal are treated alike
+    assert 1.0 in bf
+    assert (5, 'a') not in BloomFilter(10)
+    falsepositives = sum(1 for i in range(1000, 11000) if i in bf)
+    assert falsepositives < 300, falsepositives
+    eq_(10000 - falsepositives, bf.misses)
+
+
+def test_bloomfilter_maxbytes():
+
+    bf = BloomFilter(100000, error_rate=0.001, maxbytes='1K')
+    eq_(8192, bf.nbits)
+    bf = BloomFilter(100000, error_rate=0.001, maxbytes=None)
+    assert bf.nbits > 8192
+
+
+def test_bloomfilter_unhashable():
+
+    bf = BloomFilter(10)
+    bf.add(1)
+    assert [1, 2] in bf
+    assert 2 not in bf
+    bf.add([1, 2])
+    assert 2 in bf
+
+
+def test_bloomfilter_invalid():
+
+    try:
+        BloomFilter(10, error_rate=1.5)
+    except ArgumentError:
+        pass
+    else:
+        assert False, 'expected exception'
+
+
+def test_keybloomfilter():
+
+    table = (('foo', 'bar'),
+             ('a', 1),
+             ('b', 2),
+             ('b', 3))
+    bf = keybloomfilter(table, 'foo')
+    assert 'a' in bf and 'b' in bf and 'c' not in bf
+    bf = keybloomfilter(table, ('foo', 'bar'))
+    assert ('b', 2) in bf and ('b', 1) not in bf
@@ -6,7 +6,8 @@ from decimal import Decimal
 
 
 from petl.test.helpers import eq_
-from petl.comparison import Comparable
+from petl.comparison import Comparable, comparable_itemgetter, \
+    native_itemgetter, sortable_itemgetter, sample_keytypes, combine_keytypes
 
 
 def test_comparable():
@@ -178,3 +179,56 @@ def test_comparable_nested():
          (b'aa', -1),
          [b'aa', False]]
     eq_(e, a)
+
+
+def _check_native_itemgetter(rows, *indices):
+    keytypes = sample_keytypes(rows, indices)
+    expect = sorted(rows, key=comparable_itemgetter(*indices))
+    actual = sorted(rows, key=native_itemgetter(keytypes, *indices))
+    eq_(expect, actual)
+    expect = sorted(rows, key=comparable_itemgetter(*indices), reverse=True)
+    actual = sorted(rows, key=native_itemgetter(keytypes, *indices),
+                    reverse=True)
+    eq_(expect, actual)
+
+
+def test_native_itemgetter():
+
+    dt = datetime.now().replace
+
+    # single native types, with and without None
+    _check_native_itemgetter([(3, 'a'), (1, 'b'), (None, 'c'), (2, 'd')], 0)
+    _check_native_itemgetter([(3, 'a'), (1.5, 'b'), (True, 'c'),
+                              (Decimal('2.5'), 'd')], 0)
+    _check_native_itemgetter([(3, 'a'), (1, 'b'), (None, 'c'), (2, 'd')], 1)
+    _check_native_itemgetter([(3, dt(hour=5)), (1, None), (2, dt(hour=1))],
+                             1)
+    _check_native_itemgetter([(3, 'a'), (1, 'b'), (3, None), (1, 'b')],
+                             0, 1)
+
+    # values of other types after the sample are handled as Comparable
+    rows = [(3, 'a'), (1, 'b'), (2, 'c')]
+    keytypes = sample_keytypes(rows, [0, 1])
+    rows += [('x', 'z'), (None, 1), (b'y', None), (2.5, dt(hour=1))]
+    for indices in [0], [1], [0, 1], [1, 0]:
+        expect = sorted(rows, key=comparable_itemgetter(*indices))
+        actual = sorted(rows, key=native_itemgetter(
+            [keytypes[i] for i in indices], *indices))
+        eq_(expect, actual)
+
+
+def test_sample_keytypes():
+
+    rows = [(1, 'a', None, 1), (2.5, 'b', None, 'x'), (None, None, None, 2)]
+    eq_(4, len(sample_keytypes(rows, [0, 1, 2, 3])))
+    keytypes = sample_keytypes(rows, [0, 1, 2, 3])
+    assert int in keytypes[0] and float in keytypes[0]
+    assert str in keytypes[1]
+    eq_(None, keytypes[2])  # only None
+    eq_(None, keytypes[3])  # mixed
+    eq_([keytypes[0], None],
+        combine_keytypes(keytypes[:2], [keytypes[0], keytypes[0]]))
+
+    # no native types found, fall back to Comparable
+    k = sortable_itemgetter([None], 0)(('x',))
+    assert isinstance(k, Comparable)
@@ -0,0 +1,125 @@
+from __future__ import absolute_import, print_function, division
+
+
+import os
+from datetime import datetime
+
+
+from petl.test.helpers import eq_, ieq
+from petl.errors import ArgumentError
+from petl.spill import SpillCodec, getcodec, dumpchunk, iterchunk, \
+    parsesize, readchunk, rowsize, partitionrows
+from petl.transform.sorts import sort
+
+
+def test_spillcodec_roundtrip():
+
+    rows = [(i, 'a' * (i % 7), i / 3., None) for i in range(1000)]
+    rows.append(('x', datetime(2020, 1, 1), b'y', [1, 2]))
+    for codec in ('pickle', 'marshal', 'pickle+zlib', 'marshal+zlib',
+                  'pickle+bz2', SpillCodec('marshal', 'zlib', blocksize=7)):
+        codec = getcodec(codec)
+        fn = dumpchunk(rows, codec)
+        try:
+            eq_(rows, list(iterchunk(fn, codec)))
+            # independent iterators
+            it1 = iterchunk(fn, codec)
+            it2 = iterchunk(fn, codec)
+            eq_(rows[0], next(it1))
+            eq_(rows[0], next(it2))
+            eq_(rows[1], next(it1))
+        finally:
+            os.unlink(fn)
+
+
+def test_spillcodec_empty():
+
+    codec = getcodec('pickle+zlib')
+    fn = dumpchunk([], codec)
+    try:
+        eq_([], list(iterchunk(fn, codec)))
+    finally:
+        os.unlink(fn)
+
+
+def test_spillcodec_invalid():
+
+    for codec in 'json', 'pickle+foo', 'pickle+zlib+lzma':
+        try:
+            getcodec(codec)
+        except ArgumentError:
+            pass
+        else:
+            assert False, 'expected ArgumentError for %r' % codec
+
+
+def test_sort_spill_codec():
+
+    table = (('foo', 'bar'),
+             ('C', 2),
+             ('A', 9),
+             ('A', 6),
+             ('F', 1),
+             ('D', 10))
+    expectation = sort(table, 'bar')
+    for codec in 'marshal', 'pickle+zlib', SpillCodec(blocksize=1):
+        result = sort(table, 'bar', buffersize=2, spill_codec=codec)
+        ieq(expectation, result)
+        ieq(expectation, result)
+        result = sort(table, 'bar', buffersize=2, spill_codec=codec,
+                      workers=2)
+        ieq(expectation, result)
+
+
+def test_parsesize():
+
+    eq_(None, parsesize(None))
+    eq_(1000, parsesize(1000))
+    eq_(512 * 1024**2, parsesize('512MB'))
+    eq_(512 * 1024**2, parsesize('512 MiB'))
+    eq_(2 * 1024**3, parsesize('2g'))
+    eq_(1536, parsesize('1.5K'))
+    eq_(100, parsesize('100'))
+    try:
+        parsesize('lots')
+    except ArgumentError:
+        pass
+    else:
+        assert False, 'expected ArgumentError'
+
+
+def test_readchunk():
+
+    rows = [(i, 'x' * 100) for i in range(100)]
+    it = iter(rows)
+    eq_(rows[:10], readchunk(it, 10))
+    eq_(rows[10:], readchunk(it))
+    eq_([], readchunk(it))
+
+    # limited by memory
+    size = rowsize(rows[0])
+    it = iter(rows)
+    eq_(rows[:5], readchunk(it, maxbytes=size * 5))
+    eq_(rows[5:8], readchunk(it, maxrows=3, maxbytes=size * 5))
+    eq_(rows[8:], readchunk(it, maxbytes=size * 1000))
+
+
+def test_partitionrows():
+
+    rows = [(i % 13, i) for i in range(1000)]
+    codec = SpillCodec(blocksize=10)
+    for salt in 0, 1:
+        parts = partitionrows(rows, lambda row: row[0], 8, codec, salt=salt)
+        eq_(8, len(parts))
+        found = []
+        for f in parts:
+            if f is None:
+                continue
+            part = list(iterchunk(f.name, codec))
+            # each key in one partition, in the order the rows were read
+            eq_(sorted(part, key=lambda row: row[1]), part)
+            found.extend(part)
+        eq_(sorted(rows), sorted(found))
+        keys = [set(row[0] for row in iterchunk(f.name, codec))
+                for f in parts if f is not None]
+        eq_(13, sum(len(k) for k in keys))
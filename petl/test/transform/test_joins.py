@@ -1,10 +1,19 @@
 from __future__ import absolute_import, print_function, division
 
 
-from petl.test.helpers import ieq
+import os
+import itertools
+from tempfile import NamedTemporaryFile
+
+
+from petl.test.helpers import ieq, eq_
 from petl import join, leftjoin, rightjoin, outerjoin, crossjoin, antijoin, \
     lookupjoin, hashjoin, hashleftjoin, hashrightjoin, hashantijoin, \
-    hashlookupjoin, unjoin, sort, cut
+    hashlookupjoin, unjoin, sort, cut, convert, fromcsv, tocsv, DiskDict, \
+    starjoin, asofjoin, semijoin, hashsemijoin, rename
+from petl.errors import ArgumentError, FieldSelectionError
+import petl.config as config
+from petl.transform.joins import estimaterows
 
 
 def _test_join_basic(join_impl):
@@ -1061,6 +1070,55 @@ def test_antijoin():
     _test_antijoin(antijoin)
 
 
+def _test_semijoin(semijoin_impl):
+
+    table1 = (('id', 'colour'),
+              (0, 'black'),
+              (1, 'blue'),
+              (2, 'red'),
+              (4, 'yellow'),
+              (4, 'orange'),
+              (5, 'white'))
+    table2 = (('identifier', 'shape'),
+              (1, 'circle'),
+              (3, 'square'),
+              (4, 'ellipse'),
+              (4, 'square'),
+              (4, 'circle'))
+    # each left row once, however many matches
+    expect = (('id', 'colour'),
+              (1, 'blue'),
+              (4, 'yellow'),
+              (4, 'orange'))
+    actual = semijoin_impl(table1, table2, lkey='id', rkey='identifier')
+    ieq(expect, actual)
+    ieq(expect, actual)
+    actual = semijoin_impl(table1, rename(table2, 'identifier', 'id'))
+    ieq(expect, actual)
+    actual = semijoin_impl(cut(table1, 'id'), table2, lkey='id',
+                           rkey='identifier')
+    ieq(cut(expect, 'id'), actual)
+
+    # empty tables
+    ieq(table1[:1], semijoin_impl(table1, table2[:1], lkey='id',
+                                  rkey='identifier'))
+    ieq(table1[:1], semijoin_impl(table1[:1], table2, lkey='id',
+                                  rkey='identifier'))
+
+
+def test_semijoin():
+    _test_semijoin(semijoin)
+
+
+def test_hashsemijoin():
+    _test_semijoin(hashsemijoin)
+    # the order of the left table is kept
+    table1 = (('id', 'x'), (3, 'a'), (1, 'b'), (2, 'c'), (3, 'd'))
+    table2 = (('id', 'y'), (3, 'a'), (3, 'b'), (2, 'c'))
+    ieq((('id', 'x'), (3, 'a'), (2, 'c'), (3, 'd')),
+        hashsemijoin(table1, table2, key='id'))
+
+
 def _test_lookupjoin_1(lookupjoin_impl):
 
     table1 = (('id', 'color', 'cost'),
@@ -1211,6 +1269,419 @@ def test_hashlookupjoin():
     _test_lookupjoin(hashlookupjoin)
 
 
+def test_join_bloom():
+
+    _test_join(lambda *args, **kwargs: join(*args, bloom=True, **kwargs))
+
+    left = [('id', 'x')] + [(i % 50, i) for i in range(500)]
+    right = [('id', 'y'), (3, 'a'), (7.0, 'b'), (7, 'c'), ('x', 'd')]
+    expect = join(left, right, key='id')
+    actual = join(left, right, key='id', bloom=True)
+    ieq(expect, actual)
+    ieq(expect, actual)
+    bf = actual.bloomfilter
+    eq_(500, bf.hits + bf.misses)
+    assert bf.hits >= 20
+    assert bf.misses > 400
+    actual = join(left, right, key='id', bloom=dict(error_rate=0.5,
+                                                    maxbytes=8))
+    ieq(expect, actual)
+    eq_(64, actual.bloomfilter.nbits)
+
+    # unhashable keys can still be joined
+    left = [('id', 'x'), ((1, 2), 'a'), ([3], 'b'), (4, 'c')]
+    right = [('id', 'y'), ([1, 2], 'A'), ((3,), 'B')]
+    ieq(join(left, right, key='id'), join(left, right, key='id', bloom=True))
+
+
+def test_join_strategy():
+
+    _test_join(lambda *args, **kwargs: join(*args, strategy='auto',
+                                            buffersize=2, **kwargs))
+    _test_join(lambda *args, **kwargs: join(*args, strategy='auto',
+                                            presorted=True, **kwargs))
+
+    left = [('id', 'x')] + [(i % 7, i) for i in range(20)]
+    right = [('id', 'y')] + [(i, 'y%s' % i) for i in range(5)]
+    expect = join(left, right, key='id')
+
+    actual = join(left, right, key='id', strategy='auto')
+    eq_('hash', actual.strategy)
+    assert 'by len' in actual.strategy_reason
+    ieq(expect, sort(actual))
+    actual = join(left, right, key='id', strategy='auto', buffersize=4)
+    eq_('sort', actual.strategy)
+    ieq(expect, actual)
+    actual = join(sort(left, 'id'), sort(right, 'id'), key='id',
+                  strategy='auto', buffersize=4)
+    eq_('merge', actual.strategy)
+    ieq(expect, actual)
+    actual = join(left, cut(right, 'id', 'y'), key='id', strategy='auto',
+                  buffersize=4)
+    eq_('sort', actual.strategy)
+    assert 'by count' in actual.strategy_reason
+    ieq(expect, actual)
+    actual = join(left, right, key='id', strategy='hash', buffersize=4)
+    eq_('hash', actual.strategy)
+    ieq(expect, sort(actual))
+
+    # right table read from a file
+    f = NamedTemporaryFile(delete=False, mode='w')
+    f.close()
+    try:
+        tocsv(right, f.name)
+        actual = join(left, convert(fromcsv(f.name), 'id', int), key='id',
+                      strategy='auto')
+        ieq(expect, sort(actual))
+        # N.B., the converted table isn't read directly from the file
+        assert 'by count' in actual.strategy_reason
+        eq_((5, 'file size'), estimaterows(fromcsv(f.name)))
+    finally:
+        os.unlink(f.name)
+
+    try:
+        join(left, right, key='id', strategy='bogus')
+    except ArgumentError:
+        pass
+    else:
+        assert False, 'expected exception'
+
+
+def test_hashjoin_partitioned():
+
+    import random
+    rnd = random.Random(42)
+    left = [('id', 'sub', 'x')] + [(rnd.randint(0, 60), rnd.randint(0, 2), i)
+                                   for i in range(300)]
+    right = [('id', 'sub', 'y')] + [(rnd.randint(20, 80), rnd.randint(0, 2),
+                                     'y%s' % i)
+                                    for i in range(200)]
+    import petl.config as config
+    default = config.hashjoin_partitions
+    config.hashjoin_partitions = 4
+    try:
+        for key, memory_limit in itertools.product(('id', ('id', 'sub')),
+                                                   ('2KB', '1MB')):
+            for impl, kwargs in ((hashjoin, dict(rprefix='r_')),
+                                 (hashleftjoin, dict(missing='NA')),
+                                 (hashrightjoin, dict(lprefix='l_')),
+                                 (hashantijoin, dict()),
+                                 (hashsemijoin, dict()),
+                                 (hashlookupjoin, dict(missing='NA'))):
+                expect = impl(left, right, key=key, **kwargs)
+                actual = impl(left, right, key=key, memory_limit=memory_limit,
+                              spill_codec='marshal', **kwargs)
+                # N.B., partitioned joins return rows in a different order
+                ieq(sort(expect), sort(actual))
+                ieq(sort(expect), sort(actual))
+        # partitions that can't be made small enough are joined in memory
+        ieq(sort(hashleftjoin(left, right, key='id')),
+            sort(hashleftjoin(left, right, key='id', memory_limit=1)))
+    finally:
+        config.hashjoin_partitions = default
+
+    # build table fits, rows are returned in the usual order
+    ieq(hashjoin(left, right, key='id'),
+        hashjoin(left, right, key='id', memory_limit='1MB'))
+
+    # empty tables
+    ieq([('id', 'sub', 'x', 'y')],
+        hashjoin(left[:1], [('id', 'y')], key='id', memory_limit=1))
+    ieq(left[:1], hashantijoin(left[:1], right, key='id', memory_limit=1))
+
+
+def test_hashjoin_workers():
+
+    import random
+    rnd = random.Random(42)
+    left = [('id', 'sub', 'x')] + [(rnd.randint(0, 60), rnd.randint(0, 2), i)
+                                   for i in range(300)]
+    right = [('id', 'sub', 'y')] + [(rnd.randint(20, 80), rnd.randint(0, 2),
+                                     'y%s' % i)
+                                    for i in range(200)]
+    for key in 'id', ('id', 'sub'), 0:
+        expect = hashjoin(left, right, key=key, lprefix='l_')
+        actual = hashjoin(left, right, key=key, lprefix='l_', workers=2)
+        # N.B., rows are returned grouped by partition
+        ieq(sort(expect), sort(actual))
+        actual = hashjoin(left, right, key=key, lprefix='l_', workers=3,
+                          preserve_order=True)
+        ieq(expect, actual)
+        ieq(expect, actual)
+
+    # empty tables
+    ieq([('id', 'sub', 'x', 'y')],
+        hashjoin(left[:1], right, key=('id', 'sub'), workers=2))
+    ieq([('id', 'sub', 'x', 'y')],
+        hashjoin(left, right[:1], key=('id', 'sub'), workers=2,
+                 preserve_order=True))
+
+
+def test_hashjoin_dictionary():
+
+    import random
+    rnd = random.Random(42)
+    left = [('id', 'sub', 'x')] + [(rnd.randint(0, 60), rnd.randint(0, 2), i)
+                                   for i in range(300)]
+    right = [('id', 'sub', 'y')] + [(rnd.randint(20, 80), rnd.randint(0, 2),
+                                     'y%s' % i)
+                                    for i in range(200)]
+    for key in 'id', ('id', 'sub'):
+        for impl, kwargs in ((hashjoin, dict(rprefix='r_')),
+                             (hashleftjoin, dict(missing='NA')),
+                             (hashlookupjoin, dict(missing='NA'))):
+            expect = impl(left, right, key=key, **kwargs)
+            with DiskDict(cachesize=10) as d:
+                actual = impl(left, right, key=key, dictionary=d, **kwargs)
+                ieq(expect, actual)
+                # the lookup is now loaded and is reused
+                assert len(d) > 0
+                ieq(expect, impl(left, right[:1], key=key, dictionary=d,
+                                 **kwargs))
+
+    # reuse a persisted lookup read-only, with more keys than are cached
+    f = NamedTemporaryFile(delete=False, suffix='.db')
+    f.close()
+    try:
+        expect = hashjoin(left, right, key='id')
+        with DiskDict(f.name, flag='n') as d:
+            ieq(expect, hashjoin(left, right, key='id', dictionary=d))
+        with DiskDict(f.name, flag='r', cachesize=10) as d:
+            actual = hashjoin(left, right[:1], key='id', dictionary=d)
+            ieq(expect, actual)
+            ieq(expect, actual)
+    finally:
+        os.unlink(f.name)
+
+    # keys match as in a dict
+    left2 = [('id', 'x'), (1, 'a'), (2.0, 'b'), (True, 'c'), ('1', 'd')]
+    right2 = [('id', 'y'), (1.0, 'w'), (2, 'v'), (1, 'u')]
+    for impl in hashjoin, hashleftjoin, hashlookupjoin:
+        expect = impl(left2, right2, key='id')
+        with DiskDict(cachesize=1) as d:
+            ieq(expect, impl(left2, right2, key='id', dictionary=d))
+
+
+def test_starjoin():
+
+    import random
+    rnd = random.Random(42)
+    fact = [('a', 'b', 'c', 'x')] + [(rnd.randint(0, 20), rnd.randint(0, 20),
+                                      rnd.randint(0, 5), i)
+                                     for i in range(200)]
+    dim1 = [('a', 'y')] + [(i, 'y%s' % i) for i in range(15)]
+    dim2 = [('id', 'sub', 'z', 'w')] + [(i, j, 'z%s' % i, i * j)
+                                       for i in range(5, 25)
+                                       for j in range(3)]
+    # duplicate keys
+    dim3 = [('c', 'v')] + [(i % 3, i) for i in range(6)]
+
+    # same as a chain of hash joins
+    for inner in False, True:
+        impl = hashjoin if inner else hashleftjoin
+        kwargs = dict() if inner else dict(missing='NA')
+        expect = impl(impl(impl(fact, dim1, key='a', **kwargs),
+                           dim2, lkey=('b', 'c'), rkey=('id', 'sub'),
+                           **kwargs),
+                      dim3, key='c', **kwargs)
+        actual = starjoin(fact, [(dim1, 'a'),
+                                 (dim2, ('b', 'c'), ('id', 'sub')),
+                                 (dim3, 'c')],
+                          inner=inner, missing='NA')
+        ieq(expect, actual)
+        ieq(expect, actual)
+
+    # per dimension options
+    expect = hashjoin(hashleftjoin(fact, dim1, key='a', rprefix='d1_'),
+                      dim3, key='c', rprefix='d3_')
+    actual = starjoin(fact, [(dim1, 'a'), (dim3, 'c')],
+                      prefixes=['d1_', 'd3_'], inner=[False, True])
+    ieq(expect, actual)
+
+    # no dimensions
+    ieq(fact, starjoin(fact, []))
+
+    try:
+        starjoin(fact, [(dim1, 'a')], prefixes=['x', 'y'])
+    except ArgumentError:
+        pass  # expected
+    else:
+        assert False, 'expected error'
+
+
+def _asofjoin_naive(left, right, direction, tolerance, bygetter):
+    # compare every pair of rows, for checking asofjoin
+    out = []
+    for lrow in sorted(left[1:], key=lambda r: r[0]):
+        t = lrow[0]
+        candidates = [r for r in right[1:] if bygetter(r) == bygetter(lrow)]
+        before = [r for r in candidates if r[0] <= t]
+        after = [r for r in candidates if r[0] >= t]
+        # last of the latest preceding, first of the earliest following
+        before = max(reversed(before), key=lambda r: r[0]) if before else None
+        after = min(after, key=lambda r: r[0]) if after else None
+        if tolerance is not None:
+            if before is not None and t - before[0] > tolerance:
+                before = None
+            if after is not None and after[0] - t > tolerance:
+                after = None
+        if direction == 'backward':
+            match = before
+        elif direction == 'forward':
+            match = after
+        elif before is None or (after is not None
+                                and after[0] - t < t - before[0]):
+            match = after
+        else:
+            match = before
+        out.append(tuple(lrow) + ((match[-1],) if match else (None,)))
+    return [('ts', 'g', 'h', 'x', 'y')] + out
+
+
+def test_asofjoin():
+
+    import random
+    rnd = random.Random(42)
+    left = [('ts', 'g', 'h', 'x')] + [(rnd.randint(0, 100), rnd.randint(0, 3),
+                                       rnd.randint(0, 1), i)
+                                      for i in range(150)]
+    right = [('ts', 'g', 'h', 'y')] + [(rnd.randint(0, 100),
+                                        rnd.randint(0, 3), rnd.randint(0, 1),
+                                        'y%s' % i)
+                                       for i in range(60)]
+    for by, bygetter in ((None, lambda r: None),
+                         ('g', lambda r: r[1]),
+                         (('g', 'h'), lambda r: r[1:3])):
+        if by is None:
+            lt = cut(left, 'ts', 'x')
+            rt = cut(right, 'ts', 'y')
+        elif by == 'g':
+            lt = left
+            rt = cut(right, 'ts', 'g', 'y')
+        else:
+            lt, rt = left, right
+        for direction in 'backward', 'forward', 'nearest':
+            for tolerance in None, 0, 5:
+                expect = _asofjoin_naive(left, right, direction, tolerance,
+                                         bygetter)
+                actual = asofjoin(lt, rt, on='ts', by=by,
+                                  direction=direction, tolerance=tolerance)
+                if by is None:
+                    expect = cut(expect, 'ts', 'x', 'y')
+                ieq(expect, actual)
+                ieq(expect, actual)
+
+    # a match exactly tolerance ahead, behind a right row at the same time
+    # in another group
+    left2 = [('ts', 'g'), (0, 'A')]
+    right2 = [('ts', 'g', 'y'), (2, 'B', 'b'), (2, 'A', 'a')]
+    expect2 = [('ts', 'g', 'y'), (0, 'A', 'a')]
+    ieq(expect2, asofjoin(left2, right2, on='ts', by='g',
+                          direction='forward', tolerance=2))
+    # unrelated left rows don't change the match
+    ieq(expect2 + [(1, 'C', None)],
+        asofjoin(left2 + [(1, 'C')], right2, on='ts', by='g',
+                 direction='forward', tolerance=2))
+
+    # None as the on value on both sides, which sorts first
+    left3 = [('ts', 'x'), (3, 'c'), (None, 'a'), (1, 'b'), (None, 'd')]
+    right3 = [('ts', 'y'), (None, 'n'), (0, 'p'), (2, 'q'), (None, 'm')]
+    for direction, tolerance, expect3 in (
+            ('backward', None, [None, None, 'p', 'q']),
+            ('forward', None, [None, None, 'q', None]),
+            ('nearest', None, [None, None, 'p', 'q']),
+            ('forward', 1, [None, None, 'q', None]),
+            ('nearest', 0, [None, None, None, None])):
+        expect3 = [('ts', 'x', 'y'), (None, 'a', expect3[0]),
+                   (None, 'd', expect3[1]), (1, 'b', expect3[2]),
+                   (3, 'c', expect3[3])]
+        actual = asofjoin(left3, right3, on='ts', direction=direction,
+                          tolerance=tolerance)
+        ieq(expect3, actual)
+        ieq(expect3, actual)
+
+    # empty tables
+    ieq([('ts', 'g', 'h', 'x', 'y')],
+        asofjoin(left[:1], right, on='ts', by=('g', 'h')))
+    ieq(sort(left, 'ts').addfield('y', None),
+        asofjoin(left, right[:1], on='ts', by=('g', 'h'),
+                 direction='nearest'))
+
+    try:
+        asofjoin(left, right, on='ts', direction='sideways')
+    except ArgumentError:
+        pass  # expected
+    else:
+        assert False, 'expected error'
+
+
+class _CountingTable(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        self.count += 1
+        return iter(self.rows)
+
+
+def test_crossjoin_cached():
+
+    t1 = [('foo', 'bar')] + [(i, 'b%s' % i) for i in range(30)]
+    t2 = [('baz',)] + [(i,) for i in range(7)]
+    t3 = [('quux', 'x')] + [(i * 2, i) for i in range(5)]
+
+    for tables in (t1, t2), (t2, t1), (t2, t1, t3), (t3, t2):
+        expect = crossjoin(*tables)
+        for buffersize in None, 3:
+            actual = crossjoin(*tables, cache=True, buffersize=buffersize)
+            ieq(sort(expect), sort(actual))
+            ieq(sort(expect), sort(actual))
+        # no limit on the rows cached in memory
+        sort_buffersize = config.sort_buffersize
+        config.sort_buffersize = None
+        try:
+            actual = crossjoin(*tables, cache=True)
+            ieq(sort(expect), sort(actual))
+            ieq(sort(expect), sort(actual))
+        finally:
+            config.sort_buffersize = sort_buffersize
+        # the largest table is first, so the order is the same
+        if tables[0] is t1:
+            ieq(expect, crossjoin(*tables, cache=True))
+
+    # predicate
+    for cache in False, True:
+        actual = crossjoin(t1, t2, t3, cache=cache,
+                           predicate=lambda rec: rec.foo == rec.baz + rec.x)
+        expect = [('foo', 'bar', 'baz', 'quux', 'x')] + \
+            [(a, 'b%s' % a, b, c * 2, c)
+             for a in range(30) for b in range(7) for c in range(5)
+             if a == b + c]
+        ieq(expect, actual)
+        actual = crossjoin(t1, t1, prefix=True, cache=cache,
+                           predicate='{1_foo} == {2_foo} + 1')
+        expect = [('1_foo', '1_bar', '2_foo', '2_bar')] + \
+            [(i + 1, 'b%s' % (i + 1), i, 'b%s' % i) for i in range(29)]
+        ieq(expect, actual)
+
+    # cached tables are only read once, data and headers
+    c1 = _CountingTable(t1)
+    c2 = _CountingTable(t2)
+    table = crossjoin(c1, c2, cache=True)
+    ieq(crossjoin(t1, t2), table)
+    n1, n2 = c1.count, c2.count
+    ieq(crossjoin(t1, t2), table)
+    eq_(n1 + 2, c1.count)  # header and data
+    eq_(n2 + 1, c2.count)  # header only
+
+    # no tables, empty tables
+    ieq(crossjoin(), crossjoin(cache=True))
+    ieq([('foo', 'bar', 'baz')], crossjoin(t1, t2[:1], cache=True))
+    ieq([('foo', 'bar', 'baz')], crossjoin(t1[:1], t2, cache=True))
+
+
 def test_unjoin_implicit_key():
 
     # test the case where the join key needs to be reconstructed
@@ -1380,3 +1851,89 @@ def test_unjoin_explicit_key_5():
     ieq(expect_left, left)
     ieq(expect_right, right)
     ieq(expect_right, right)
+
+
+def test_unjoin_hash():
+
+    table1 = (('foo', 'bar', 'baz'),
+              ('A', 'orange', 1),
+              ('B', 'apple', 2),
+              ('C', 'orange', 3),
+              ('D', 'pear', 4),
+              ('E', 'apple', 5))
+    expect_left = (('foo', 'bar_id', 'baz'),
+                   ('A', 1, 1),
+                   ('B', 2, 2),
+                   ('C', 1, 3),
+                   ('D', 3, 4),
+                   ('E', 2, 5))
+    expect_right = (('id', 'bar'),
+                    (1, 'orange'),
+                    (2, 'apple'),
+                    (3, 'pear'))
+    for cache in True, False:
+        # buffersize=1 spills both tables and the ids to disk
+        for buffersize in None, 1:
+            left, right = unjoin(table1, 'bar', strategy='hash', cache=cache,
+                                 buffersize=buffersize)
+            ieq(expect_right, right)
+            ieq(expect_left, left)
+            ieq(expect_left, left)
+            ieq(expect_right, right)
+
+    left, right = unjoin(table1, 'bar', strategy='hash',
+                         autoincrement=(10, 5))
+    ieq(cut(expect_left, 'foo').addcolumn('bar_id', [10, 15, 10, 20, 15]),
+        cut(left, 'foo', 'bar_id'))
+    ieq([('id', 'bar'), (10, 'orange'), (15, 'apple'), (20, 'pear')], right)
+
+    # empty table
+    left, right = unjoin(table1[:1], 'bar', strategy='hash')
+    ieq([('foo', 'bar_id', 'baz')], left)
+    ieq([('id', 'bar')], right)
+
+    # values which compare equal get the same id, whether or not the ids
+    # are moved to disk
+    table2 = [('foo', 'bar'), ('a', 1), ('b', 2.0), ('c', 1.0), ('d', True),
+              ('e', 2), ('f', 'x')]
+    expect_left = [('foo', 'bar_id'), ('a', 1), ('b', 2), ('c', 1),
+                   ('d', 1), ('e', 2), ('f', 3)]
+    expect_right = [('id', 'bar'), (1, 1), (2, 2.0), (3, 'x')]
+    for buffersize in None, 1:
+        left, right = unjoin(table2, 'bar', strategy='hash',
+                             buffersize=buffersize, cache=False)
+        ieq(expect_left, left)
+        ieq(expect_right, right)
+
+    # no limit on the number of ids held in memory
+    sort_buffersize = config.sort_buffersize
+    config.sort_buffersize = None
+    try:
+        for cache in True, False:
+            left, right = unjoin(table2, 'bar', strategy='hash', cache=cache)
+            ieq(expect_left, left)
+            ieq(expect_right, right)
+    finally:
+        config.sort_buffersize = sort_buffersize
+
+    try:
+        list(unjoin(table1, 'quux', strategy='hash')[0])
+    except FieldSelectionError:
+        pass  # expected
+    else:
+        assert False, 'expected error'
+
+    try:
+        unjoin(table1, 'bar', strategy='random')
+    except ArgumentError:
+        pass  # expected
+    else:
+        assert False, 'expected error'
+
+    # the hash strategy only reconstructs the join key
+    try:
+        unjoin(table1, 'bar', key='foo', strategy='hash')
+    except ArgumentError:
+        pass  # expected
+    else:
+        assert False, 'expected error'
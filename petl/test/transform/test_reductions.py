@@ -5,10 +5,15 @@ import operator
 
 
 from collections import OrderedDict
-from petl.test.helpers import ieq
+from petl.test.helpers import ieq, eq_
 from petl.util import strjoin
+from petl.errors import ArgumentError
 from petl.transform.reductions import rowreduce, aggregate, \
-    mergeduplicates, Conflict, fold
+    mergeduplicates, Conflict, fold, groupselectfirst, groupselectlast, \
+    groupselectmin, groupselectmax, groupingsets, rollup, cube
+from petl.aggregators import Count, Sum, Mean, Min, Max, First, Last, \
+    Variance, CountDistinct, StrJoin
+import petl.config as config
 
 
 def test_rowreduce():
@@ -494,3 +499,302 @@ def test_fold():
     expect = (('key', 'value'), (1, 8), (2, 12))
     ieq(expect, t2)
     ieq(expect, t2)
+
+
+def test_hash_strategy():
+
+    import random
+    rnd = random.Random(42)
+    table = [('foo', 'bar', 'baz')] + \
+        [(rnd.choice('abcdefghij'), rnd.randint(0, 5),
+          rnd.choice([None, rnd.randint(0, 50)]))
+         for _ in range(300)]
+    # one key with many rows
+    table += [('k', i % 3, i) for i in range(50)]
+    # None and mixed types in keys
+    table += [(None, 1, 2), (1, 1, 3), (None, 2, 4)]
+
+    def sumbaz(key, rows):
+        return [key, sum(row.baz or 0 for row in rows)]
+
+    cases = [
+        (rowreduce, dict(key='foo', reducer=sumbaz, header=['foo', 'sum'])),
+        (rowreduce, dict(key=('foo', 'bar'), reducer=lambda k, rows: k)),
+        (aggregate, dict(key='foo', aggregation=len)),
+        (aggregate, dict(key=('foo', 'bar'), aggregation=list,
+                         value='baz')),
+        (aggregate, dict(key='foo', aggregation=OrderedDict(
+            [('count', len), ('bars', ('bar', list)),
+             ('pairs', (('bar', 'baz'), list)),
+             ('rows', lambda rows: sum(r.bar for r in rows))]))),
+        (mergeduplicates, dict(key='foo')),
+        (mergeduplicates, dict(key=('foo', 'bar'))),
+        (fold, dict(key='foo', f=operator.add, value='bar')),
+        (groupselectfirst, dict(key='foo')),
+        (groupselectlast, dict(key=('foo', 'bar'))),
+        (groupselectmin, dict(key='foo', value='baz')),
+        (groupselectmax, dict(key='foo', value=('bar', 'baz'))),
+    ]
+    for f, kwargs in cases:
+        expect = f(table, **kwargs)
+        # a small buffersize partitions rows to disk
+        for buffersize in None, 3, 1:
+            actual = f(table, strategy='hash', buffersize=buffersize,
+                       **kwargs)
+            ieq(expect, actual)
+            ieq(expect, actual)
+        # empty table
+        ieq(f(table[:1], **kwargs), f(table[:1], strategy='hash', **kwargs))
+
+    try:
+        aggregate(table, 'foo', len, strategy='random')
+    except ArgumentError:
+        pass  # expected
+    else:
+        assert False, 'expected error'
+
+
+def test_hash_strategy_many_rows():
+
+    class CountingTable(object):
+
+        def __init__(self, rows):
+            self.rows = rows
+            self.iterations = 0
+
+        def __iter__(self):
+            self.iterations += 1
+            return iter(self.rows)
+
+    # few keys, each with more rows than the buffer holds
+    rows = [('foo', 'bar')] + [('ab'[i % 2], i) for i in range(100)]
+
+    def sumbar(key, rows):
+        return [key, sum(row.bar for row in rows)]
+
+    cases = [
+        (rowreduce, dict(key='foo', reducer=sumbar, header=['foo', 'sum'])),
+        (aggregate, dict(key='foo', aggregation=list, value='bar')),
+        (aggregate, dict(key='foo', aggregation=OrderedDict(
+            [('count', len), ('bars', ('bar', list))]))),
+    ]
+    for f, kwargs in cases:
+        expect = f(rows, **kwargs)
+        # rows beyond the buffer fall back on sorting, which spills
+        table = CountingTable(rows)
+        actual = f(table, strategy='hash', buffersize=10, cache=False,
+                   **kwargs)
+        ieq(expect, actual)
+        assert table.iterations > 1
+        # rows within the buffer are grouped in one pass
+        table = CountingTable(rows)
+        actual = f(table, strategy='hash', buffersize=100, **kwargs)
+        ieq(expect, actual)
+        eq_(1, table.iterations)
+
+    # no limit if the configured sort buffersize is None
+    sort_buffersize = config.sort_buffersize
+    config.sort_buffersize = None
+    try:
+        for f, kwargs in cases:
+            table = CountingTable(rows)
+            ieq(f(rows, **kwargs), f(table, strategy='hash', **kwargs))
+            eq_(1, table.iterations)
+    finally:
+        config.sort_buffersize = sort_buffersize
+
+
+def test_aggregate_aggregators():
+
+    table1 = (('foo', 'bar', 'baz'),
+              ('a', 3, True),
+              ('a', 7, False),
+              ('b', 2, True),
+              ('b', 2, False),
+              ('b', 9, False),
+              ('c', 4, True))
+
+    aggregation = OrderedDict()
+    aggregation['count'] = Count()
+    aggregation['minbar'] = 'bar', Min()
+    aggregation['maxbar'] = 'bar', Max()
+    aggregation['sumbar'] = 'bar', Sum()
+    aggregation['meanbar'] = 'bar', Mean()
+    aggregation['firstbaz'] = 'baz', First()
+    aggregation['lastbaz'] = 'baz', Last()
+    aggregation['distinct'] = ('bar', 'baz'), CountDistinct()
+    aggregation['bars'] = 'bar', StrJoin(', ')
+    expect = (('foo', 'count', 'minbar', 'maxbar', 'sumbar', 'meanbar',
+               'firstbaz', 'lastbaz', 'distinct', 'bars'),
+              ('a', 2, 3, 7, 10, 5.0, True, False, 2, '3, 7'),
+              ('b', 3, 2, 9, 13, 13 / 3, True, False, 3, '2, 2, 9'),
+              ('c', 1, 4, 4, 4, 4.0, True, True, 1, '4'))
+    for strategy in 'sort', 'hash':
+        for buffersize in None, 1:
+            actual = aggregate(table1, 'foo', aggregation, strategy=strategy,
+                               buffersize=buffersize)
+            ieq(expect, actual)
+            ieq(expect, actual)
+    ieq((expect[0][1:], (6, 2, 9, 27, 4.5, True, True, 6,
+                         '3, 7, 2, 2, 9, 4')),
+        aggregate(table1, None, aggregation))
+
+    # mixed with plain aggregation functions
+    aggregation = OrderedDict([('count', Count()), ('sumbar', ('bar', sum))])
+    expect = (('foo', 'count', 'sumbar'), ('a', 2, 10), ('b', 3, 13),
+              ('c', 1, 4))
+    for strategy in 'sort', 'hash':
+        ieq(expect, aggregate(table1, 'foo', aggregation, strategy=strategy))
+
+    # single aggregation
+    expect = (('foo', 'value'), ('a', 5.0), ('b', 13 / 3), ('c', 4.0))
+    for strategy in 'sort', 'hash':
+        for buffersize in None, 1:
+            ieq(expect, aggregate(table1, 'foo', Mean(), 'bar',
+                                  strategy=strategy, buffersize=buffersize))
+    ieq((('value',), (4.5,)), aggregate(table1, None, Mean(), 'bar'))
+    ieq((('value',), (None,)), aggregate(table1[:1], None, Mean(), 'bar'))
+
+
+def test_aggregate_workers():
+
+    import random
+    rnd = random.Random(42)
+    table = [('foo', 'bar', 'baz')] + \
+        [(rnd.choice('abcdefghij'), rnd.randint(0, 5), rnd.randint(0, 50))
+         for _ in range(300)]
+    table += [(None, 1, 2), (1, 1, 3), (None, 2, 4)]
+
+    aggregation = OrderedDict()
+    aggregation['count'] = Count()
+    aggregation['sumbaz'] = 'baz', Sum()
+    aggregation['meanbaz'] = 'baz', Mean()
+    aggregation['firstbar'] = 'bar', First()
+    aggregation['lastbar'] = 'bar', Last()
+    aggregation['bars'] = 'bar', StrJoin('')
+    aggregation['distinct'] = ('bar', 'baz'), CountDistinct()
+    cases = [
+        dict(key='foo', aggregation=aggregation),
+        dict(key=('foo', 'bar'), aggregation=aggregation),
+        dict(key=None, aggregation=aggregation),
+        dict(key='foo', aggregation=Max(), value='baz'),
+        dict(key=None, aggregation=Min(), value=('bar', 'baz')),
+    ]
+    batchsize = config.aggregate_batchsize
+    # small batches so several partial aggregates are merged
+    config.aggregate_batchsize = 50
+    try:
+        for kwargs in cases:
+            expect = aggregate(table, **kwargs)
+            actual = aggregate(table, workers=2, **kwargs)
+            ieq(expect, actual)
+            ieq(aggregate(table[:1], **kwargs),
+                aggregate(table[:1], workers=2, **kwargs))
+        # merged floating point states may differ in the last digits
+        expect = aggregate(table, 'foo', Variance(), 'baz')
+        actual = aggregate(table, 'foo', Variance(), 'baz', workers=2)
+        for (k1, v1), (k2, v2) in zip(expect, actual):
+            eq_(k1, k2)
+            if v1 != v2:
+                assert abs(v1 - v2) < 1e-9, (v1, v2)
+    finally:
+        config.aggregate_batchsize = batchsize
+
+    # aggregation functions can't be merged
+    for aggregation in len, OrderedDict([('count', Count()),
+                                         ('sumbaz', ('baz', sum))]):
+        try:
+            aggregate(table, 'foo', aggregation, workers=2)
+        except ArgumentError:
+            pass  # expected
+        else:
+            assert False, 'expected error'
+
+
+def test_groupingsets():
+
+    import random
+    rnd = random.Random(42)
+    table = [('foo', 'bar', 'baz')] + \
+        [(rnd.choice('abc'), rnd.randint(0, 3), rnd.randint(0, 50))
+         for _ in range(200)]
+    table += [(None, 1, 2), (1, None, 3)]
+
+    def naive(sets, aggregation, value=None):
+        # cat separate aggregations, padding keys with None
+        keyflds = []
+        for s in sets:
+            keyflds.extend(f for f in s if f not in keyflds)
+        out = None
+        for s in sets:
+            key = tuple(s) if len(s) > 1 else s[0] if s else None
+            t = list(aggregate(table, key, aggregation, value))
+            if out is None:
+                out = [tuple(keyflds) + ('grouping_id',) + t[0][len(s):]]
+            gid = sum(1 << (len(keyflds) - 1 - j)
+                      for j, f in enumerate(keyflds) if f not in s)
+            for row in t[1:]:
+                key = dict(zip(s, row))
+                out.append(tuple(key.get(f) for f in keyflds) + (gid,) +
+                           row[len(s):])
+        return out
+
+    aggregation = OrderedDict([('count', Count()), ('sumbaz', ('baz', Sum())),
+                               ('maxbaz', ('baz', Max()))])
+    plain = OrderedDict([('count', len), ('sumbaz', ('baz', sum)),
+                         ('maxbaz', ('baz', max))])
+    sets = [['foo', 'bar'], ['foo'], []]
+    expect = naive(sets, plain)
+    for agg in aggregation, plain:
+        for buffersize in None, 3:
+            actual = groupingsets(table, sets, agg, buffersize=buffersize)
+            ieq(expect, actual)
+            ieq(expect, actual)
+        ieq(expect, rollup(table, ('foo', 'bar'), agg))
+
+    cubesets = [['foo', 'bar'], ['foo'], ['bar'], []]
+    ieq(naive(cubesets, plain), cube(table, ('foo', 'bar'), aggregation))
+
+    # single aggregation
+    expect = naive([['bar'], []], Mean(), 'baz')
+    ieq(expect, rollup(table, 'bar', Mean(), 'baz'))
+    ieq(expect, rollup(table, 'bar', lambda v: Mean()(v), 'baz'))
+
+    # options
+    table2 = rollup([('foo', 'bar'), ('b', 1), ('a', 2), ('b', 3)], 'foo',
+                    Count(), groupingid=None, missing='*', field='n')
+    ieq([('foo', 'n'), ('a', 1), ('b', 2), ('*', 3)], table2)
+
+    # a grand total even with no rows, like SQL
+    ieq([('foo', 'grouping_id', 'value'), (None, 1, 0)],
+        rollup(table[:1], 'foo', Count()))
+    ieq([('foo', 'grouping_id', 'value'), (None, 1, 0)],
+        rollup(table[:1], 'foo', len))
+    ieq([('foo', 'bar', 'grouping_id', 'count', 'sumbaz', 'maxbaz'),
+         (None, None, 3, 0, 0, None)],
+        cube(table[:1], ('foo', 'bar'), aggregation))
+    ieq([('foo', 'bar', 'grouping_id', 'count', 'sumbaz')],
+        groupingsets(table[:1], ['foo', 'bar'],
+                     OrderedDict([('count', len), ('sumbaz', ('baz', sum))])))
+
+    class CountingTable(object):
+
+        def __init__(self, rows):
+            self.rows = rows
+            self.iterations = 0
+
+        def __iter__(self):
+            self.iterations += 1
+            return iter(self.rows)
+
+    # too many values held for plain callables, so aggregate by sorting
+    for agg, value in (plain, None), (lambda v: Mean()(v), 'baz'):
+        expect = naive(cubesets, agg, value)
+        counting = CountingTable(table)
+        ieq(expect, cube(counting, ('foo', 'bar'), agg, value,
+                         buffersize=50))
+        assert counting.iterations > 1
+        counting = CountingTable(table)
+        ieq(expect, cube(counting, ('foo', 'bar'), agg, value,
+                         buffersize=1000))
+        eq_(1, counting.iterations)
@@ -3,6 +3,8 @@ from __future__ import absolute_import, print_function, division
 
 import os
 import gc
+import shutil
+import tempfile
 import logging
 from datetime import datetime
 import sys
@@ -11,8 +13,17 @@ from petl.compat import next
 
 from petl.test.helpers import ieq, eq_
 from petl.util import nrows
-from petl.transform.basics import cat
-from petl.transform.sorts import sort, mergesort, issorted
+from petl.errors import ArgumentError
+from petl.io.csv import fromcsv, tocsv
+from petl.util.base import asindices
+from petl.comparison import comparable_itemgetter
+from petl.transform.basics import cat, head, cut, cutout, rowslice
+from petl.transform.selects import select, selecteq
+from petl.transform.conversions import convert
+from petl.transform.headers import rename
+from petl.transform.joins import join
+from petl.transform.sorts import sort, mergesort, issorted, topk, bottomk, \
+    TopKView, getsortedby
 
 
 logger = logging.getLogger(__name__)
@@ -198,6 +209,100 @@ def test_sort_buffered():
     ieq(expectation, result)
 
 
+def test_sort_buffered_workers():
+
+    table = (('foo', 'bar'),
+             ('C', 2),
+             ('A', 9),
+             ('A', 6),
+             ('F', 1),
+             ('D', 10),
+             ('B', 6),
+             ('E', 2),
+             ('A', 1))
+
+    # output must be identical to the serial path, including stability
+    for key, reverse in (('bar', False), ('bar', True), ('foo', False),
+                         ('foo', True), (None, True)):
+        expectation = sort(table, key, reverse=reverse, buffersize=2)
+        result = sort(table, key, reverse=reverse, buffersize=2, workers=2)
+        ieq(expectation, result)
+        ieq(expectation, result)
+        result = sort(table, key, reverse=reverse, buffersize=3, workers=3,
+                      cache=False)
+        ieq(expectation, result)
+
+    # check the default is taken from config
+    import petl.config as config
+    default = config.sort_workers
+    config.sort_workers = 2
+    try:
+        result = sort(table, 'bar', buffersize=2)
+        eq_(2, result.workers)
+        ieq(sort(table, 'bar'), result)
+    finally:
+        config.sort_workers = default
+
+
+def test_sort_memory_limit():
+
+    table = [('foo', 'bar')] + [(i % 7, 'x' * (i % 50)) for i in range(100)]
+    expectation = sort(table, ('foo', 'bar'))
+
+    # table doesn't fit, should be sorted in chunks
+    result = sort(table, ('foo', 'bar'), memory_limit='2KB')
+    eq_(2048, result.memory_limit)
+    eq_(None, result.buffersize)
+    ieq(expectation, result)
+    assert len(result._filecache) > 1
+    ieq(expectation, result)
+    result = sort(table, ('foo', 'bar'), memory_limit=2048, workers=2)
+    ieq(expectation, result)
+
+    # table fits
+    result = sort(table, ('foo', 'bar'), memory_limit='1M')
+    ieq(expectation, result)
+    eq_(100, len(result._memcache))
+
+    # check the default is taken from config
+    import petl.config as config
+    default = config.sort_memory_limit
+    config.sort_memory_limit = '2KB'
+    try:
+        result = sort(table, ('foo', 'bar'))
+        eq_(2048, result.memory_limit)
+        ieq(expectation, result)
+        assert len(result._filecache) > 1
+    finally:
+        config.sort_memory_limit = default
+
+
+def test_sort_merge_fanin():
+
+    # many chunks merged in several passes, ties must keep source order
+    table = [('foo', 'bar')] + [(i % 7, i) for i in range(100)]
+    for reverse in False, True:
+        expectation = [table[0]] + sorted(table[1:], key=lambda r: r[0],
+                                          reverse=reverse)
+        for fanin in 2, 3, 256:
+            result = sort(table, 'foo', reverse=reverse, buffersize=4,
+                          merge_fanin=fanin)
+            ieq(expectation, result)
+            assert len(result._filecache) <= fanin
+            ieq(expectation, result)
+        result = sort(table, 'foo', reverse=reverse, buffersize=4,
+                      merge_fanin=2, workers=2)
+        ieq(expectation, result)
+
+    # fan-in of less than two can't reduce the number of chunks
+    try:
+        list(sort(table, 'foo', buffersize=4, merge_fanin=1))
+    except ArgumentError:
+        pass
+    else:
+        assert False, 'expected exception'
+
+
 def test_sort_buffered_tempdir():
 
     table = (('foo', 'bar'),
@@ -362,7 +467,78 @@ def test_sort_none():
     ieq(expectation, result)
 
 
-# TODO test sort with native comparison
+def test_sort_native_keys():
+
+    # key values of a single type in the first chunk are compared natively,
+    # values of other types later on must still sort as Comparable
+    table = (('foo', 'bar'),
+             ('C', 2),
+             ('A', 9),
+             ('A', None),
+             ('F', 1),
+             (None, 'x'),
+             ('D', 10),
+             (b'B', 2.5),
+             ('E', 1))
+    for key in 'foo', 'bar', ('foo', 'bar'), ('bar', 'foo'):
+        for reverse in False, True:
+            expectation = sorted(table[1:], key=comparable_itemgetter(
+                *asindices(table[0], key)), reverse=reverse)
+            expectation.insert(0, table[0])
+            ieq(expectation, sort(table, key, reverse=reverse))
+            ieq(expectation, sort(table, key, reverse=reverse, buffersize=3))
+
+
+def test_sort_radix():
+
+    try:
+        import numpy
+    except ImportError as e:
+        print('SKIP radix sort tests: %s' % e, file=sys.stderr)
+        return
+
+    import random
+    rnd = random.Random(1)
+    table = [('id', 'ts', 'n')] + [(rnd.randint(-5, 5),
+                                    rnd.randint(0, 2**40),
+                                    i)
+                                   for i in range(2000)]
+    table.append((2**62, -2**63, 2000))
+    for key, reverse in (('id', False), ('id', True), ('ts', True),
+                         (('id', 'ts'), False), (('id', 'ts'), (True, False)),
+                         (('id', 'n'), (False, True))):
+        expectation = sort(table, key, reverse=reverse,
+                           algorithm='comparison')
+        for algorithm in 'radix', 'auto':
+            ieq(expectation, sort(table, key, reverse=reverse,
+                                  algorithm=algorithm))
+        # doesn't fit, falls back to sorting in chunks
+        ieq(expectation, sort(table, key, reverse=reverse, buffersize=500,
+                              algorithm='radix'))
+
+    # empty table
+    for buffersize in None, 500:
+        ieq([table[0]], sort(table[:1], 'id', buffersize=buffersize,
+                             algorithm='radix'))
+
+    # a non-integer key value falls back to comparison sorting
+    mixed = table + [(2.5, None, 2001)]
+    ieq(sort(mixed, 'id', algorithm='comparison'), sort(mixed, 'id'))
+    big = table + [(2**70, None, 2001)]
+    ieq(sort(big, 'id', algorithm='comparison'), sort(big, 'id'))
+    try:
+        list(sort(mixed, 'id', algorithm='radix'))
+    except ArgumentError:
+        pass
+    else:
+        assert False, 'expected exception'
+
+    try:
+        sort(table, 'id', algorithm='bogus')
+    except ArgumentError:
+        pass
+    else:
+        assert False, 'expected exception'
 
 
 def test_mergesort_1():
@@ -523,3 +699,280 @@ def test_issorted():
     assert not issorted(table5, key='foo')
     assert issorted(table5, key='foo', reverse=True)
     assert not issorted(table5, key='foo', reverse=True, strict=True)
+
+
+def test_topk():
+
+    table = (('foo', 'bar'),
+             ('C', 2),
+             ('A', 9),
+             ('A', 6),
+             ('F', 1),
+             ('B', 6),
+             (None, 6),
+             ('D', 10),
+             ('E', None))
+
+    for n in 0, 1, 3, 5, 20:
+        for key in 'bar', 'foo', ('foo', 'bar'), None:
+            ieq(head(sort(table, key, reverse=True), n),
+                topk(table, n, key))
+            ieq(head(sort(table, key), n),
+                topk(table, n, key, reverse=False))
+            ieq(head(sort(table, key), n), bottomk(table, n, key))
+
+    # stability for ties
+    expect = (('foo', 'bar'),
+              ('D', 10),
+              ('A', 9),
+              ('A', 6),
+              ('B', 6))
+    ieq(expect, topk(table, 4, 'bar'))
+
+
+def test_head_sort():
+
+    table = (('foo', 'bar'),
+             ('C', 2),
+             ('A', 9),
+             ('A', 6),
+             ('F', 1),
+             ('D', 10))
+    expect = (('foo', 'bar'),
+              ('D', 10),
+              ('A', 9))
+
+    s = sort(table, 'bar', reverse=True)
+    result = head(s, 2)
+    assert isinstance(result, TopKView)
+    ieq(expect, result)
+    ieq(expect, result)
+    ieq(expect, s.head(2))
+    eq_(None, s._memcache)
+
+    # once the sort is cached, rows are taken from the cache
+    nrows(s)
+    assert s._memcache is not None
+    ieq(expect, result)
+
+    # more rows than fit in the sort buffer are left to the sort, which
+    # spills
+    table = [('foo', 'bar')] + [(i % 7, i) for i in range(30)]
+    expect = [table[0]] + sorted(table[1:])[:20]
+    s = sort(table, buffersize=5)
+    result = head(s, 20)
+    assert not isinstance(result, TopKView)
+    ieq(expect, result)
+    assert isinstance(head(s, 5), TopKView)
+    ieq(expect[:6], head(s, 5))
+
+    # likewise for a memory limit
+    s = sort(table, memory_limit=1000)
+    result = head(s, 20)
+    assert not s._fitsbuffer(20)
+    assert s._fitsbuffer(2)
+    ieq(expect, result)
+    ieq(expect[:3], head(s, 2))
+
+
+class _CountingTable(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        self.count += 1
+        return iter(self.rows)
+
+
+def test_sort_persist():
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        table = _CountingTable((('foo', 'bar'),
+                                ('C', 2),
+                                ('A', 9),
+                                ('A', 6),
+                                ('F', 1),
+                                ('D', 10)))
+        expect = sort(table.rows, 'bar')
+
+        result = sort(table, 'bar', persist=tempdir, persist_token='v1')
+        ieq(expect, result)
+        eq_(1, table.count)
+        eq_(1, len(os.listdir(tempdir)))
+
+        # a new sort, e.g., in another process, reads the persisted run
+        result = sort(table, 'bar', persist=tempdir, persist_token='v1',
+                      cache=False)
+        ieq(expect, result)
+        ieq(expect, result)
+        eq_(1, table.count)
+
+        # different token or key, sort again
+        ieq(expect, sort(table, 'bar', persist=tempdir, persist_token='v2'))
+        eq_(2, table.count)
+        ieq(sort(table.rows, 'bar', reverse=True),
+            sort(table, 'bar', reverse=True, persist=tempdir,
+                 persist_token='v2', buffersize=2))
+        eq_(3, table.count)
+        eq_(3, len(os.listdir(tempdir)))
+
+        # no way to fingerprint a list
+        try:
+            list(sort(table.rows, 'bar', persist=tempdir))
+        except ArgumentError:
+            pass
+        else:
+            assert False, 'expected ArgumentError'
+    finally:
+        shutil.rmtree(tempdir)
+
+
+def test_sort_persist_file_fingerprint():
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tempdir, 'test.csv')
+        persist = os.path.join(tempdir, 'cache')
+        tocsv([('foo', 'bar'), ('b', 2), ('a', 1)], fn)
+
+        result = sort(fromcsv(fn), 'foo', persist=persist)
+        ieq([('foo', 'bar'), ('a', '1'), ('b', '2')], result)
+        eq_(1, len(os.listdir(persist)))
+        ieq([('foo', 'bar'), ('a', '1'), ('b', '2')],
+            sort(fromcsv(fn), 'foo', persist=persist))
+        eq_(1, len(os.listdir(persist)))
+
+        # changing the file changes the fingerprint
+        tocsv([('foo', 'bar'), ('b', 2), ('a', 1), ('c', 3)], fn)
+        os.utime(fn, (0, 0))
+        ieq([('foo', 'bar'), ('a', '1'), ('b', '2'), ('c', '3')],
+            sort(fromcsv(fn), 'foo', persist=persist))
+        eq_(2, len(os.listdir(persist)))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+def test_sortedby():
+
+    table = (('foo', 'bar', 'baz'),
+             ('C', 2, True),
+             ('A', 9, False),
+             ('A', 6, True),
+             ('F', 1, False))
+
+    eq_(None, getsortedby(table))
+    s = sort(table, ('foo', 'bar'))
+    eq_((('foo', 'bar'), False), getsortedby(s))
+    eq_(((0,), True), getsortedby(sort(table, 0, reverse=True)))
+    eq_((None, False), getsortedby(sort(table)))
+    eq_((('foo',), False), getsortedby(mergesort(table, table, key='foo')))
+
+    # order preserving views pass through
+    eq_((('foo', 'bar'), False), getsortedby(select(s, 'baz', lambda v: v)))
+    eq_((('foo', 'bar'), False), getsortedby(selecteq(s, 'foo', 'A')))
+    eq_((('foo', 'bar'), False), getsortedby(rowslice(s, 2)))
+    eq_((('foo', 'bar'), False), getsortedby(cut(s, 'bar', 'foo')))
+    eq_((('foo',), False), getsortedby(cut(s, 'foo', 'baz')))
+    eq_(None, getsortedby(cut(s, 'bar', 'baz')))
+    eq_(None, getsortedby(cut(s, 0, 1)))
+    eq_((('foo',), False), getsortedby(cutout(s, 'bar')))
+    eq_((('foo', 'bar'), False), getsortedby(cutout(s, 'baz')))
+    eq_((('foo', 'bar'), False), getsortedby(convert(s, 'baz', str)))
+    eq_((('foo',), False), getsortedby(convert(s, 'bar', str)))
+    eq_(None, getsortedby(convert(s, 0, str)))
+    eq_((('quux', 'bar'), False), getsortedby(rename(s, 'foo', 'quux')))
+    eq_(None, getsortedby(rename(s, 0, 'quux')))
+    eq_((('foo', 'bar'), False), getsortedby(topk(table, 2, ('foo', 'bar'),
+                                                  reverse=False)))
+
+
+def test_sort_presorted():
+
+    table = (('foo', 'bar', 'baz'),
+             ('C', 2, True),
+             ('A', 9, False),
+             ('A', 6, True),
+             ('F', 1, False))
+
+    s = sort(table, ('foo', 'bar'))
+    assert sort(s, ('foo', 'bar')) is s
+    assert sort(s, 'foo') is s
+    assert sort(s, ['foo']) is s
+    assert sort(s, 'bar') is not s
+    assert sort(s, 'foo', reverse=True) is not s
+    assert sort(s) is not s
+    c = cut(s, 'foo', 'bar')
+    assert sort(c, 'foo') is c
+    # output is the same as a stable sort again would be
+    ieq(sorted(s, key=lambda row: row[0] if row[0] != 'foo' else ''),
+        sort(s, 'foo'))
+    ieq(cut(sort(table, ('foo', 'bar')), 'foo', 'bar'), sort(c, 'foo'))
+
+    # operators which sort their inputs don't sort again
+    j = join(s, table, key='foo')
+    assert j.left is s
+    ieq(join(s, sort(table, 'foo'), key='foo', presorted=True), j)
+
+
+def _multipass_sort(table, key, reverse):
+    # reference implementation, stable sorts from the last key field
+    hdr = table[0]
+    rows = list(table[1:])
+    indices = asindices(hdr, key)
+    for i, rev in reversed(list(zip(indices, reverse))):
+        rows.sort(key=comparable_itemgetter(i), reverse=rev)
+    return [hdr] + rows
+
+
+def test_sort_mixed_reverse():
+
+    dt = datetime(2020, 1, 1).replace
+    table = (('region', 'revenue', 'id', 'date'),
+             ('west', 10, 3, dt(day=3)),
+             ('east', 5, 1, dt(day=1)),
+             ('west', 10, 1, None),
+             ('east', 7, 2, dt(day=2)),
+             (None, 7, 4, dt(day=2)),
+             ('west', 2, 5, dt(day=5)),
+             ('east', 7, 0, dt(day=9)),
+             ('north', None, 6, dt(day=1)),
+             ('west', 'x', 7, dt(day=3)))
+
+    for key, reverse in ((('region', 'revenue', 'id'), (False, True, False)),
+                         (('region', 'revenue', 'id'), [True, False, True]),
+                         (('date', 'region'), (True, False)),
+                         (('revenue', 'date', 'id'), (False, True, True))):
+        expect = _multipass_sort(table, key, reverse)
+        ieq(expect, sort(table, key, reverse=reverse))
+        ieq(expect, sort(table, key, reverse=reverse, buffersize=2))
+        ieq(expect, sort(table, key, reverse=reverse, buffersize=3,
+                         workers=2))
+        assert issorted(expect, key, reverse=reverse)
+        ieq(head(expect, 4), topk(table, 4, key, reverse=reverse))
+        ieq(expect, mergesort(table[:5], table[:1] + table[5:], key=key,
+                              reverse=reverse))
+
+    # same reverse for all fields is the same as a single flag
+    ieq(sort(table, ('region', 'id'), reverse=True),
+        sort(table, ('region', 'id'), reverse=(True, True)))
+    ieq(sort(table, ('region', 'id')),
+        sort(table, ('region', 'id'), reverse=(False, False)))
+
+    # one reverse flag per key field is required
+    try:
+        list(sort(table, ('region', 'id'), reverse=(True,)))
+    except ArgumentError:
+        pass
+    else:
+        assert False, 'expected ArgumentError'
+
+    # sort order is tracked per field
+    s = sort(table, ('region', 'revenue', 'id'), reverse=(False, True, False))
+    assert sort(s, ('region', 'revenue'), reverse=(False, True)) is s
+    assert sort(s, 'region') is s
+    assert sort(s, ('region', 'revenue')) is not s
+    eq_((('region', 'revenue'), (False, True)),
+        getsortedby(cut(s, 'region', 'revenue')))
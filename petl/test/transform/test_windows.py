@@ -0,0 +1,129 @@
+from __future__ import absolute_import, print_function, division
+
+
+import random
+from collections import OrderedDict
+
+
+from petl.test.helpers import ieq
+from petl.errors import ArgumentError
+from petl.aggregators import Count, Sum, Mean, Min, Max, StrJoin
+from petl.transform.sorts import sort
+from petl.transform.windows import window, rolling, cumulative, rownumber, \
+    rank, denserank, lag, lead
+
+
+def _window_naive(table, partition, order, preceding, following, agg):
+    # aggregate frames of sorted partitions from scratch
+    hdr = table[0]
+    rows = sorted(table[1:], key=lambda r: (r[partition], r[order]))
+    out = [tuple(hdr) + ('x',)]
+    for i, row in enumerate(rows):
+        part = [r for r in rows if r[partition] == row[partition]]
+        j = [r is row for r in part].index(True)
+        lo = 0 if preceding is None else max(0, j - preceding)
+        out.append(tuple(row) +
+                   (agg([r[2] for r in part[lo:j + following + 1]]),))
+    return out
+
+
+def test_rolling():
+
+    rnd = random.Random(42)
+    table = [('foo', 'bar', 'baz')] + \
+        [(rnd.choice('abc'), i, rnd.randint(0, 20)) for i in range(100)]
+    aggregations = [(Count(), len), (Sum(), sum),
+                    (Mean(), lambda v: sum(v) / len(v)), (Min(), min),
+                    (Max(), max), (StrJoin(), StrJoin()), (sorted, sorted)]
+    for preceding in None, 0, 1, 6:
+        for following in 0, 1, 3:
+            for agg, naive in aggregations:
+                expect = _window_naive(table, 0, 1, preceding, following,
+                                       naive)
+                actual = window(table, 'foo', 'bar',
+                                [('x', rolling('baz', agg, preceding,
+                                               following))])
+                ieq(expect, actual)
+                ieq(expect, actual)
+
+    expect = _window_naive(table, 0, 1, None, 0, sum)
+    ieq(expect, window(table, 'foo', 'bar', {'x': cumulative('baz', Sum())}))
+    ieq(expect, window(table, 'foo', 'bar', {'x': cumulative('baz', sum)}))
+
+
+def test_window():
+
+    table1 = (('foo', 'bar', 'baz'),
+              ('b', 2, 'x'),
+              ('a', 3, 'y'),
+              ('a', 1, 'z'),
+              ('b', 2, 'w'),
+              ('a', 3, 'v'),
+              ('a', 5, 'u'))
+    functions = OrderedDict()
+    functions['n'] = rownumber()
+    functions['rank'] = rank()
+    functions['dense'] = denserank()
+    functions['prev'] = lag('baz')
+    functions['prev2'] = lag('baz', 2, default='-')
+    functions['next'] = lead('baz')
+    functions['next2'] = lead(('baz', 'bar'), 2)
+    functions['count'] = rolling(None, Count(), preceding=None, following=1)
+    expect = (('foo', 'bar', 'baz', 'n', 'rank', 'dense', 'prev', 'prev2',
+               'next', 'next2', 'count'),
+              ('a', 1, 'z', 1, 1, 1, None, '-', 'y', ('v', 3), 2),
+              ('a', 3, 'y', 2, 2, 2, 'z', '-', 'v', ('u', 5), 3),
+              ('a', 3, 'v', 3, 2, 2, 'y', 'z', 'u', None, 4),
+              ('a', 5, 'u', 4, 4, 3, 'v', 'y', None, None, 4),
+              ('b', 2, 'x', 1, 1, 1, None, '-', 'w', None, 2),
+              ('b', 2, 'w', 2, 1, 1, 'x', '-', None, None, 2))
+    table2 = window(table1, 'foo', 'bar', functions)
+    ieq(expect, table2)
+    ieq(expect, table2)
+
+    # presorted
+    ieq(expect, window(sort(table1, ('foo', 'bar')), 'foo', 'bar',
+                       functions, presorted=True))
+
+    # no partitions, no order
+    table3 = window(table1, None, None, [('n', rownumber()),
+                                         ('rank', rank()),
+                                         ('prev', lag('bar'))])
+    expect3 = (('foo', 'bar', 'baz', 'n', 'rank', 'prev'),
+               ('b', 2, 'x', 1, 1, None),
+               ('a', 3, 'y', 2, 1, 2),
+               ('a', 1, 'z', 3, 1, 3),
+               ('b', 2, 'w', 4, 1, 1),
+               ('a', 3, 'v', 5, 1, 2),
+               ('a', 5, 'u', 6, 1, 3))
+    ieq(expect3, table3)
+
+    # descending order
+    table4 = window(table1, 'foo', 'bar', {'rank': rank()}, reverse=True)
+    expect4 = (('foo', 'bar', 'baz', 'rank'),
+               ('b', 2, 'x', 1),
+               ('b', 2, 'w', 1),
+               ('a', 5, 'u', 1),
+               ('a', 3, 'y', 2),
+               ('a', 3, 'v', 2),
+               ('a', 1, 'z', 4))
+    ieq(expect4, table4)
+
+    # empty table
+    ieq([('foo', 'bar', 'baz', 'n')],
+        window(table1[:1], 'foo', 'bar', {'n': rownumber()}))
+
+
+def test_window_errors():
+
+    for f in (lambda: rolling('bar', Sum(), preceding=-1),
+              lambda: rolling('bar', Sum(), following=None),
+              lambda: lag('bar', 0),
+              lambda: lead('bar', 1.5),
+              lambda: window([('foo',)], 'foo', None, {'x': len})):
+        try:
+            f()
+        except ArgumentError:
+            pass  # expected
+        else:
+            assert False, 'expected error'
@@ -279,3 +279,19 @@ def test_rowgroupby():
     eq_(2, len(vals))
     eq_(True, vals[0])
     eq_(None, vals[1])  # gets padded
+
+    # rows are only read as groups are
+    read = []
+
+    def rows():
+        yield ('foo', 'bar')
+        for i in range(2000):
+            read.append(i)
+            yield (i // 2, i)
+
+    g = rowgroupby(rows(), 'foo')
+    eq_([], read)
+    key, vals = next(g)
+    eq_(0, key)
+    eq_([0, 1], [v[1] for v in vals])
+    assert len(read) < 5
@@ -1,10 +1,14 @@
 from __future__ import absolute_import, print_function, division
 
 
-from petl.errors import DuplicateKeyError
+import os
+from tempfile import NamedTemporaryFile
+
+
+from petl.errors import DuplicateKeyError, ArgumentError
 from petl.test.helpers import eq_
 from petl import cut, lookup, lookupone, dictlookup, dictlookupone, \
-    recordlookup, recordlookupone
+    recordlookup, recordlookupone, DiskDict
 
 
 def test_lookup():
@@ -188,3 +192,80 @@ def test_recordlookupone():
     lkp = recordlookupone(cut(t1, 'foo'), 'foo', strict=False)
     eq_('a', lkp['a'].foo)
     eq_('b', lkp['b'].foo)
+
+
+def test_diskdict():
+
+    t1 = (('foo', 'bar'), ('a', 1), ('b', 2), ('b', 3))
+    f = NamedTemporaryFile(delete=False, suffix='.db')
+    f.close()
+    try:
+        with DiskDict(f.name, flag='n') as lkp:
+            actual = lookup(t1, 'foo', 'bar', lkp)
+            eq_({'a': [1], 'b': [2, 3]}, dict(actual))
+
+        # persisted
+        lkp = DiskDict(f.name, flag='r')
+        eq_([1], lkp['a'])
+        eq_([2, 3], lkp['b'])
+        assert 'c' not in lkp
+        eq_(2, len(lkp))
+        try:
+            lkp['c'] = [4]
+        except ArgumentError:
+            pass  # expected
+        else:
+            assert False, 'expected error'
+        lkp.close()
+
+        # more distinct reads than fit in the cache
+        with DiskDict(f.name, flag='n') as lkp:
+            for i in range(50):
+                lkp[i] = i * 2
+        with DiskDict(f.name, flag='r', cachesize=10) as lkp:
+            for i in range(60):
+                eq_(i * 2 if i < 50 else None, lkp.get(i))
+            eq_(20, lkp[10])
+
+        # new
+        with DiskDict(f.name, flag='n') as lkp:
+            assert not lkp
+    finally:
+        os.unlink(f.name)
+
+    # items evicted from the cache are written to the database
+    lkp = DiskDict(cachesize=10)
+    path = lkp.path
+    for i in range(100):
+        lkp[(i, 'x')] = i * 2
+    del lkp[(50, 'x')]
+    eq_(99, len(lkp))
+    eq_(20, lkp[(10, 'x')])
+    eq_(None, lkp.get((50, 'x')))
+    eq_(sorted((i, 'x') for i in range(100) if i != 50), sorted(lkp))
+    lkp.close()
+    assert not os.path.exists(path)
+
+    # equal numbers are the same key, as in a dict
+    from decimal import Decimal
+    with DiskDict() as lkp:
+        lkp[1] = 'a'
+        lkp[(2.0, 'x')] = 'b'
+        lkp[0.5] = 'c'
+        for key in 1, 1.0, True, Decimal('1.00'):
+            assert key in lkp
+            eq_('a', lkp[key])
+        eq_('b', lkp[(2, 'x')])
+        eq_('c', lkp[Decimal('0.5')])
+        assert 0 not in lkp
+        assert '1' not in lkp
+        eq_([(2, 'x'), 0.5, 1], sorted(lkp, key=repr))
+
+    # records are pickled with their fields
+    t2 = (('foo', 'bar'), ('a', 1), ('b', 2), ('b', 3), ('c', 4))
+    with DiskDict(cachesize=1) as lkp:
+        actual = recordlookup(t2, 'foo', lkp)
+        for key in 'a', 'b', 'c', 'a':
+            eq_([r[1] for r in t2[1:] if r[0] == key],
+                [rec.bar for rec in actual[key]])
+        eq_(['foo', 'bar'], actual['b'][1].flds)
@@ -11,7 +11,7 @@ from petl.transform.conversions import convert, convertall, replace, \
     replaceall, update, convertnumbers, format, formatall, interpolate, \
     interpolateall
 
-from petl.transform.sorts import sort, mergesort, issorted
+from petl.transform.sorts import sort, mergesort, issorted, topk, bottomk
 
 from petl.transform.selects import select, selectop, selectcontains, \
     selecteq, selectfalse, selectge, selectgt, selectin, selectis, \
@@ -21,14 +21,18 @@ from petl.transform.selects import select, selectop, selectcontains, \
     selectusingcontext, rowlenselect, facet, biselect
 
 from petl.transform.joins import join, leftjoin, rightjoin, outerjoin, \
-    crossjoin, antijoin, lookupjoin, unjoin
+    crossjoin, antijoin, lookupjoin, unjoin, asofjoin, semijoin
 
 from petl.transform.hashjoins import hashjoin, hashleftjoin, hashrightjoin, \
-    hashantijoin, hashlookupjoin
+    hashantijoin, hashlookupjoin, starjoin, hashsemijoin
 
 from petl.transform.reductions import rowreduce, mergeduplicates,\
     aggregate, groupcountdistinctvalues, groupselectfirst, groupselectmax, \
-    groupselectmin, merge, fold, Conflict, groupselectlast
+    groupselectmin, merge, fold, Conflict, groupselectlast, groupingsets, \
+    rollup, cube
+
+from petl.transform.windows import window, rolling, cumulative, rownumber, \
+    rank, denserank, lag, lead
 
 from petl.transform.fills import filldown, fillright, fillleft
 
@@ -10,6 +10,8 @@ from petl.compat import izip, izip_longest, next, string_types, text_type
 
 # internal dependencies
 from petl.util.base import asindices, rowgetter, Record, Table
+from petl.transform.sorts import SortView, sortedhead, getsortedby, \
+    keepsortedby
 
 
 import logging
@@ -121,6 +123,13 @@ class CutView(Table):
         self.spec = spec
         self.missing = missing
 
+    @property
+    def sortedby(self):
+        # N.B., key fields given as indices may have moved
+        spec = list(self.spec)
+        return keepsortedby(getsortedby(self.source),
+                            lambda f: not isinstance(f, int) and f in spec)
+
     def __iter__(self):
         return itercut(self.source, self.spec, self.missing)
 
@@ -193,6 +202,16 @@ class CutOutView(Table):
         self.spec = spec
         self.missing = missing
 
+    @property
+    def sortedby(self):
+        spec = list(self.spec)
+        if any(isinstance(f, int) for f in spec):
+            # can't tell which named fields are cut out without the header
+            return None
+        return keepsortedby(getsortedby(self.source),
+                            lambda f: not isinstance(f, int)
+                            and f not in spec)
+
     def __iter__(self):
         return itercutout(self.source, self.spec, self.missing)
 
@@ -721,6 +740,10 @@ class RowSliceView(Table):
         else:
             self.sliceargs = sliceargs
 
+    @property
+    def sortedby(self):
+        return getsortedby(self.source)
+
     def __iter__(self):
         return iterrowslice(self.source, self.sliceargs)
 
@@ -759,11 +782,20 @@ def head(table, n=5):
         | 'd' |   7 |
         +-----+-----+
 
+    If `table` is the result of :func:`petl.transform.sorts.sort`, the first
+    `n` rows of the sort are selected using a bounded heap rather than by
+    sorting the whole table (see :func:`petl.transform.sorts.topk`), as long
+    as `n` rows fit within the sort's `buffersize` and `memory_limit`.
+
     See also :func:`petl.transform.basics.tail`,
     :func:`petl.transform.basics.rowslice`.
 
     """
 
+    # N.B., if the rows wouldn't fit in the sort's buffer let the sort spill
+    if isinstance(table, SortView) and (table.buffersize is None
+                                        or n <= table.buffersize):
+        return sortedhead(table, n)
     return rowslice(table, n)
 
 
@@ -8,6 +8,7 @@ import petl.config as config
 from petl.errors import ArgumentError, FieldSelectionError
 from petl.util.base import Table, expr, header, Record
 from petl.util.parsers import numparser
+from petl.transform.sorts import getsortedby, keepsortedby
 
 
 def convert(table, *args, **kwargs):
@@ -341,6 +342,21 @@ class FieldConvertView(Table):
         self.where = where
         self.pass_row = pass_row
 
+    @property
+    def sortedby(self):
+        # the order of rows is preserved, but not of converted key values
+        converted = set(self.converters)
+
+        def unconverted(f):
+            # N.B., if fields are referred to by name in the key and by index
+            # in the converters (or vice versa) we can't tell which fields
+            # are converted without the header
+            return f not in converted and all(
+                isinstance(c, int) == isinstance(f, int) for c in converted
+            )
+
+        return keepsortedby(getsortedby(self.source), unconverted)
+
     def __iter__(self):
         return iterfieldconvert(self.source, self.converters, self.failonerror,
                                 self.errorvalue, self.where, self.pass_row)
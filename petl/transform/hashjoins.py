@@ -2,16 +2,32 @@ from __future__ import absolute_import, print_function, division
 
 
 import operator
+import itertools
+import logging
+import multiprocessing
+from collections import deque
 from petl.compat import next, text_type
 
 
+import petl.config as config
+from petl.errors import ArgumentError
 from petl.util.base import Table, asindices, rowgetter, iterpeek
 from petl.util.lookups import lookup, lookupone
 from petl.transform.joins import keys_from_args
+from petl.transform.sorts import _mergesorted
+from petl.spill import getcodec, parsesize, readchunk, iterchunk, \
+    dumpchunk, partitionrows, NamedTempFileDeleteOnGC
+
+
+logger = logging.getLogger(__name__)
+warning = logger.warning
+debug = logger.debug
 
 
 def hashjoin(left, right, key=None, lkey=None, rkey=None, cache=True,
-             lprefix=None, rprefix=None):
+             lprefix=None, rprefix=None, memory_limit=None, tempdir=None,
+             spill_codec=None, workers=None, preserve_order=False,
+             dictionary=None):
     """Alternative implementation of :func:`petl.transform.joins.join`, where
     the join is executed by constructing an in-memory lookup for the right
     hand table, then iterating over rows from the left hand table.
@@ -25,11 +41,49 @@ def hashjoin(left, right, key=None, lkey=None, rkey=None, cache=True,
     Left and right tables with different key fields can be handled via the
     `lkey` and `rkey` arguments.
 
+    If `memory_limit` is given, as a number of bytes or a string such as
+    ``'512MB'``, and the estimated size of the right hand table exceeds it,
+    both tables are hash-partitioned on the join key into temporary files in
+    `tempdir`, written with `spill_codec` (see
+    :func:`petl.transform.sorts.sort`), and the join is done one partition at
+    a time. The output contains the same rows as an in-memory join but
+    grouped by partition, so the order of rows will differ. If
+    `memory_limit` is `None`, the value of
+    `petl.config.hashjoin_memory_limit` will be used, which by default is
+    `None` (always join in memory). Data is not cached when the tables are
+    partitioned.
+
+    If `workers` is greater than 1, both tables are always hash-partitioned
+    into temporary files as above, and the partitions are joined by a pool of
+    `workers` processes. Each worker writes its output to a temporary file,
+    which is read back while the following partitions are joined, and at
+    most `workers` partitions are handed to the pool at any one time, so
+    memory use doesn't grow with the size of the tables. Rows are returned
+    grouped by partition unless `preserve_order` is `True`, in which case
+    they are returned in the same order as an in-memory join, i.e., in the
+    order of the left hand table, although no rows can be returned until all
+    partitions have been joined. If `workers` is `None`, the value of
+    `petl.config.hashjoin_workers` will be used, which by default is `None`
+    (join in the current process).
+
+    If `dictionary` is given, the lookup for the right hand table is loaded
+    into it instead of an in-memory :class:`dict`, e.g., a
+    :class:`petl.util.lookups.DiskDict` where the right hand table is too
+    large to fit in memory. If `dictionary` is not empty it is assumed to
+    already hold the lookup, as loaded by
+    :func:`petl.util.lookups.lookup` with the `rkey` fields, and only the
+    header of the right hand table is read, so a lookup saved to disk can be
+    reused across joins. The tables are not partitioned when `dictionary` is
+    given.
+
     """
     
     lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
     return HashJoinView(left, right, lkey=lkey, rkey=rkey, cache=cache,
-                        lprefix=lprefix, rprefix=rprefix)
+                        lprefix=lprefix, rprefix=rprefix,
+                        memory_limit=memory_limit, tempdir=tempdir,
+                        spill_codec=spill_codec, workers=workers,
+                        preserve_order=preserve_order, dictionary=dictionary)
 
 
 Table.hashjoin = hashjoin
@@ -38,7 +92,9 @@ Table.hashjoin = hashjoin
 class HashJoinView(Table):
     
     def __init__(self, left, right, lkey, rkey, cache=True, lprefix=None,
-                 rprefix=None):
+                 rprefix=None, memory_limit=None, tempdir=None,
+                 spill_codec=None, workers=None, preserve_order=False,
+                 dictionary=None):
         self.left = left
         self.right = right
         self.lkey = lkey
@@ -47,8 +103,32 @@ class HashJoinView(Table):
         self.rlookup = None
         self.lprefix = lprefix
         self.rprefix = rprefix
+        self.memory_limit = _memorylimit(memory_limit)
+        self.tempdir = tempdir
+        self.spill_codec = getcodec(spill_codec)
+        if workers is None:
+            self.workers = config.hashjoin_workers
+        else:
+            self.workers = workers
+        self.preserve_order = preserve_order
+        self.dictionary = dictionary
         
     def __iter__(self):
+        if self.dictionary is not None:
+            return iterhashjoin(self.left, self.right, self.lkey, self.rkey,
+                                _loadlookup(lookup, self.right, self.rkey,
+                                            self.dictionary),
+                                self.lprefix, self.rprefix)
+        if self.workers is not None and self.workers > 1:
+            return iterparallelhashjoin(self.left, self.right, self.lkey,
+                                        self.rkey, self.lprefix, self.rprefix,
+                                        self.spill_codec, self.tempdir,
+                                        self.workers, self.preserve_order)
+        if self.memory_limit is not None:
+            return itergracejoin(self.left, self.right, self.lkey, self.rkey,
+                                 'inner', None, self.lprefix, self.rprefix,
+                                 self.memory_limit, self.spill_codec,
+                                 self.tempdir)
         if not self.cache or self.rlookup is None:
             self.rlookup = lookup(self.right, self.rkey)
         return iterhashjoin(self.left, self.right, self.lkey, self.rkey,
@@ -105,7 +185,8 @@ def iterhashjoin(left, right, lkey, rkey, rlookup, lprefix, rprefix):
         
         
 def hashleftjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
-                 cache=True, lprefix=None, rprefix=None):
+                 cache=True, lprefix=None, rprefix=None, memory_limit=None,
+                 tempdir=None, spill_codec=None, dictionary=None):
     """Alternative implementation of :func:`petl.transform.joins.leftjoin`,
     where the join is executed by constructing an in-memory lookup for the
     right hand table, then iterating over rows from the left hand table.
@@ -119,11 +200,26 @@ def hashleftjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
     Left and right tables with different key fields can be handled via the
     `lkey` and `rkey` arguments.
 
+    The `memory_limit`, `tempdir` and `spill_codec` arguments are as for
+    :func:`hashjoin`.
+
+    If `dictionary` is given, the lookup for the right hand table is loaded
+    into it instead of an in-memory :class:`dict`, e.g., a
+    :class:`petl.util.lookups.DiskDict` where the right hand table is too
+    large to fit in memory. If `dictionary` is not empty it is assumed to
+    already hold the lookup, as loaded by
+    :func:`petl.util.lookups.lookup` with the `rkey` fields, and only the
+    header of the right hand table is read, so a lookup saved to disk can be
+    reused across joins. The tables are not partitioned when `dictionary` is
+    given.
+
     """
 
     lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
     return HashLeftJoinView(left, right, lkey, rkey, missing=missing,
-                            cache=cache, lprefix=lprefix, rprefix=rprefix)
+                            cache=cache, lprefix=lprefix, rprefix=rprefix,
+                            memory_limit=memory_limit, tempdir=tempdir,
+                            spill_codec=spill_codec, dictionary=dictionary)
 
 
 Table.hashleftjoin = hashleftjoin
@@ -132,7 +228,8 @@ Table.hashleftjoin = hashleftjoin
 class HashLeftJoinView(Table):
     
     def __init__(self, left, right, lkey, rkey, missing=None, cache=True,
-                 lprefix=None, rprefix=None):
+                 lprefix=None, rprefix=None, memory_limit=None, tempdir=None,
+                 spill_codec=None, dictionary=None):
         self.left = left
         self.right = right
         self.lkey = lkey
@@ -142,8 +239,23 @@ class HashLeftJoinView(Table):
         self.rlookup = None
         self.lprefix = lprefix
         self.rprefix = rprefix
+        self.memory_limit = _memorylimit(memory_limit)
+        self.tempdir = tempdir
+        self.spill_codec = getcodec(spill_codec)
+        self.dictionary = dictionary
 
     def __iter__(self):
+        if self.dictionary is not None:
+            return iterhashleftjoin(self.left, self.right, self.lkey,
+                                    self.rkey, self.missing,
+                                    _loadlookup(lookup, self.right, self.rkey,
+                                                self.dictionary),
+                                    self.lprefix, self.rprefix)
+        if self.memory_limit is not None:
+            return itergracejoin(self.left, self.right, self.lkey, self.rkey,
+                                 'left', self.missing, self.lprefix,
+                                 self.rprefix, self.memory_limit,
+                                 self.spill_codec, self.tempdir)
         if not self.cache or self.rlookup is None:
             self.rlookup = lookup(self.right, self.rkey)
         return iterhashleftjoin(self.left, self.right, self.lkey, self.rkey,
@@ -207,7 +319,8 @@ def iterhashleftjoin(left, right, lkey, rkey, missing, rlookup, lprefix,
         
         
 def hashrightjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
-                  cache=True, lprefix=None, rprefix=None):
+                  cache=True, lprefix=None, rprefix=None, memory_limit=None,
+                  tempdir=None, spill_codec=None):
     """Alternative implementation of :func:`petl.transform.joins.rightjoin`,
     where the join is executed by constructing an in-memory lookup for the
     left hand table, then iterating over rows from the right hand table.
@@ -221,11 +334,17 @@ def hashrightjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
     Left and right tables with different key fields can be handled via the
     `lkey` and `rkey` arguments.
 
+    The `memory_limit`, `tempdir` and `spill_codec` arguments are as for
+    :func:`hashjoin`, except it is the left hand table whose size is
+    estimated.
+
     """
 
     lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
     return HashRightJoinView(left, right, lkey, rkey, missing=missing,
-                             cache=cache, lprefix=lprefix, rprefix=rprefix)
+                             cache=cache, lprefix=lprefix, rprefix=rprefix,
+                             memory_limit=memory_limit, tempdir=tempdir,
+                             spill_codec=spill_codec)
 
 
 Table.hashrightjoin = hashrightjoin
@@ -234,7 +353,8 @@ Table.hashrightjoin = hashrightjoin
 class HashRightJoinView(Table):
     
     def __init__(self, left, right, lkey, rkey, missing=None, cache=True,
-                 lprefix=None, rprefix=None):
+                 lprefix=None, rprefix=None, memory_limit=None, tempdir=None,
+                 spill_codec=None):
         self.left = left
         self.right = right
         self.lkey = lkey
@@ -244,8 +364,16 @@ class HashRightJoinView(Table):
         self.llookup = None
         self.lprefix = lprefix
         self.rprefix = rprefix
+        self.memory_limit = _memorylimit(memory_limit)
+        self.tempdir = tempdir
+        self.spill_codec = getcodec(spill_codec)
 
     def __iter__(self):
+        if self.memory_limit is not None:
+            return itergracejoin(self.left, self.right, self.lkey, self.rkey,
+                                 'right', self.missing, self.lprefix,
+                                 self.rprefix, self.memory_limit,
+                                 self.spill_codec, self.tempdir)
         if not self.cache or self.llookup is None:
             self.llookup = lookup(self.left, self.lkey)
         return iterhashrightjoin(self.left, self.right, self.lkey, self.rkey,
@@ -313,7 +441,8 @@ def iterhashrightjoin(left, right, lkey, rkey, missing, llookup, lprefix,
             yield tuple(outrow)
         
         
-def hashantijoin(left, right, key=None, lkey=None, rkey=None):
+def hashantijoin(left, right, key=None, lkey=None, rkey=None,
+                 memory_limit=None, tempdir=None, spill_codec=None):
     """Alternative implementation of :func:`petl.transform.joins.antijoin`,
     where the join is executed by constructing an in-memory set for all keys
     found in the right hand table, then iterating over rows from the left
@@ -325,10 +454,15 @@ def hashantijoin(left, right, key=None, lkey=None, rkey=None):
     Left and right tables with different key fields can be handled via the
     `lkey` and `rkey` arguments.
 
+    The `memory_limit`, `tempdir` and `spill_codec` arguments are as for
+    :func:`hashjoin`.
+
     """
     
     lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
-    return HashAntiJoinView(left, right, lkey, rkey)
+    return HashAntiJoinView(left, right, lkey, rkey,
+                            memory_limit=memory_limit, tempdir=tempdir,
+                            spill_codec=spill_codec)
 
 
 Table.hashantijoin = hashantijoin
@@ -336,13 +470,21 @@ Table.hashantijoin = hashantijoin
 
 class HashAntiJoinView(Table):
     
-    def __init__(self, left, right, lkey, rkey):
+    def __init__(self, left, right, lkey, rkey, memory_limit=None,
+                 tempdir=None, spill_codec=None):
         self.left = left
         self.right = right
         self.lkey = lkey
         self.rkey = rkey
+        self.memory_limit = _memorylimit(memory_limit)
+        self.tempdir = tempdir
+        self.spill_codec = getcodec(spill_codec)
 
     def __iter__(self):
+        if self.memory_limit is not None:
+            return itergracejoin(self.left, self.right, self.lkey, self.rkey,
+                                 'anti', None, None, None, self.memory_limit,
+                                 self.spill_codec, self.tempdir)
         return iterhashantijoin(self.left, self.right, self.lkey, self.rkey)
     
     
@@ -373,8 +515,79 @@ def iterhashantijoin(left, right, lkey, rkey):
             yield tuple(lrow)
 
 
+def hashsemijoin(left, right, key=None, lkey=None, rkey=None,
+                 memory_limit=None, tempdir=None, spill_codec=None):
+    """Alternative implementation of :func:`petl.transform.joins.semijoin`,
+    where the join is executed by constructing an in-memory set for all keys
+    found in the right hand table, then iterating over rows from the left
+    hand table. Rows are returned in the order of the left hand table.
+
+    May be faster and/or more resource efficient where the right table is small
+    and the left table is large.
+
+    Left and right tables with different key fields can be handled via the
+    `lkey` and `rkey` arguments.
+
+    The `memory_limit`, `tempdir` and `spill_codec` arguments are as for
+    :func:`hashjoin`.
+
+    """
+
+    lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
+    return HashSemiJoinView(left, right, lkey, rkey,
+                            memory_limit=memory_limit, tempdir=tempdir,
+                            spill_codec=spill_codec)
+
+
+Table.hashsemijoin = hashsemijoin
+
+
+class HashSemiJoinView(Table):
+
+    def __init__(self, left, right, lkey, rkey, memory_limit=None,
+                 tempdir=None, spill_codec=None):
+        self.left = left
+        self.right = right
+        self.lkey = lkey
+        self.rkey = rkey
+        self.memory_limit = _memorylimit(memory_limit)
+        self.tempdir = tempdir
+        self.spill_codec = getcodec(spill_codec)
+
+    def __iter__(self):
+        if self.memory_limit is not None:
+            return itergracejoin(self.left, self.right, self.lkey, self.rkey,
+                                 'semi', None, None, None, self.memory_limit,
+                                 self.spill_codec, self.tempdir)
+        return iterhashsemijoin(self.left, self.right, self.lkey, self.rkey)
+
+
+def iterhashsemijoin(left, right, lkey, rkey):
+    lit = iter(left)
+    rit = iter(right)
+
+    lhdr = next(lit)
+    rhdr = next(rit)
+    yield tuple(lhdr)
+
+    # determine indices of the key fields in left and right tables
+    lkind = asindices(lhdr, lkey)
+    rkind = asindices(rhdr, rkey)
+
+    # construct functions to extract key values from both tables
+    lgetk = operator.itemgetter(*lkind)
+    rgetk = operator.itemgetter(*rkind)
+
+    rkeys = set(rgetk(rrow) for rrow in rit)
+
+    for lrow in lit:
+        if lgetk(lrow) in rkeys:
+            yield tuple(lrow)
+
+
 def hashlookupjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
-                   lprefix=None, rprefix=None):
+                   lprefix=None, rprefix=None, memory_limit=None, tempdir=None,
+                   spill_codec=None, dictionary=None):
     """Alternative implementation of :func:`petl.transform.joins.lookupjoin`,
     where the join is executed by constructing an in-memory lookup for the
     right hand table, then iterating over rows from the left hand table.
@@ -385,11 +598,26 @@ def hashlookupjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
     Left and right tables with different key fields can be handled via the
     `lkey` and `rkey` arguments.
 
+    The `memory_limit`, `tempdir` and `spill_codec` arguments are as for
+    :func:`hashjoin`.
+
+    If `dictionary` is given, the lookup for the right hand table is loaded
+    into it instead of an in-memory :class:`dict`, e.g., a
+    :class:`petl.util.lookups.DiskDict` where the right hand table is too
+    large to fit in memory. If `dictionary` is not empty it is assumed to
+    already hold the lookup, as loaded by
+    :func:`petl.util.lookups.lookupone` with the `rkey` fields, and only the
+    header of the right hand table is read, so a lookup saved to disk can be
+    reused across joins. The tables are not partitioned when `dictionary` is
+    given.
+
     """
 
     lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
     return HashLookupJoinView(left, right, lkey, rkey, missing=missing,
-                              lprefix=lprefix, rprefix=rprefix)
+                              lprefix=lprefix, rprefix=rprefix,
+                              memory_limit=memory_limit, tempdir=tempdir,
+                              spill_codec=spill_codec, dictionary=dictionary)
 
 
 Table.hashlookupjoin = hashlookupjoin
@@ -398,7 +626,8 @@ Table.hashlookupjoin = hashlookupjoin
 class HashLookupJoinView(Table):
 
     def __init__(self, left, right, lkey, rkey, missing=None, lprefix=None,
-                 rprefix=None):
+                 rprefix=None, memory_limit=None, tempdir=None,
+                 spill_codec=None, dictionary=None):
         self.left = left
         self.right = right
         self.lkey = lkey
@@ -406,18 +635,36 @@ class HashLookupJoinView(Table):
         self.missing = missing
         self.lprefix = lprefix
         self.rprefix = rprefix
+        self.memory_limit = _memorylimit(memory_limit)
+        self.tempdir = tempdir
+        self.spill_codec = getcodec(spill_codec)
+        self.dictionary = dictionary
 
     def __iter__(self):
+        if self.dictionary is not None:
+            return iterhashlookupjoin(self.left, self.right, self.lkey,
+                                      self.rkey, self.missing, self.lprefix,
+                                      self.rprefix,
+                                      dictionary=self.dictionary)
+        if self.memory_limit is not None:
+            return itergracejoin(self.left, self.right, self.lkey, self.rkey,
+                                 'lookup', self.missing, self.lprefix,
+                                 self.rprefix, self.memory_limit,
+                                 self.spill_codec, self.tempdir)
         return iterhashlookupjoin(self.left, self.right, self.lkey, self.rkey,
                                   self.missing, self.lprefix, self.rprefix)
 
 
-def iterhashlookupjoin(left, right, lkey, rkey, missing, lprefix, rprefix):
+def iterhashlookupjoin(left, right, lkey, rkey, missing, lprefix, rprefix,
+                       dictionary=None):
     lit = iter(left)
     lhdr = next(lit)
 
     rhdr, rit = iterpeek(right)  # need the whole lot to pass to lookup
-    rlookup = lookupone(rit, rkey, strict=False)
+    if dictionary is None:
+        rlookup = lookupone(rit, rkey, strict=False)
+    else:
+        rlookup = _loadlookup(lookupone, rit, rkey, dictionary)
 
     # determine indices of the key fields in left and right tables
     lkind = asindices(lhdr, lkey)
@@ -463,3 +710,382 @@ def iterhashlookupjoin(left, right, lkey, rkey, missing, lprefix, rprefix):
             # extend with missing values in place of the right row
             outrow.extend([missing] * len(rvind))
             yield tuple(outrow)
+
+
+def starjoin(fact, dimensions, prefixes=None, inner=False, missing=None,
+             cache=True):
+    """Join the `fact` table against several dimension tables in a single
+    pass, as for a chain of :func:`hashleftjoin` (or :func:`hashjoin`)
+    calls but without building intermediate rows. E.g.::
+
+        >>> import petl as etl
+        >>> sales = [['product', 'store', 'qty'],
+        ...          ['p1', 's1', 3],
+        ...          ['p2', 's1', 1],
+        ...          ['p1', 's3', 7]]
+        >>> products = [['product', 'name'],
+        ...             ['p1', 'widget'],
+        ...             ['p2', 'gadget']]
+        >>> stores = [['id', 'city'],
+        ...           ['s1', 'Leeds'],
+        ...           ['s2', 'York']]
+        >>> table1 = etl.starjoin(sales, [(products, 'product'),
+        ...                               (stores, 'store', 'id')])
+        >>> table1
+        +---------+-------+-----+----------+---------+
+        | product | store | qty | name     | city    |
+        +=========+=======+=====+==========+=========+
+        | 'p1'    | 's1'  |   3 | 'widget' | 'Leeds' |
+        +---------+-------+-----+----------+---------+
+        | 'p2'    | 's1'  |   1 | 'gadget' | 'Leeds' |
+        +---------+-------+-----+----------+---------+
+        | 'p1'    | 's3'  |   7 | 'widget' | None    |
+        +---------+-------+-----+----------+---------+
+
+        >>> table2 = etl.starjoin(sales, [(products, 'product'),
+        ...                               (stores, 'store', 'id')],
+        ...                       prefixes=['product_', 'store_'],
+        ...                       inner=[False, True])
+        >>> table2
+        +---------+-------+-----+--------------+------------+
+        | product | store | qty | product_name | store_city |
+        +=========+=======+=====+==============+============+
+        | 'p1'    | 's1'  |   3 | 'widget'     | 'Leeds'    |
+        +---------+-------+-----+--------------+------------+
+        | 'p2'    | 's1'  |   1 | 'gadget'     | 'Leeds'    |
+        +---------+-------+-----+--------------+------------+
+
+    Each item of `dimensions` is either a ``(table, key)`` tuple, where the
+    key field or fields have the same names in the fact and dimension
+    tables, or a ``(table, lkey, rkey)`` tuple, where `lkey` names the fields
+    in the fact table and `rkey` the fields in the dimension table. The
+    non-key fields of each dimension table are appended to the fact table
+    fields in turn, with the corresponding string from `prefixes` (if given)
+    prepended to their names.
+
+    If `inner` is `False`, fact rows without a matching row in a dimension
+    table are kept, with `missing` in place of that dimension's fields, as
+    for :func:`hashleftjoin`. If `inner` is `True` such rows are dropped, as
+    for :func:`hashjoin`. To choose per dimension, pass a list of booleans.
+    If a key matches more than one row in a dimension table, a fact row is
+    output once for each match.
+
+    A lookup is constructed in memory for every dimension table, and by
+    default these are cached between iterations.
+
+    """
+
+    return StarJoinView(fact, dimensions, prefixes=prefixes, inner=inner,
+                        missing=missing, cache=cache)
+
+
+Table.starjoin = starjoin
+
+
+class StarJoinView(Table):
+
+    def __init__(self, fact, dimensions, prefixes=None, inner=False,
+                 missing=None, cache=True):
+        self.fact = fact
+        self.dimensions = list()
+        for dim in dimensions:
+            if len(dim) == 2:
+                table, lkey, rkey = dim[0], dim[1], dim[1]
+            elif len(dim) == 3:
+                table, lkey, rkey = dim
+            else:
+                raise ArgumentError('expected (table, key) or (table, lkey, '
+                                    'rkey) for each dimension, found %r'
+                                    % (dim,))
+            self.dimensions.append((table, lkey, rkey))
+        n = len(self.dimensions)
+        if prefixes is None:
+            prefixes = [None] * n
+        if isinstance(inner, bool):
+            inner = [inner] * n
+        if len(prefixes) != n or len(inner) != n:
+            raise ArgumentError('expected prefixes and inner for %s '
+                                'dimensions' % n)
+        self.prefixes = list(prefixes)
+        self.inner = list(inner)
+        self.missing = missing
+        self.cache = cache
+        self.lookups = None
+
+    def __iter__(self):
+        if not self.cache or self.lookups is None:
+            self.lookups = [_dimensionlookup(table, rkey)
+                            for table, _, rkey in self.dimensions]
+        return iterstarjoin(self.fact, self.dimensions, self.lookups,
+                            self.prefixes, self.inner, self.missing)
+
+
+def _dimensionlookup(table, key):
+    # map key values to the list of non-key value tuples for each matching
+    # row, so the rows don't need slicing again for every fact row
+    it = iter(table)
+    hdr = next(it)
+    kind = asindices(hdr, key)
+    getkey = operator.itemgetter(*kind)
+    vind = [i for i in range(len(hdr)) if i not in kind]
+    getvalue = rowgetter(*vind)
+    d = dict()
+    for row in it:
+        k = getkey(row)
+        if k in d:
+            d[k].append(getvalue(row))
+        else:
+            d[k] = [getvalue(row)]
+    return [getvalue(hdr), d]
+
+
+def iterstarjoin(fact, dimensions, lookups, prefixes, inner, missing):
+    it = iter(fact)
+    hdr = next(it)
+
+    outhdr = list(hdr)
+    plan = list()
+    for (_, lkey, _), (fields, d), prefix, isinner in zip(dimensions,
+                                                           lookups, prefixes,
+                                                           inner):
+        if prefix is None:
+            outhdr.extend(fields)
+        else:
+            outhdr.extend(text_type(prefix) + text_type(f) for f in fields)
+        getkey = operator.itemgetter(*asindices(hdr, lkey))
+        # the values to use when there's no match, or None to drop the row
+        pad = None if isinner else [tuple([missing] * len(fields))]
+        plan.append((getkey, d.get, pad))
+    yield tuple(outhdr)
+
+    for row in it:
+        matches = list()
+        product = False
+        for getkey, get, pad in plan:
+            values = get(getkey(row), pad)
+            if values is None:
+                break
+            if len(values) > 1:
+                product = True
+            matches.append(values)
+        else:
+            if product:
+                for combination in itertools.product(*matches):
+                    outrow = list(row)
+                    for values in combination:
+                        outrow.extend(values)
+                    yield tuple(outrow)
+            else:
+                outrow = list(row)
+                for values in matches:
+                    outrow.extend(values[0])
+                yield tuple(outrow)
+
+
+def _loadlookup(f, table, key, dictionary):
+    # a non-empty dictionary holds a lookup built earlier, e.g., a DiskDict
+    # opened on a database saved by a previous run
+    if dictionary:
+        debug('reusing lookup in %r', dictionary)
+        return dictionary
+    return f(table, key, dictionary=dictionary)
+
+
+def _memorylimit(memory_limit):
+    if memory_limit is None:
+        memory_limit = config.hashjoin_memory_limit
+    return parsesize(memory_limit)
+
+
+def _joinpartition(kind, left, right, lkey, rkey, missing, lprefix, rprefix):
+    # join tables held in memory with the in-memory implementation of the
+    # given kind of join, the header is the first row yielded
+    if kind == 'inner':
+        return iterhashjoin(left, right, lkey, rkey, lookup(right, rkey),
+                            lprefix, rprefix)
+    elif kind == 'left':
+        return iterhashleftjoin(left, right, lkey, rkey, missing,
+                                lookup(right, rkey), lprefix, rprefix)
+    elif kind == 'right':
+        return iterhashrightjoin(left, right, lkey, rkey, missing,
+                                 lookup(left, lkey), lprefix, rprefix)
+    elif kind == 'anti':
+        return iterhashantijoin(left, right, lkey, rkey)
+    elif kind == 'semi':
+        return iterhashsemijoin(left, right, lkey, rkey)
+    else:
+        return iterhashlookupjoin(left, right, lkey, rkey, missing, lprefix,
+                                  rprefix)
+
+
+def _iterpartition(f, codec):
+    if f is None:
+        return iter([])
+    return iterchunk(f.name, codec)
+
+
+# maximum number of times a partition which is still too big to fit within
+# the memory limit is split again, a single very common key can't be split
+_gracemaxdepth = 3
+
+
+def itergracejoin(left, right, lkey, rkey, kind, missing, lprefix, rprefix,
+                  memory_limit, spill_codec, tempdir):
+    # the right table is loaded into memory, except for right joins where
+    # the left table is loaded and the right table is streamed
+    buildright = kind != 'right'
+    lit = iter(left)
+    rit = iter(right)
+    lhdr = next(lit)
+    rhdr = next(rit)
+    lkind = asindices(lhdr, lkey)
+    rkind = asindices(rhdr, rkey)
+    if buildright:
+        bhdr, bit, bgetk = rhdr, rit, operator.itemgetter(*rkind)
+        phdr, pit, pgetk = lhdr, lit, operator.itemgetter(*lkind)
+    else:
+        bhdr, bit, bgetk = lhdr, lit, operator.itemgetter(*lkind)
+        phdr, pit, pgetk = rhdr, rit, operator.itemgetter(*rkind)
+
+    def joinrows(brows, prows):
+        build = [bhdr] + brows
+        probe = itertools.chain([phdr], prows)
+        if buildright:
+            return _joinpartition(kind, probe, build, lkey, rkey, missing,
+                                  lprefix, rprefix)
+        else:
+            return _joinpartition(kind, build, probe, lkey, rkey, missing,
+                                  lprefix, rprefix)
+
+    def iterpartitions(brows, prows, depth):
+        nparts = config.hashjoin_partitions
+        debug('hash-partitioning join inputs into %s partitions, depth %s',
+              nparts, depth)
+        bparts = partitionrows(brows, bgetk, nparts, spill_codec, tempdir,
+                               salt=depth)
+        pparts = partitionrows(prows, pgetk, nparts, spill_codec, tempdir,
+                               salt=depth)
+        for i in range(nparts):
+            if pparts[i] is None:
+                # every kind of join outputs rows per probe row
+                continue
+            brows = _iterpartition(bparts[i], spill_codec)
+            prows = _iterpartition(pparts[i], spill_codec)
+            buf = readchunk(brows, None, memory_limit)
+            try:
+                nxt = next(brows)
+            except StopIteration:
+                fits = True
+            else:
+                fits = False
+                brows = itertools.chain(buf, [nxt], brows)
+            if fits:
+                out = itertools.islice(joinrows(buf, prows), 1, None)
+            elif depth < _gracemaxdepth:
+                out = iterpartitions(brows, prows, depth + 1)
+            else:
+                warning('join partition exceeds memory limit after %s '
+                        'splits, joining in memory', depth + 1)
+                out = itertools.islice(joinrows(list(brows), prows), 1, None)
+            for row in out:
+                yield row
+            # N.B., make sure files are closed before they are deleted
+            del brows, prows, buf, out
+            bparts[i] = pparts[i] = None
+
+    # try to load the whole of the build table within the memory limit
+    buf = readchunk(bit, None, memory_limit)
+    try:
+        nxt = next(bit)
+    except StopIteration:
+        debug('join fits within memory limit')
+        for row in joinrows(buf, pit):
+            yield row
+        return
+
+    # too big, join partition by partition
+    yield next(joinrows([], []))
+    for row in iterpartitions(itertools.chain(buf, [nxt], bit), pit, 0):
+        yield row
+
+
+def _joinpartitionfiles(lhdr, rhdr, lkey, rkey, lprefix, rprefix, lpart,
+                        rpart, codec, tempdir):
+    # runs in a worker process, joins one pair of partition files and writes
+    # the output rows to a new temporary file
+    left = itertools.chain([lhdr], iterchunk(lpart, codec))
+    right = [rhdr] + list(iterchunk(rpart, codec))
+    rows = _joinpartition('inner', left, right, lkey, rkey, None, lprefix,
+                          rprefix)
+    return dumpchunk(itertools.islice(rows, 1, None), codec, tempdir)
+
+
+def iterparallelhashjoin(left, right, lkey, rkey, lprefix, rprefix,
+                         spill_codec, tempdir, workers, preserve_order):
+    lit = iter(left)
+    rit = iter(right)
+    lhdr = tuple(next(lit))
+    rhdr = tuple(next(rit))
+    lkind = asindices(lhdr, lkey)
+    rkind = asindices(rhdr, rkey)
+
+    # output header
+    yield next(_joinpartition('inner', [lhdr], [rhdr], lkey, rkey, None,
+                              lprefix, rprefix))
+
+    if preserve_order:
+        # number each left row in an extra first field, carried through to
+        # the output, so outputs of different partitions can be merged back
+        # into the order of the left table
+        lit = ((i,) + tuple(row) for i, row in enumerate(lit))
+        lhdr = (None,) + lhdr
+        lkind = [i + 1 for i in lkind]
+        # N.B., key fields are now given by index
+        lkey = lkind
+        rkey = rkind
+
+    nparts = max(workers, config.hashjoin_partitions)
+    debug('hash-partitioning join inputs into %s partitions', nparts)
+    lparts = partitionrows(lit, operator.itemgetter(*lkind), nparts,
+                           spill_codec, tempdir)
+    rparts = partitionrows(rit, operator.itemgetter(*rkind), nparts,
+                           spill_codec, tempdir)
+
+    # N.B., an inner join has no output for a partition with no rows on
+    # either side
+    parts = [(lpart, rpart) for lpart, rpart in zip(lparts, rparts)
+             if lpart is not None and rpart is not None]
+    outfiles = []
+    pending = deque()
+    pool = multiprocessing.Pool(workers)
+    try:
+        for i, (lpart, rpart) in enumerate(parts):
+            pending.append(pool.apply_async(
+                _joinpartitionfiles,
+                (lhdr, rhdr, lkey, rkey, lprefix, rprefix, lpart.name,
+                 rpart.name, spill_codec, tempdir)
+            ))
+            # don't let the workers run too far ahead of the reader, once
+            # all partitions are submitted wait for the rest
+            last = i == len(parts) - 1
+            while len(pending) >= workers or (last and pending):
+                f = NamedTempFileDeleteOnGC(pending.popleft().get())
+                if preserve_order:
+                    outfiles.append(f)
+                else:
+                    for row in iterchunk(f.name, spill_codec):
+                        yield tuple(row)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    del parts, lparts, rparts
+
+    if preserve_order:
+        # each left row was joined within a single partition, so merging on
+        # the row number restores the order of the left table
+        chunkiters = [iterchunk(f.name, spill_codec) for f in outfiles]
+        for row in _mergesorted(operator.itemgetter(0), False, *chunkiters):
+            yield tuple(row[1:])
@@ -7,6 +7,7 @@ from petl.errors import FieldSelectionError
 
 
 from petl.util.base import Table, asindices, rowgetter
+from petl.transform.sorts import getsortedby, keepsortedby
 
 
 def rename(table, *args, **kwargs):
@@ -70,6 +71,21 @@ class RenameView(Table):
             self.spec = {args[0]: args[1]}
         self.strict = kwargs.get('strict', True)
 
+    @property
+    def sortedby(self):
+        sortedby = getsortedby(self.source)
+        if sortedby is None or sortedby[0] is None:
+            return sortedby
+        fields, reverse = sortedby
+        if any(isinstance(f, int) for f in self.spec):
+            # can't tell which named fields are renamed without the header
+            sortedby = keepsortedby(sortedby, lambda f: isinstance(f, int))
+            if sortedby is None:
+                return None
+            fields, reverse = sortedby
+        return tuple(self.spec.get(f, f) if not isinstance(f, int) else f
+                     for f in fields), reverse
+
     def __iter__(self):
         return iterrename(self.source, self.spec, self.strict)
 
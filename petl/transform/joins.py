@@ -1,18 +1,32 @@
 from __future__ import absolute_import, print_function, division
 
 
+import os
 import itertools
 import operator
-from petl.compat import next, text_type
+import logging
+from collections import deque
+from petl.compat import next, text_type, string_types
 
 
 from petl.errors import ArgumentError
-from petl.comparison import comparable_itemgetter, Comparable
+from petl.comparison import Comparable, sortable_itemgetter, \
+    sample_keytypes, combine_keytypes, peek_sample
 from petl.util.base import Table, asindices, rowgetter, rowgroupby, \
-    header, data
-from petl.transform.sorts import sort
+    header, data, expr, Record
+import petl.config as config
+from petl.transform.sorts import sort, getsortedby, _satisfiessort
+from petl.bloom import keybloomfilter
 from petl.transform.basics import cut, cutout
 from petl.transform.dedup import distinct
+from petl.util.lookups import DiskDict
+from petl.spill import getcodec, dumpchunk, iterchunk, \
+    NamedTempFileDeleteOnGC
+
+
+logger = logging.getLogger(__name__)
+info = logger.info
+debug = logger.debug
 
 
 def natural_key(left, right):
@@ -48,7 +62,8 @@ def keys_from_args(left, right, key, lkey, rkey):
 
 
 def join(left, right, key=None, lkey=None, rkey=None, presorted=False,
-         buffersize=None, tempdir=None, cache=True, lprefix=None, rprefix=None):
+         buffersize=None, tempdir=None, cache=True, lprefix=None, rprefix=None,
+         bloom=False, strategy=None):
     """
     Perform an equi-join on the given tables. E.g.::
 
@@ -135,13 +150,56 @@ def join(left, right, key=None, lkey=None, rkey=None, presorted=False,
     Left and right tables with different key fields can be handled via the
     `lkey` and `rkey` arguments.
 
+    If `bloom` is True, a Bloom filter (see :class:`petl.bloom.BloomFilter`)
+    is built from the key values in the right table, and left rows whose key
+    is definitely not in the right table are discarded before the left table
+    is sorted. This can save much of the cost of sorting where the left table
+    is large and few of its rows have a match in the right table. The right
+    table is read twice more to build the filter. The false positive rate
+    and memory used by the filter are controlled by
+    `petl.config.bloom_error_rate` and `petl.config.bloom_maxbytes`, or
+    `bloom` may be a dictionary of `error_rate` and `maxbytes` arguments for
+    the filter. Once the join has been iterated, the filter is available as
+    the `bloomfilter` attribute of the returned table, where its `hits` and
+    `misses` attributes count the left rows kept and discarded.
+
+    The `strategy` argument selects how the join is performed. With
+    ``'sort'`` both tables are sorted by the key (unless `presorted` is
+    True) and merged, as described above. With ``'hash'`` the join is done
+    by :func:`petl.transform.hashjoins.hashjoin`, which loads the right
+    table into memory and returns rows in the order of the left table.
+    With ``'auto'`` the strategy is chosen when the join is first iterated:
+    if both tables are known to be sorted by the key (see
+    :func:`petl.transform.sorts.getsortedby`) they are merged without
+    sorting, otherwise if the right table is estimated to have no more rows
+    than `buffersize` (or `petl.config.sort_buffersize`) it is hash joined,
+    otherwise both tables are sorted and merged. The number of rows is taken
+    from :func:`len` where the table supports it, estimated from the size
+    of the file for tables read from a local file, and otherwise counted up
+    to the limit. The choice is logged and is available as the `strategy`
+    attribute of the returned table, with the reason as `strategy_reason`.
+    Note that a hash join returns the same rows as a sort join, but not in
+    the same order. If `strategy` is `None`, the value of
+    `petl.config.join_strategy` will be used, which by default is
+    ``'sort'``.
+
     """
 
     # TODO don't read data twice (occurs if using natural key)
     lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
-    return JoinView(left, right, lkey=lkey, rkey=rkey,
-                    presorted=presorted, buffersize=buffersize, tempdir=tempdir,
-                    cache=cache, lprefix=lprefix, rprefix=rprefix)
+    if strategy is None:
+        strategy = config.join_strategy
+    if strategy not in ('sort', 'hash', 'auto'):
+        raise ArgumentError('unknown join strategy %r' % strategy)
+    if strategy == 'sort' or presorted:
+        return JoinView(left, right, lkey=lkey, rkey=rkey,
+                        presorted=presorted, buffersize=buffersize,
+                        tempdir=tempdir, cache=cache, lprefix=lprefix,
+                        rprefix=rprefix, bloom=bloom)
+    return AutoJoinView(left, right, lkey=lkey, rkey=rkey,
+                        buffersize=buffersize, tempdir=tempdir, cache=cache,
+                        lprefix=lprefix, rprefix=rprefix, bloom=bloom,
+                        strategy=strategy)
 
 
 Table.join = join
@@ -152,17 +210,29 @@ class JoinView(Table):
     def __init__(self, left, right, lkey, rkey,
                  presorted=False, leftouter=False, rightouter=False,
                  missing=None, buffersize=None, tempdir=None, cache=True,
-                 lprefix=None, rprefix=None):
+                 lprefix=None, rprefix=None, bloom=False):
         self.lkey = lkey
         self.rkey = rkey
         if presorted:
-            self.left = left
             self.right = right
         else:
-            self.left = sort(left, lkey, buffersize=buffersize,
-                             tempdir=tempdir, cache=cache)
             self.right = sort(right, rkey, buffersize=buffersize,
                               tempdir=tempdir, cache=cache)
+        self.bloomview = None
+        if bloom:
+            if leftouter:
+                raise ArgumentError('cannot discard left rows from a left '
+                                    'outer join')
+            bloomargs = bloom if isinstance(bloom, dict) else dict()
+            # N.B., the filter is built from the sorted right table, so the
+            # sort is cached for the join
+            left = self.bloomview = BloomSelectView(left, lkey, self.right,
+                                                    rkey, **bloomargs)
+        if presorted:
+            self.left = left
+        else:
+            self.left = sort(left, lkey, buffersize=buffersize,
+                             tempdir=tempdir, cache=cache)
         self.leftouter = leftouter
         self.rightouter = rightouter
         self.missing = missing
@@ -175,6 +245,160 @@ class JoinView(Table):
                         missing=self.missing, lprefix=self.lprefix,
                         rprefix=self.rprefix)
 
+    @property
+    def bloomfilter(self):
+        if self.bloomview is None:
+            return None
+        return self.bloomview.bloomfilter
+
+
+class BloomSelectView(Table):
+
+    def __init__(self, source, key, other, otherkey, error_rate=None,
+                 maxbytes=None):
+        self.source = source
+        self.key = key
+        self.other = other
+        self.otherkey = otherkey
+        self.error_rate = error_rate
+        self.maxbytes = maxbytes
+        self.bloomfilter = None
+
+    @property
+    def sortedby(self):
+        return getsortedby(self.source)
+
+    def __iter__(self):
+        self.bloomfilter = keybloomfilter(self.other, self.otherkey,
+                                          error_rate=self.error_rate,
+                                          maxbytes=self.maxbytes)
+        return iterbloomselect(self.source, self.key, self.bloomfilter)
+
+
+def iterbloomselect(source, key, bloomfilter):
+    it = iter(source)
+    hdr = next(it)
+    yield tuple(hdr)
+    getkey = operator.itemgetter(*asindices(hdr, key))
+    for row in it:
+        if getkey(row) in bloomfilter:
+            yield tuple(row)
+    debug('bloom filter kept %s rows, discarded %s', bloomfilter.hits,
+          bloomfilter.misses)
+
+
+class AutoJoinView(Table):
+
+    def __init__(self, left, right, lkey, rkey, buffersize=None, tempdir=None,
+                 cache=True, lprefix=None, rprefix=None, bloom=False,
+                 strategy='auto'):
+        self.left = left
+        self.right = right
+        self.lkey = lkey
+        self.rkey = rkey
+        self.buffersize = buffersize
+        self.tempdir = tempdir
+        self.cache = cache
+        self.lprefix = lprefix
+        self.rprefix = rprefix
+        self.bloom = bloom
+        self.requested = strategy
+        self._view = None
+        self._strategy = None
+        self._reason = None
+
+    @property
+    def strategy(self):
+        self._choose()
+        return self._strategy
+
+    @property
+    def strategy_reason(self):
+        self._choose()
+        return self._reason
+
+    def _choose(self):
+        if self._view is not None:
+            return
+        if self.requested == 'hash':
+            strategy, reason = 'hash', 'requested'
+        else:
+            strategy, reason = choosejoinstrategy(self.left, self.right,
+                                                  self.lkey, self.rkey,
+                                                  self.buffersize)
+        info('join strategy %r: %s', strategy, reason)
+        if strategy == 'hash':
+            # N.B., imported here as hashjoins imports from this module
+            from petl.transform.hashjoins import HashJoinView
+            view = HashJoinView(self.left, self.right, lkey=self.lkey,
+                                rkey=self.rkey, cache=self.cache,
+                                lprefix=self.lprefix, rprefix=self.rprefix)
+        else:
+            view = JoinView(self.left, self.right, lkey=self.lkey,
+                            rkey=self.rkey, presorted=strategy == 'merge',
+                            buffersize=self.buffersize, tempdir=self.tempdir,
+                            cache=self.cache, lprefix=self.lprefix,
+                            rprefix=self.rprefix, bloom=self.bloom)
+        self._view = view
+        self._strategy = strategy
+        self._reason = reason
+
+    @property
+    def bloomfilter(self):
+        return getattr(self._view, 'bloomfilter', None)
+
+    def __iter__(self):
+        self._choose()
+        return iter(self._view)
+
+
+def estimaterows(table, limit=None):
+    """Estimate the number of data rows in `table` without reading all of
+    it, returning a tuple of the estimate and how it was made. Uses
+    :func:`len` where the table supports it (less one for the header), or
+    the size of the file for tables read directly from a local file divided
+    by the average size of the first rows, or else counts the rows,
+    stopping once more than `limit` rows have been found."""
+
+    if isinstance(table, (list, tuple)):
+        return max(0, len(table) - 1), 'len'
+    filesource = getattr(table, 'source', None)
+    filename = getattr(filesource, 'filename', None)
+    if isinstance(filename, string_types) and os.path.isfile(filename):
+        sample = list(itertools.islice(table, 0, 101))
+        if len(sample) < 2:
+            return 0, 'file size'
+
+        # approximate the size of a row as written to a delimited file, with
+        # a delimiter after each value and a two character line terminator
+        def rowbytes(row):
+            return sum(len(text_type(v)) + 1 for v in row) + 1
+
+        size = os.path.getsize(filename) - rowbytes(sample[0])
+        avgbytes = sum(rowbytes(row) for row in sample[1:]) / (len(sample) - 1)
+        return int(round(size / avgbytes)), 'file size'
+    it = itertools.islice(table, 1, None if limit is None else limit + 2)
+    return sum(1 for _ in it), 'count'
+
+
+def choosejoinstrategy(left, right, lkey, rkey, buffersize=None):
+    """Choose how to join the given tables, returning a tuple of the
+    strategy, one of 'merge', 'hash' or 'sort', and the reason."""
+
+    if _satisfiessort(getsortedby(left), lkey, False) \
+            and _satisfiessort(getsortedby(right), rkey, False):
+        return 'merge', 'both tables are sorted by the key'
+    if buffersize is None:
+        buffersize = config.sort_buffersize
+    if buffersize is None:
+        return 'hash', 'no limit on rows held in memory'
+    nrows, method = estimaterows(right, buffersize)
+    if nrows <= buffersize:
+        return 'hash', 'right table has about %s rows (by %s), within ' \
+                       'buffer of %s rows' % (nrows, method, buffersize)
+    return 'sort', 'right table has more than %s rows (by %s)' \
+                   % (buffersize, method)
+
 
 def leftjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
              presorted=False, buffersize=None, tempdir=None, cache=True,
@@ -338,9 +562,14 @@ def iterjoin(left, right, lkey, rkey, leftouter=False, rightouter=False,
     lkind = asindices(lhdr, lkey)
     rkind = asindices(rhdr, rkey)
 
-    # construct functions to extract key values from both tables
-    lgetk = comparable_itemgetter(*lkind)
-    rgetk = comparable_itemgetter(*rkind)
+    # construct functions to extract key values from both tables, using
+    # native comparison where both tables hold the same types of key values
+    lsample, lit = peek_sample(lit)
+    rsample, rit = peek_sample(rit)
+    keytypes = combine_keytypes(sample_keytypes(lsample, lkind),
+                                sample_keytypes(rsample, rkind))
+    lgetk = sortable_itemgetter(keytypes, *lkind)
+    rgetk = sortable_itemgetter(keytypes, *rkind)
 
     # determine indices of non-key fields in the right table
     # (in the output, we only include key fields from the left table - we
@@ -476,6 +705,36 @@ def crossjoin(*tables, **kwargs):
     If `prefix` is `True` then field names in the output table header will be
     prefixed by the index of the input table.
 
+    If `predicate` is given, only rows for which it returns `True` are
+    included, allowing a join on an arbitrary condition without creating the
+    full product. The predicate is called with each row as a record, and may
+    be an expression string as for :func:`petl.transform.selects.select`,
+    e.g.::
+
+        >>> table4 = etl.crossjoin(table1, table2, prefix=True,
+        ...                        predicate='{1_id} < {2_id}')
+        >>> table4
+        +------+----------+------+----------+
+        | 1_id | 1_colour | 2_id | 2_shape  |
+        +======+==========+======+==========+
+        |    1 | 'blue'   |    3 | 'square' |
+        +------+----------+------+----------+
+        |    2 | 'red'    |    3 | 'square' |
+        +------+----------+------+----------+
+
+    By default every source table is read again each time the product is
+    iterated over. If `cache` is `True`, all but the largest table are read
+    once, when first iterated over, and their rows kept for later
+    iterations, while the largest table is read in the outer loop. A table
+    with more than `buffersize` rows is kept in temporary files in
+    `tempdir`, written with `spill_codec` (see
+    :func:`petl.transform.sorts.sort`), rather than in memory. Rows are
+    returned in the order of the largest table, each followed by the product
+    of the others, so the order of rows will differ from the uncached
+    product unless the first table is the largest. The size of each table is
+    estimated as for :func:`petl.transform.joins.join` with
+    `strategy='auto'`.
+
     """
 
     return CrossJoinView(*tables, **kwargs)
@@ -489,14 +748,29 @@ class CrossJoinView(Table):
     def __init__(self, *sources, **kwargs):
         self.sources = sources
         self.prefix = kwargs.get('prefix', False)
+        predicate = kwargs.get('predicate', None)
+        if isinstance(predicate, string_types):
+            predicate = expr(predicate)
+        self.predicate = predicate
+        self.cache = kwargs.get('cache', False)
+        self.buffersize = kwargs.get('buffersize', None)
+        self.tempdir = kwargs.get('tempdir', None)
+        self.spill_codec = getcodec(kwargs.get('spill_codec', None))
+        self._outer = None
+        self._inner = None
 
     def __iter__(self):
-        return itercrossjoin(self.sources, self.prefix)
+        if not self.cache or not self.sources:
+            return itercrossjoin(self.sources, self.prefix, self.predicate)
+        if self._inner is None:
+            self._outer, self._inner = _cachecrossjoin(
+                self.sources, self.buffersize, self.spill_codec, self.tempdir
+            )
+        return itercachedcrossjoin(self.sources, self._outer, self._inner,
+                                   self.prefix, self.predicate)
 
 
-def itercrossjoin(sources, prefix):
-
-    # construct fields
+def _crossjoinheader(sources, prefix):
     outhdr = list()
     for i, s in enumerate(sources):
         if prefix:
@@ -504,14 +778,133 @@ def itercrossjoin(sources, prefix):
             outhdr.extend([text_type(i+1) + '_' + text_type(f) for f in header(s)])
         else:
             outhdr.extend(header(s))
-    yield tuple(outhdr)
+    return tuple(outhdr)
+
+
+def itercrossjoin(sources, prefix, predicate=None):
+
+    # construct fields
+    outhdr = _crossjoinheader(sources, prefix)
+    yield outhdr
 
     datasrcs = [data(src) for src in sources]
     for prod in itertools.product(*datasrcs):
         outrow = list()
         for row in prod:
             outrow.extend(row)
-        yield tuple(outrow)
+        outrow = tuple(outrow)
+        if predicate is None or predicate(Record(outrow, outhdr)):
+            yield outrow
+
+
+class _CachedRows(object):
+    # rows held in a list, or in temporary files once there are more than
+    # buffersize rows (if buffersize is None, always in the list)
+
+    def __init__(self, buffersize, codec, tempdir):
+        self.buffersize = buffersize
+        self.codec = codec
+        self.tempdir = tempdir
+        self.rows = list()
+        self.chunks = list()
+
+    def append(self, row):
+        rows = self.rows
+        rows.append(row)
+        if self.buffersize is not None and len(rows) > self.buffersize:
+            self._spill(rows[:-1])
+            del rows[:-1]
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def close(self):
+        # write out any rows remaining in the list once anything is spilled
+        if self.chunks and self.rows:
+            self._spill(self.rows)
+            self.rows = list()
+        debug('cached rows in %s', '%s files' % len(self.chunks)
+              if self.chunks else 'memory')
+
+    def _spill(self, rows):
+        self.chunks.append(
+            NamedTempFileDeleteOnGC(dumpchunk(rows, self.codec, self.tempdir))
+        )
+
+    def __iter__(self):
+        if not self.chunks:
+            return iter(self.rows)
+        return itertools.chain.from_iterable(
+            iterchunk(f.name, self.codec) for f in self.chunks
+        )
+
+
+def _cachecrossjoin(sources, buffersize, codec, tempdir):
+    if buffersize is None:
+        buffersize = config.sort_buffersize
+    estimates = [estimaterows(s, limit=buffersize)[0] for s in sources]
+    outer = estimates.index(max(estimates))
+    inner = list()
+    for i, s in enumerate(sources):
+        if i == outer:
+            inner.append(None)
+        else:
+            rows = _CachedRows(buffersize, codec, tempdir)
+            rows.extend(tuple(row) for row in data(s))
+            rows.close()
+            inner.append(rows)
+    return outer, inner
+
+
+class _FlatProduct(object):
+    # the product of cached tables, each combination of rows concatenated
+    # into one tuple
+
+    def __init__(self, cached):
+        self.cached = cached
+
+    def __iter__(self):
+        cached = self.cached
+        if len(cached) == 1:
+            return iter(cached[0])
+        if not any(c.chunks for c in cached):
+            prod = itertools.product(*cached)
+        else:
+            prod = _iterproduct(cached)
+        chain = itertools.chain.from_iterable
+        return (tuple(chain(p)) for p in prod)
+
+
+def _iterproduct(iterables):
+    # like itertools.product, but iterating over each argument again for
+    # each combination of the earlier ones rather than copying it to memory
+    if not iterables:
+        yield ()
+        return
+    for first in iterables[0]:
+        for rest in _iterproduct(iterables[1:]):
+            yield (first,) + rest
+
+
+def itercachedcrossjoin(sources, outer, inner, prefix, predicate=None):
+    outhdr = _crossjoinheader(sources, prefix)
+    yield outhdr
+
+    # output rows are made up of the rows of the tables before the outer
+    # table, the outer row, then the rows of the tables after it
+    before = inner[:outer]
+    after = inner[outer+1:]
+    before = _FlatProduct(before) if before else [()]
+    after = _FlatProduct(after) if after else [()]
+    for row in data(sources[outer]):
+        row = tuple(row)
+        for b in before:
+            brow = b + row
+            for a in after:
+                outrow = brow + a
+                if predicate is None or predicate(Record(outrow, outhdr)):
+                    yield outrow
 
 
 def antijoin(left, right, key=None, lkey=None, rkey=None, presorted=False,
@@ -595,9 +988,14 @@ def iterantijoin(left, right, lkey, rkey):
     lkind = asindices(lhdr, lkey)
     rkind = asindices(rhdr, rkey)
 
-    # construct functions to extract key values from both tables
-    lgetk = comparable_itemgetter(*lkind)
-    rgetk = comparable_itemgetter(*rkind)
+    # construct functions to extract key values from both tables, using
+    # native comparison where both tables hold the same types of key values
+    lsample, lit = peek_sample(lit)
+    rsample, rit = peek_sample(rit)
+    keytypes = combine_keytypes(sample_keytypes(lsample, lkind),
+                                sample_keytypes(rsample, rkind))
+    lgetk = sortable_itemgetter(keytypes, *lkind)
+    rgetk = sortable_itemgetter(keytypes, *rkind)
 
     # construct group iterators for both tables
     lgit = itertools.groupby(lit, key=lgetk)
@@ -640,6 +1038,128 @@ def iterantijoin(left, right, lkey, rkey):
             yield tuple(row)
 
 
+def semijoin(left, right, key=None, lkey=None, rkey=None, presorted=False,
+             buffersize=None, tempdir=None, cache=True):
+    """
+    Return rows from the `left` table where the key value occurs in the
+    `right` table. Each left row is returned once, however many rows in the
+    right table have the same key. E.g.::
+
+        >>> import petl as etl
+        >>> table1 = [['id', 'colour'],
+        ...           [0, 'black'],
+        ...           [1, 'blue'],
+        ...           [2, 'red'],
+        ...           [4, 'yellow'],
+        ...           [5, 'white']]
+        >>> table2 = [['id', 'shape'],
+        ...           [1, 'circle'],
+        ...           [1, 'square'],
+        ...           [3, 'square'],
+        ...           [4, 'ellipse']]
+        >>> table3 = etl.semijoin(table1, table2, key='id')
+        >>> table3
+        +----+----------+
+        | id | colour   |
+        +====+==========+
+        |  1 | 'blue'   |
+        +----+----------+
+        |  4 | 'yellow' |
+        +----+----------+
+
+    If `presorted` is True, it is assumed that the data are already sorted by
+    the given key, and the `buffersize`, `tempdir` and `cache` arguments are
+    ignored. Otherwise, the data are sorted, see also the discussion of the
+    `buffersize`, `tempdir` and `cache` arguments under the
+    :func:`petl.transform.sorts.sort` function. Rows are returned in the
+    order of the sorted left table. See also
+    :func:`petl.transform.hashjoins.hashsemijoin`, which keeps the order of
+    the left table.
+
+    Left and right tables with different key fields can be handled via the
+    `lkey` and `rkey` arguments.
+
+    """
+
+    lkey, rkey = keys_from_args(left, right, key, lkey, rkey)
+    return SemiJoinView(left=left, right=right, lkey=lkey, rkey=rkey,
+                        presorted=presorted, buffersize=buffersize,
+                        tempdir=tempdir, cache=cache)
+
+
+Table.semijoin = semijoin
+
+
+class SemiJoinView(Table):
+
+    def __init__(self, left, right, lkey, rkey, presorted=False,
+                 buffersize=None, tempdir=None, cache=True):
+        if presorted:
+            self.left = left
+            self.right = right
+        else:
+            self.left = sort(left, lkey, buffersize=buffersize,
+                             tempdir=tempdir, cache=cache)
+            self.right = sort(right, rkey, buffersize=buffersize,
+                              tempdir=tempdir, cache=cache)
+        self.lkey = lkey
+        self.rkey = rkey
+
+    def __iter__(self):
+        return itersemijoin(self.left, self.right, self.lkey, self.rkey)
+
+
+def itersemijoin(left, right, lkey, rkey):
+    lit = iter(left)
+    rit = iter(right)
+
+    lhdr = next(lit)
+    rhdr = next(rit)
+    yield tuple(lhdr)
+
+    # determine indices of the key fields in left and right tables
+    lkind = asindices(lhdr, lkey)
+    rkind = asindices(rhdr, rkey)
+
+    # construct functions to extract key values from both tables, using
+    # native comparison where both tables hold the same types of key values
+    lsample, lit = peek_sample(lit)
+    rsample, rit = peek_sample(rit)
+    keytypes = combine_keytypes(sample_keytypes(lsample, lkind),
+                                sample_keytypes(rsample, rkind))
+    lgetk = sortable_itemgetter(keytypes, *lkind)
+    rgetk = sortable_itemgetter(keytypes, *rkind)
+
+    # construct group iterators for both tables
+    lgit = itertools.groupby(lit, key=lgetk)
+    rgit = itertools.groupby(rit, key=rgetk)
+
+    # loop until *either* of the iterators is exhausted, no left rows can
+    # match after that
+    try:
+
+        # pick off initial row groups
+        lkval, lrowgrp = next(lgit)
+        rkval, _ = next(rgit)
+
+        while True:
+            if lkval < rkval:
+                # advance left
+                lkval, lrowgrp = next(lgit)
+            elif lkval > rkval:
+                # advance right
+                rkval, _ = next(rgit)
+            else:
+                for row in lrowgrp:
+                    yield tuple(row)
+                # advance both
+                lkval, lrowgrp = next(lgit)
+                rkval, _ = next(rgit)
+
+    except StopIteration:
+        pass
+
+
 def lookupjoin(left, right, key=None, lkey=None, rkey=None, missing=None,
                presorted=False, buffersize=None, tempdir=None, cache=True,
                lprefix=None, rprefix=None):
@@ -803,8 +1323,292 @@ def iterlookupjoin(left, right, lkey, rkey, missing=None, lprefix=None,
             yield tuple(row)
 
 
+def asofjoin(left, right, on, by=None, direction='backward', tolerance=None,
+             missing=None, presorted=False, buffersize=None, tempdir=None,
+             cache=True, lprefix=None, rprefix=None):
+    """
+    Perform a left join where each row in the left table is joined with the
+    row in the right table with the nearest preceding (or following) value
+    of the `on` field, optionally only among rows with the same values of
+    the `by` field or fields. E.g.::
+
+        >>> import petl as etl
+        >>> trades = [['ts', 'symbol', 'price'],
+        ...           [2, 'A', 10.1],
+        ...           [5, 'B', 20.4],
+        ...           [7, 'A', 10.3],
+        ...           [9, 'B', 20.0]]
+        >>> quotes = [['ts', 'symbol', 'bid'],
+        ...           [1, 'A', 10.0],
+        ...           [3, 'B', 20.2],
+        ...           [6, 'A', 10.2],
+        ...           [7, 'A', 10.25],
+        ...           [8, 'B', 19.9]]
+        >>> table1 = etl.asofjoin(trades, quotes, on='ts', by='symbol')
+        >>> table1
+        +----+--------+-------+-------+
+        | ts | symbol | price | bid   |
+        +====+========+=======+=======+
+        |  2 | 'A'    |  10.1 |  10.0 |
+        +----+--------+-------+-------+
+        |  5 | 'B'    |  20.4 |  20.2 |
+        +----+--------+-------+-------+
+        |  7 | 'A'    |  10.3 | 10.25 |
+        +----+--------+-------+-------+
+        |  9 | 'B'    |  20.0 |  19.9 |
+        +----+--------+-------+-------+
+
+        >>> table2 = etl.asofjoin(trades, quotes, on='ts', by='symbol',
+        ...                       direction='forward', tolerance=2)
+        >>> table2
+        +----+--------+-------+-------+
+        | ts | symbol | price | bid   |
+        +====+========+=======+=======+
+        |  2 | 'A'    |  10.1 | None  |
+        +----+--------+-------+-------+
+        |  5 | 'B'    |  20.4 | None  |
+        +----+--------+-------+-------+
+        |  7 | 'A'    |  10.3 | 10.25 |
+        +----+--------+-------+-------+
+        |  9 | 'B'    |  20.0 | None  |
+        +----+--------+-------+-------+
+
+    If `direction` is 'backward' the right row with the greatest `on` value
+    less than or equal to that of the left row is chosen, if 'forward' the
+    right row with the least `on` value greater than or equal to it, and if
+    'nearest' whichever of these is closer (the preceding row if both are
+    equally close). If several right rows have the chosen `on` value, the
+    last is used going backward and the first going forward. If
+    `tolerance` is given, rows further apart than `tolerance` are not
+    joined. Left rows with no match are joined with `missing` in place of
+    the right row's values.
+
+    The `on` field must be present in both tables, as must the `by` fields,
+    and these fields are only included in the output once, from the left
+    table. Values of the `on` field must be comparable, and if `direction`
+    is 'nearest' or `tolerance` is given, it must be possible to subtract
+    them and compare the difference with `tolerance` (e.g., numbers, or
+    datetimes with a :class:`datetime.timedelta` tolerance). Right rows
+    with `None` as the `on` value are ignored, and left rows with `None` as
+    the `on` value are joined with `missing`.
+
+    Both tables are sorted by the `on` field, unless `presorted` is `True`,
+    and rows are returned in that order. The tables are then merged in a
+    single pass, holding only the latest right row for each `by` group in
+    memory. Going forward or to the nearest row, left rows are also held
+    until a later right row in the same group, or a right row more than
+    `tolerance` later in any group, is reached.
+
+    """
+
+    if direction not in ('backward', 'forward', 'nearest'):
+        raise ArgumentError('direction must be one of \'backward\', '
+                            '\'forward\' or \'nearest\', found %r'
+                            % direction)
+    return AsOfJoinView(left, right, on, by=by, direction=direction,
+                        tolerance=tolerance, missing=missing,
+                        presorted=presorted, buffersize=buffersize,
+                        tempdir=tempdir, cache=cache, lprefix=lprefix,
+                        rprefix=rprefix)
+
+
+Table.asofjoin = asofjoin
+
+
+class AsOfJoinView(Table):
+
+    def __init__(self, left, right, on, by=None, direction='backward',
+                 tolerance=None, missing=None, presorted=False,
+                 buffersize=None, tempdir=None, cache=True, lprefix=None,
+                 rprefix=None):
+        if presorted:
+            self.left = left
+            self.right = right
+        else:
+            self.left = sort(left, on, buffersize=buffersize,
+                             tempdir=tempdir, cache=cache)
+            self.right = sort(right, on, buffersize=buffersize,
+                              tempdir=tempdir, cache=cache)
+        self.on = on
+        self.by = by
+        self.direction = direction
+        self.tolerance = tolerance
+        self.missing = missing
+        self.lprefix = lprefix
+        self.rprefix = rprefix
+
+    def __iter__(self):
+        return iterasofjoin(self.left, self.right, self.on, self.by,
+                            self.direction, self.tolerance, self.missing,
+                            self.lprefix, self.rprefix)
+
+
+def iterasofjoin(left, right, on, by, direction, tolerance, missing, lprefix,
+                 rprefix):
+    lit = iter(left)
+    rit = iter(right)
+
+    lhdr = next(lit)
+    rhdr = next(rit)
+
+    # determine indices of the on and by fields in left and right tables
+    lon = asindices(lhdr, on)
+    ron = asindices(rhdr, on)
+    if len(lon) != 1 or len(ron) != 1:
+        raise ArgumentError('on must be a single field, found %r' % (on,))
+    lon, ron = lon[0], ron[0]
+    if by is None:
+        lgetby = rgetby = lambda row: None
+        rkind = [ron]
+    else:
+        lgetby = operator.itemgetter(*asindices(lhdr, by))
+        rbyind = asindices(rhdr, by)
+        rgetby = operator.itemgetter(*rbyind)
+        rkind = [ron] + list(rbyind)
+
+    # determine indices of the remaining fields in the right table
+    rvind = [i for i in range(len(rhdr)) if i not in rkind]
+    rgetv = rowgetter(*rvind)
+    pad = tuple([missing] * len(rvind))
+
+    # determine the output fields
+    if lprefix is None:
+        outhdr = list(lhdr)
+    else:
+        outhdr = [(text_type(lprefix) + text_type(f)) for f in lhdr]
+    if rprefix is None:
+        outhdr.extend(rgetv(rhdr))
+    else:
+        outhdr.extend([(text_type(rprefix) + text_type(f))
+                       for f in rgetv(rhdr)])
+    yield tuple(outhdr)
+
+    # right rows with no on value can't be matched, and left rows with none
+    # are joined with missing values (sort() puts None first)
+    rit = (row for row in rit if row[ron] is not None)
+
+    # the latest right row for each group
+    last = dict()
+    rrow = next(rit, None)
+
+    if direction == 'backward':
+        for lrow in lit:
+            t = lrow[lon]
+            if t is None:
+                yield tuple(lrow) + pad
+                continue
+            while rrow is not None and rrow[ron] <= t:
+                last[rgetby(rrow)] = rrow
+                rrow = next(rit, None)
+            match = last.get(lgetby(lrow))
+            if match is None or (tolerance is not None
+                                 and t - match[ron] > tolerance):
+                yield tuple(lrow) + pad
+            else:
+                yield tuple(lrow) + rgetv(match)
+        return
+
+    # left rows waiting to be output, as [row, preceding, following, done]
+    # lists, and those still waiting for a following right row by group
+    pending = deque()
+    waiting = dict()
+
+    def choose(entry):
+        lrow, before, after = entry[:3]
+        t = lrow[lon]
+        if tolerance is not None:
+            if before is not None and t - before[ron] > tolerance:
+                before = None
+            if after is not None and after[ron] - t > tolerance:
+                after = None
+        if direction == 'forward' or before is None:
+            match = after
+        elif after is None or t - before[ron] <= after[ron] - t:
+            match = before
+        else:
+            match = after
+        if match is None:
+            return tuple(lrow) + pad
+        return tuple(lrow) + rgetv(match)
+
+    # the first right row for each group with the same on value as the
+    # latest, used going forward on an exact match
+    first = dict()
+
+    def advance(rrow):
+        # a right row with a later on value than any pending left row
+        g = rgetby(rrow)
+        prev = last.get(g)
+        if prev is None or prev[ron] != rrow[ron]:
+            first[g] = rrow
+        last[g] = rrow
+        if g in waiting:
+            for entry in waiting.pop(g):
+                entry[2] = rrow
+                entry[3] = True
+
+    def expire(t, later):
+        # no right row yet to come can be within tolerance of the earliest
+        # pending left rows, where right rows to come are all after t if
+        # later is True, otherwise may still be at t
+        while pending and not pending[0][3] and \
+                (t - pending[0][0][lon] > tolerance or
+                 (later and t - pending[0][0][lon] == tolerance)):
+            entry = pending[0]
+            entry[3] = True
+            g = lgetby(entry[0])
+            q = waiting[g]
+            q.popleft()
+            if not q:
+                del waiting[g]
+
+    for lrow in lit:
+        t = lrow[lon]
+        if t is None:
+            entry = [lrow, None, None, True]
+            if pending:
+                pending.append(entry)
+            else:
+                yield choose(entry)
+            continue
+        while rrow is not None and rrow[ron] <= t:
+            advance(rrow)
+            rrow = next(rit, None)
+        if tolerance is not None:
+            expire(t, True)
+        while pending and pending[0][3]:
+            yield choose(pending.popleft())
+        g = lgetby(lrow)
+        before = last.get(g)
+        if before is not None and before[ron] == t:
+            entry = [lrow, before, first[g], True]
+        else:
+            entry = [lrow, before, None, False]
+            if g in waiting:
+                waiting[g].append(entry)
+            else:
+                waiting[g] = deque([entry])
+        if pending or not entry[3]:
+            pending.append(entry)
+        else:
+            yield choose(entry)
+
+    # use the rest of the right table to find following rows for any left
+    # rows still waiting
+    while waiting and rrow is not None:
+        advance(rrow)
+        if tolerance is not None:
+            expire(rrow[ron], False)
+        while pending and pending[0][3]:
+            yield choose(pending.popleft())
+        rrow = next(rit, None)
+    for entry in pending:
+        yield choose(entry)
+
+
 def unjoin(table, value, key=None, autoincrement=(1, 1), presorted=False,
-           buffersize=None, tempdir=None, cache=True):
+           buffersize=None, tempdir=None, cache=True, strategy='sort',
+           spill_codec=None):
     """
     Split a table into two tables by reversing an inner join. E.g.::
 
@@ -864,8 +1668,62 @@ def unjoin(table, value, key=None, autoincrement=(1, 1), presorted=False,
     The `autoincrement` parameter controls how an integer join key is
     reconstructed, and should be a tuple of (`start`, `step`).
 
+    When the join key is reconstructed the table is sorted by the value
+    field, unless `presorted` is `True`, and ids are given to values in
+    sorted order. If `strategy` is 'hash', the table is not sorted, instead
+    ids are given to values in the order they are first seen, using a
+    dictionary, and the left table keeps the order of rows in `table`. E.g.::
+
+        >>> table7 = (('foo', 'bar'),
+        ...           ('A', 'orange'),
+        ...           ('B', 'apple'),
+        ...           ('C', 'orange'))
+        >>> table8, table9 = etl.unjoin(table7, 'bar', strategy='hash')
+        >>> table8
+        +-----+--------+
+        | foo | bar_id |
+        +=====+========+
+        | 'A' |      1 |
+        +-----+--------+
+        | 'B' |      2 |
+        +-----+--------+
+        | 'C' |      1 |
+        +-----+--------+
+
+        >>> table9
+        +----+----------+
+        | id | bar      |
+        +====+==========+
+        |  1 | 'orange' |
+        +----+----------+
+        |  2 | 'apple'  |
+        +----+----------+
+
+    The 'hash' strategy only applies when the join key is reconstructed, and
+    an :class:`petl.errors.ArgumentError` is raised if `key` is also given.
+    Once there are more than `buffersize` distinct values the dictionary is
+    moved to a :class:`petl.util.lookups.DiskDict` in `tempdir`. If `cache`
+    is `True`, both tables are made in a single pass over `table` when
+    either is first iterated over, and their rows are kept for later
+    iterations, in memory or, past `buffersize` rows, in temporary files in
+    `tempdir` written with `spill_codec` (see
+    :func:`petl.transform.sorts.sort`). Otherwise `table` is read each time
+    either table is iterated over.
+
     """
 
+    if strategy not in ('sort', 'hash'):
+        raise ArgumentError('strategy must be \'sort\' or \'hash\', '
+                            'found %r' % strategy)
+    if key is not None and strategy == 'hash':
+        raise ArgumentError('strategy \'hash\' is only supported when the '
+                            'join key is reconstructed, i.e., key is None')
+    if strategy == 'hash':
+        unjoiner = HashUnjoiner(table, value, autoincrement,
+                                buffersize=buffersize, tempdir=tempdir,
+                                cache=cache, spill_codec=spill_codec)
+        return HashUnjoinView(unjoiner, 'left'), \
+            HashUnjoinView(unjoiner, 'right')
     if key is None:
         # first sort the table by the value field
         if presorted:
@@ -917,6 +1775,133 @@ class ConvertToIncrementingCounterView(Table):
 Table.unjoin = unjoin
 
 
+class HashUnjoiner(object):
+    # state shared by the two tables from unjoin(strategy='hash')
+
+    def __init__(self, table, value, autoincrement, buffersize=None,
+                 tempdir=None, cache=True, spill_codec=None):
+        self.table = table
+        self.value = value
+        self.autoincrement = autoincrement
+        if buffersize is None:
+            self.buffersize = config.sort_buffersize
+        else:
+            self.buffersize = buffersize
+        self.tempdir = tempdir
+        self.cache = cache
+        self.spill_codec = getcodec(spill_codec)
+        self._hdr = None
+        self._left = None
+        self._right = None
+
+    def _fill(self):
+        left = _CachedRows(self.buffersize, self.spill_codec, self.tempdir)
+        right = _CachedRows(self.buffersize, self.spill_codec, self.tempdir)
+        it = iterhashunjoin(self.table, self.value, self.autoincrement,
+                            self.buffersize, self.tempdir)
+        hdr = next(it)
+        for outrow, newvalue in it:
+            left.append(outrow)
+            if newvalue is not None:
+                right.append(newvalue)
+        left.close()
+        right.close()
+        self._hdr, self._left, self._right = hdr, left, right
+
+    def iterleft(self):
+        if not self.cache:
+            it = iterhashunjoin(self.table, self.value, self.autoincrement,
+                                self.buffersize, self.tempdir)
+            yield next(it)
+            for outrow, _ in it:
+                yield outrow
+        else:
+            if self._left is None:
+                self._fill()
+            yield self._hdr
+            for row in self._left:
+                yield row
+
+    def iterright(self):
+        yield ('id', self.value)
+        if not self.cache:
+            it = iterhashunjoin(self.table, self.value, self.autoincrement,
+                                self.buffersize, self.tempdir)
+            next(it)
+            for _, newvalue in it:
+                if newvalue is not None:
+                    yield newvalue
+        else:
+            if self._right is None:
+                self._fill()
+            for row in self._right:
+                yield row
+
+
+class HashUnjoinView(Table):
+
+    def __init__(self, unjoiner, side):
+        self.unjoiner = unjoiner
+        self.side = side
+
+    def __iter__(self):
+        if self.side == 'left':
+            return self.unjoiner.iterleft()
+        return self.unjoiner.iterright()
+
+
+def iterhashunjoin(table, value, autoincrement, buffersize, tempdir):
+    # yield the output header, then a tuple for each row of the output row
+    # with the value replaced by its id, and the (id, value) row for the
+    # right table if the value hasn't been seen before, or None
+    it = iter(table)
+    hdr = next(it)
+    vidx = asindices(hdr, value)[0]
+    outhdr = list(hdr)
+    outhdr[vidx] = '%s_id' % value
+    yield tuple(outhdr)
+
+    offset, multiplier = autoincrement
+    ids = dict()
+    # once there are more than buffersize values, ids are moved to disk,
+    # bucketed by the hash of the value so values are matched by equality
+    # as in a dict (e.g., 1 and 1.0 get the same id) rather than by their
+    # pickled bytes
+    diskids = None
+    n = 0
+    try:
+        for row in it:
+            v = row[vidx]
+            if diskids is None:
+                i = ids.get(v)
+            else:
+                bucket = diskids.get(hash(v), ())
+                i = next((j for w, j in bucket if w == v), None)
+            newvalue = None
+            if i is None:
+                i = (n * multiplier) + offset
+                n += 1
+                newvalue = (i, v)
+                if diskids is None:
+                    ids[v] = i
+                    if buffersize is not None and n > buffersize:
+                        debug('moving ids for %s values to disk', n)
+                        diskids = DiskDict(tempdir=tempdir,
+                                           cachesize=buffersize)
+                        for w, j in ids.items():
+                            h = hash(w)
+                            diskids[h] = diskids.get(h, []) + [(w, j)]
+                        ids = None
+                else:
+                    diskids[hash(v)] = list(bucket) + [(v, i)]
+            outrow = list(row)
+            outrow[vidx] = i
+            yield tuple(outrow), newvalue
+    finally:
+        if diskids is not None:
+            diskids.close()
+
+
 class EnumerateDistinctView(Table):
 
     def __init__(self, tbl, value, autoincrement):
@@ -3,21 +3,33 @@ from __future__ import absolute_import, print_function, division
 
 import itertools
 import operator
-from collections import OrderedDict
+import logging
+import multiprocessing
+from collections import OrderedDict, deque
 from petl.compat import next, string_types, reduce, text_type
 
 
 from petl.errors import ArgumentError
-from petl.util.base import Table, iterpeek, rowgroupby
+from petl.comparison import Comparable
+from petl.util.base import Table, iterpeek, rowgroupby, asindices, Record
 from petl.util.base import values
 from petl.util.counting import nrows
-from petl.transform.sorts import sort, mergesort
+import petl.config as config
+from petl.aggregators import Aggregator, Count
+from petl.spill import getcodec, partitionrows, dumpchunk, iterchunk, \
+    readchunk, NamedTempFileDeleteOnGC
+from petl.transform.sorts import sort, mergesort, _mergesorted
 from petl.transform.basics import cut
 from petl.transform.dedup import distinct
 
 
+logger = logging.getLogger(__name__)
+warning = logger.warning
+debug = logger.debug
+
+
 def rowreduce(table, key, reducer, header=None, presorted=False,
-              buffersize=None, tempdir=None, cache=True):
+              buffersize=None, tempdir=None, cache=True, strategy='sort'):
     """
     Group rows under the given key then apply `reducer` to produce a single
     output row for each input group of rows. E.g.::
@@ -51,6 +63,12 @@ def rowreduce(table, key, reducer, header=None, presorted=False,
     recursively to values within a group, rather it is applied once to each row 
     group as a whole.
     
+    If `strategy` is 'hash', the table is not sorted, instead rows are
+    grouped in a dictionary, see :func:`petl.transform.reductions.aggregate`.
+    The rows of every group are held until the whole table (or partition)
+    has been read, and if more than `buffersize` rows are held at once the
+    table is reduced as if `strategy` were 'sort' instead.
+
     See also :func:`petl.transform.reductions.aggregate` and
     :func:`petl.transform.reductions.fold`.
     
@@ -58,7 +76,8 @@ def rowreduce(table, key, reducer, header=None, presorted=False,
 
     return RowReduceView(table, key, reducer, header=header,
                          presorted=presorted, 
-                         buffersize=buffersize, tempdir=tempdir, cache=cache)
+                         buffersize=buffersize, tempdir=tempdir, cache=cache,
+                         strategy=strategy)
 
 
 Table.rowreduce = rowreduce
@@ -67,8 +86,10 @@ Table.rowreduce = rowreduce
 class RowReduceView(Table):
     
     def __init__(self, source, key, reducer, header=None,
-                 presorted=False, buffersize=None, tempdir=None, cache=True):
-        if presorted:
+                 presorted=False, buffersize=None, tempdir=None, cache=True,
+                 strategy='sort'):
+        _checkstrategy(strategy)
+        if presorted or strategy == 'hash':
             self.source = source
         else:
             self.source = sort(source, key, buffersize=buffersize, 
@@ -76,10 +97,27 @@ class RowReduceView(Table):
         self.key = key
         self.header = header
         self.reducer = reducer
+        self.strategy = strategy
+        self.buffersize = buffersize
+        self.tempdir = tempdir
+        self.cache = cache
 
     def __iter__(self):
+        if self.strategy == 'hash':
+            budget = _RowBudget(self.buffersize, self.key)
+            return _iterhashorsort(
+                lambda: iterhashrowreduce(self.source, self.key, self.reducer,
+                                          self.header, self.buffersize,
+                                          self.tempdir, budget),
+                lambda: iterrowreduce(self._sorted(), self.key, self.reducer,
+                                      self.header)
+            )
         return iterrowreduce(self.source, self.key, self.reducer, self.header)
 
+    def _sorted(self):
+        return sort(self.source, self.key, buffersize=self.buffersize,
+                    tempdir=self.tempdir, cache=self.cache)
+
     
 def iterrowreduce(source, key, reducer, header):
     if header is None:
@@ -88,10 +126,40 @@ def iterrowreduce(source, key, reducer, header):
     yield tuple(header)
     for key, rows in rowgroupby(source, key):
         yield tuple(reducer(key, rows))
-        
+
+
+def iterhashrowreduce(source, key, reducer, header, buffersize, tempdir,
+                      budget=None):
+    it = iter(source)
+    hdr = next(it)
+    if header is None:
+        header = hdr
+    yield tuple(header)
+    flds = list(map(text_type, hdr))
+    if budget is None:
+        budget = _RowBudget(None)
+
+    def start(row):
+        budget.add()
+        return [Record(row, flds)]
+
+    def step(rows, row):
+        budget.add()
+        rows.append(Record(row, flds))
+        return rows
+
+    def finish(k, rows):
+        budget.release(len(rows))
+        return tuple(reducer(k, iter(rows)))
+
+    for outrow in hashreduce(it, _hashkeygetter(hdr, key), start, step,
+                             finish, buffersize, tempdir):
+        yield outrow
+
 
 def aggregate(table, key, aggregation=None, value=None, presorted=False,
-              buffersize=None, tempdir=None, cache=True, field='value'):
+              buffersize=None, tempdir=None, cache=True, field='value',
+              strategy='sort', workers=None):
     """Apply aggregation functions.
     E.g.::
 
@@ -206,6 +274,31 @@ def aggregate(table, key, aggregation=None, value=None, presorted=False,
         |     6 |      2 |      9 |     27 | [3, 7, 2, 2, 9, 4] | [(3, True), (7, False), (2, True), (2, False), (9, False), (4, True)] | '3, 7, 2, 2, 9, 4' |
         +-------+--------+--------+--------+--------------------+-----------------------------------------------------------------------+--------------------+
 
+    The classes in :mod:`petl.aggregators` compute common aggregations
+    incrementally, e.g.::
+
+        >>> from petl.aggregators import Count, Mean, Max, StrJoin
+        >>> aggregation = OrderedDict()
+        >>> aggregation['count'] = Count()
+        >>> aggregation['meanbar'] = 'bar', Mean()
+        >>> aggregation['maxbar'] = 'bar', Max()
+        >>> aggregation['bars'] = 'bar', StrJoin(', ')
+        >>> etl.aggregate(table1, 'foo', aggregation)
+        +-----+-------+-------------------+--------+-----------+
+        | foo | count | meanbar           | maxbar | bars      |
+        +=====+=======+===================+========+===========+
+        | 'a' |     2 |               5.0 |      7 | '3, 7'    |
+        +-----+-------+-------------------+--------+-----------+
+        | 'b' |     3 | 4.333333333333333 |      9 | '2, 2, 9' |
+        +-----+-------+-------------------+--------+-----------+
+        | 'c' |     1 |               4.0 |      4 | '4'       |
+        +-----+-------+-------------------+--------+-----------+
+
+    If every aggregation is an aggregator (see
+    :class:`petl.aggregators.Aggregator`), the rows of each group are read
+    once and not held in memory, for either `strategy`. Otherwise, for
+    multiple aggregations the rows of each group are collected in a list.
+
     If `presorted` is True, it is assumed that the data are already sorted by
     the given key, and the `buffersize`, `tempdir` and `cache` arguments are 
     ignored. Otherwise, the data are sorted, see also the discussion of the 
@@ -214,18 +307,46 @@ def aggregate(table, key, aggregation=None, value=None, presorted=False,
 
     If `key` is None, sorting is not necessary.
 
+    If `strategy` is 'hash', the table is not sorted, instead rows are
+    grouped under their key values in a dictionary, which is usually much
+    faster when there are few groups compared to rows. The output is the
+    same, sorted by key. Once there are `buffersize` groups, rows with new
+    key values are hash-partitioned into temporary files in `tempdir`, and
+    each partition is aggregated in turn after the rest of the table (see
+    also `petl.config.spill_codec`). N.B., the values passed to aggregation
+    functions other than aggregators are held in memory for every group until
+    the table (or partition) has been read, and if more than `buffersize`
+    values are held at once, the table is aggregated as if `strategy` were
+    'sort' instead (so it is read again).
+
+    If `workers` is greater than 1, batches of rows are handed to a pool of
+    `workers` processes, which each compute the aggregators' states for the
+    groups in a batch, and the states are merged in the current process in
+    the order the batches were read. The output is the same as without
+    workers, sorted by key (though floating point results such as variances
+    may differ in the last digits), but every aggregation must be an
+    aggregator, otherwise :class:`petl.errors.ArgumentError` is raised.
+    Keys, values and states must be picklable, and the states for all groups
+    are held in memory. If `workers` is `None`, the value of
+    `petl.config.aggregate_workers` is used, and the number of rows in each
+    batch is given by `petl.config.aggregate_batchsize`. N.B., the table is
+    still read in the current process, so workers only help where the
+    aggregation is the expensive part.
+
     """
 
     if callable(aggregation):
         return SimpleAggregateView(table, key, aggregation=aggregation, 
                                    value=value, presorted=presorted, 
                                    buffersize=buffersize, tempdir=tempdir, 
-                                   cache=cache, field=field)
+                                   cache=cache, field=field,
+                                   strategy=strategy, workers=workers)
     elif aggregation is None or isinstance(aggregation, (list, tuple, dict)):
         # ignore value arg
         return MultiAggregateView(table, key, aggregation=aggregation,  
                                   presorted=presorted, buffersize=buffersize, 
-                                  tempdir=tempdir, cache=cache)
+                                  tempdir=tempdir, cache=cache,
+                                  strategy=strategy, workers=workers)
     else:
         raise ArgumentError('expected aggregation is callable, list, tuple, dict '
                         'or None')
@@ -238,8 +359,14 @@ class SimpleAggregateView(Table):
     
     def __init__(self, table, key, aggregation=list, value=None, 
                  presorted=False, buffersize=None, tempdir=None,
-                 cache=True, field='value'):
-        if presorted or key is None:
+                 cache=True, field='value', strategy='sort', workers=None):
+        _checkstrategy(strategy)
+        if workers is None:
+            workers = config.aggregate_workers
+        if workers is not None and workers > 1:
+            _checkmergeable({field: (value, aggregation)})
+        if presorted or key is None or strategy == 'hash' \
+                or (workers is not None and workers > 1):
             self.table = table
         else:
             self.table = sort(table, key, buffersize=buffersize, 
@@ -248,12 +375,46 @@ class SimpleAggregateView(Table):
         self.aggregation = aggregation
         self.value = value
         self.field = field
+        self.strategy = strategy
+        self.buffersize = buffersize
+        self.tempdir = tempdir
+        self.cache = cache
+        self.workers = workers
         
     def __iter__(self):
+        if self.workers is not None and self.workers > 1:
+            return iterparallelaggregate(self.table, self.key,
+                                         self.aggregation, self.value,
+                                         self.field, self.workers)
+        if self.strategy == 'hash' and self.key is not None:
+            budget = _RowBudget(self.buffersize, self.key)
+            return _iterhashorsort(
+                lambda: iterhashsimpleaggregate(
+                    self.table, self.key, self.aggregation, self.value,
+                    self.field, self.buffersize, self.tempdir, budget
+                ),
+                lambda: itersimpleaggregate(
+                    sort(self.table, self.key, buffersize=self.buffersize,
+                         tempdir=self.tempdir, cache=self.cache),
+                    self.key, self.aggregation, self.value, self.field
+                )
+            )
         return itersimpleaggregate(self.table, self.key, self.aggregation, 
                                    self.value, self.field)
 
 
+def _aggregateheader(key):
+    # output fields for the key
+    if isinstance(key, (list, tuple)):
+        return list(key)
+    elif callable(key):
+        return ['key']
+    elif key is None:
+        return []
+    else:
+        return [key]
+
+
 def itersimpleaggregate(table, key, aggregation, value, field):
 
     # special case counting
@@ -261,15 +422,7 @@ def itersimpleaggregate(table, key, aggregation, value, field):
         aggregation = lambda g: sum(1 for _ in g)  # count length of iterable
 
     # determine output header
-    if isinstance(key, (list, tuple)):
-        outhdr = tuple(key) + (field,)
-    elif callable(key):
-        outhdr = ('key', field)
-    elif key is None:
-        outhdr = field,
-    else:
-        outhdr = (key, field)
-    yield outhdr
+    yield tuple(_aggregateheader(key)) + (field,)
 
     # generate data
     if isinstance(key, (list, tuple)):
@@ -286,11 +439,73 @@ def itersimpleaggregate(table, key, aggregation, value, field):
             yield k, aggregation(grp)
 
 
+def iterhashsimpleaggregate(table, key, aggregation, value, field, buffersize,
+                            tempdir, budget=None):
+    it = iter(table)
+    hdr = next(it)
+    yield tuple(_aggregateheader(key)) + (field,)
+    getvalue = _hashvaluegetter(hdr, value)
+
+    if isinstance(key, (list, tuple)):
+        def outrow(k, aggval):
+            return tuple(k) + (aggval,)
+    else:
+        def outrow(k, aggval):
+            return k, aggval
+
+    if isinstance(aggregation, Aggregator):
+        update = aggregation.update
+
+        def start(row):
+            return update(aggregation.init(), getvalue(row))
+
+        def step(state, row):
+            return update(state, getvalue(row))
+
+        def finish(k, state):
+            return outrow(k, aggregation.finalize(state))
+
+    elif aggregation == len:
+        # special case counting
+        def start(row):
+            return 1
+
+        def step(n, row):
+            return n + 1
+
+        finish = outrow
+    else:
+        if budget is None:
+            budget = _RowBudget(None)
+
+        def start(row):
+            budget.add()
+            return [getvalue(row)]
+
+        def step(vals, row):
+            budget.add()
+            vals.append(getvalue(row))
+            return vals
+
+        def finish(k, vals):
+            budget.release(len(vals))
+            return outrow(k, aggregation(iter(vals)))
+
+    for row in hashreduce(it, _hashkeygetter(hdr, key), start, step, finish,
+                          buffersize, tempdir):
+        yield row
+
+
 class MultiAggregateView(Table):
     
     def __init__(self, source, key, aggregation=None, presorted=False, 
-                 buffersize=None, tempdir=None, cache=True):
-        if presorted or key is None:
+                 buffersize=None, tempdir=None, cache=True, strategy='sort',
+                 workers=None):
+        _checkstrategy(strategy)
+        if workers is None:
+            workers = config.aggregate_workers
+        if presorted or key is None or strategy == 'hash' \
+                or (workers is not None and workers > 1):
             self.source = source
         else:
             self.source = sort(source, key, buffersize=buffersize, 
@@ -309,22 +524,40 @@ class MultiAggregateView(Table):
                 'expected aggregation is None, list, tuple or dict, found %r'
                 % aggregation
             )
+        if workers is not None and workers > 1:
+            _checkmergeable(_normaggregation(self.aggregation))
+        self.strategy = strategy
+        self.buffersize = buffersize
+        self.tempdir = tempdir
+        self.cache = cache
+        self.workers = workers
 
     def __iter__(self):
+        if self.workers is not None and self.workers > 1:
+            return iterparallelaggregate(self.source, self.key,
+                                         self.aggregation, None, None,
+                                         self.workers)
+        if self.strategy == 'hash' and self.key is not None:
+            budget = _RowBudget(self.buffersize, self.key)
+            return _iterhashorsort(
+                lambda: iterhashmultiaggregate(
+                    self.source, self.key, self.aggregation, self.buffersize,
+                    self.tempdir, budget
+                ),
+                lambda: itermultiaggregate(
+                    sort(self.source, self.key, buffersize=self.buffersize,
+                         tempdir=self.tempdir, cache=self.cache),
+                    self.key, self.aggregation
+                )
+            )
         return itermultiaggregate(self.source, self.key, self.aggregation)
     
     def __setitem__(self, key, value):
         self.aggregation[key] = value
 
     
-def itermultiaggregate(source, key, aggregation):
+def _normaggregation(aggregation):
     aggregation = OrderedDict(aggregation.items())  # take a copy
-    it = iter(source)
-    hdr = next(it)
-    # push back header to ensure we iterate only once
-    it = itertools.chain([hdr], it)
-
-    # normalise aggregators
     for outfld in aggregation:
         agg = aggregation[outfld]
         if callable(agg):
@@ -339,16 +572,20 @@ def itermultiaggregate(source, key, aggregation):
             pass  # no need to normalise
         else:
             raise ArgumentError('invalid aggregation: %r, %r' % (outfld, agg))
+    return aggregation
+
+
+def itermultiaggregate(source, key, aggregation):
+    it = iter(source)
+    hdr = next(it)
+    # push back header to ensure we iterate only once
+    it = itertools.chain([hdr], it)
+
+    # normalise aggregators
+    aggregation = _normaggregation(aggregation)
 
     # determine output header
-    if isinstance(key, (list, tuple)):
-        outhdr = list(key)
-    elif callable(key):
-        outhdr = ['key']
-    elif key is None:
-        outhdr = []
-    else:
-        outhdr = [key]
+    outhdr = _aggregateheader(key)
     for outfld in aggregation:
         outhdr.append(outfld)
     yield tuple(outhdr)
@@ -359,33 +596,531 @@ def itermultiaggregate(source, key, aggregation):
         grouped = rowgroupby(it, key)
 
     # generate data
+    if _allaggregators(aggregation):
+        # update every aggregator with each row in turn
+        start, step, finish = _aggregatorsteps(hdr, aggregation)
+        for k, rows in grouped:
+            rows = iter(rows)
+            states = start(next(rows))
+            for row in rows:
+                states = step(states, row)
+            yield _aggregatekey(key, k) + finish(states)
+        return
+
     for k, rows in grouped:
         rows = list(rows)  # may need to iterate over these more than once
-        # handle compound key
-        if isinstance(key, (list, tuple)):
-            outrow = list(k)
-        elif key is None:
-            outrow = []
+        yield _multiaggregaterow(hdr, key, aggregation, k, rows)
+
+
+def _aggregatekey(key, k):
+    # handle compound key
+    if isinstance(key, (list, tuple)):
+        return tuple(k)
+    elif key is None:
+        return ()
+    else:
+        return k,
+
+
+def _allaggregators(aggregation):
+    return all(isinstance(aggfun, Aggregator)
+               for _, aggfun in aggregation.values())
+
+
+def _aggregatorsteps(hdr, aggregation, getrow=None):
+    # start, step and finish functions to update the states of aggregators
+    # for a group of rows, with whole rows given by getrow if not None
+    aggs = []
+    for outfld in aggregation:
+        srcfld, agg = aggregation[outfld]
+        if srcfld is None:
+            getvalue = getrow
+        elif isinstance(srcfld, (list, tuple)):
+            getvalue = operator.itemgetter(*[hdr.index(f) for f in srcfld])
         else:
-            outrow = [k]
-        for outfld in aggregation:
-            srcfld, aggfun = aggregation[outfld]
-            if srcfld is None:
-                aggval = aggfun(rows)
-                outrow.append(aggval)
-            elif isinstance(srcfld, (list, tuple)):
-                idxs = [hdr.index(f) for f in srcfld]
-                valgetter = operator.itemgetter(*idxs)
-                vals = (valgetter(row) for row in rows)
-                aggval = aggfun(vals)
-                outrow.append(aggval)
+            getvalue = operator.itemgetter(hdr.index(srcfld))
+        aggs.append((agg.update, getvalue))
+
+    def start(row):
+        return step([agg.init() for _, agg in aggregation.values()], row)
+
+    def step(states, row):
+        for i, (update, getvalue) in enumerate(aggs):
+            states[i] = update(states[i],
+                               row if getvalue is None else getvalue(row))
+        return states
+
+    def finish(states):
+        return tuple(agg.finalize(state)
+                     for (_, agg), state in zip(aggregation.values(), states))
+
+    return start, step, finish
+
+
+def _multiaggregaterow(hdr, key, aggregation, k, rows):
+    outrow = list(_aggregatekey(key, k))
+    for outfld in aggregation:
+        srcfld, aggfun = aggregation[outfld]
+        if srcfld is None:
+            aggval = aggfun(rows)
+            outrow.append(aggval)
+        elif isinstance(srcfld, (list, tuple)):
+            idxs = [hdr.index(f) for f in srcfld]
+            valgetter = operator.itemgetter(*idxs)
+            vals = (valgetter(row) for row in rows)
+            aggval = aggfun(vals)
+            outrow.append(aggval)
+        else:
+            idx = hdr.index(srcfld)
+            # try using generator comprehension
+            vals = (row[idx] for row in rows)
+            aggval = aggfun(vals)
+            outrow.append(aggval)
+    return tuple(outrow)
+
+
+def iterhashmultiaggregate(source, key, aggregation, buffersize, tempdir,
+                           budget=None):
+    it = iter(source)
+    hdr = next(it)
+    aggregation = _normaggregation(aggregation)
+    outhdr = _aggregateheader(key)
+    for outfld in aggregation:
+        outhdr.append(outfld)
+    yield tuple(outhdr)
+    flds = list(map(text_type, hdr))
+
+    if _allaggregators(aggregation):
+        start, step, finishstates = _aggregatorsteps(
+            hdr, aggregation, getrow=lambda row: Record(row, flds)
+        )
+
+        def finish(k, states):
+            return _aggregatekey(key, k) + finishstates(states)
+
+    else:
+        if budget is None:
+            budget = _RowBudget(None)
+
+        def start(row):
+            budget.add()
+            return [Record(row, flds)]
+
+        def step(rows, row):
+            budget.add()
+            rows.append(Record(row, flds))
+            return rows
+
+        def finish(k, rows):
+            budget.release(len(rows))
+            return _multiaggregaterow(hdr, key, aggregation, k, rows)
+
+    for outrow in hashreduce(it, _hashkeygetter(hdr, key), start, step,
+                             finish, buffersize, tempdir):
+        yield outrow
+
+
+def _checkmergeable(aggregation):
+    for outfld, (_, aggfun) in aggregation.items():
+        if not isinstance(aggfun, Aggregator):
+            raise ArgumentError(
+                'aggregating with workers requires aggregators which can '
+                'merge partial results, see petl.aggregators; found %r for '
+                'field %r' % (aggfun, outfld)
+            )
+
+
+def _partialsteps(hdr, aggregation, value):
+    # start, step and finish functions for the states of a single
+    # aggregation (with value) or normalised multiple aggregations
+    if isinstance(aggregation, Aggregator):
+        getvalue = _hashvaluegetter(hdr, value)
+        update = aggregation.update
+
+        def start(row):
+            return [update(aggregation.init(), getvalue(row))]
+
+        def step(states, row):
+            states[0] = update(states[0], getvalue(row))
+            return states
+
+        def finish(states):
+            return aggregation.finalize(states[0]),
+
+        return start, step, finish
+    flds = list(map(text_type, hdr))
+    return _aggregatorsteps(hdr, aggregation,
+                            getrow=lambda row: Record(row, flds))
+
+
+def _aggregatebatch(hdr, key, aggregation, value, rows):
+    # runs in a worker process, returns the states for each group in rows
+    getkey = _hashkeygetter(hdr, key) if key is not None \
+        else lambda row: None
+    start, step, _ = _partialsteps(hdr, aggregation, value)
+    groups = dict()
+    for row in rows:
+        k = getkey(row)
+        if k in groups:
+            groups[k] = step(groups[k], row)
+        else:
+            groups[k] = start(row)
+    return groups
+
+
+def iterparallelaggregate(source, key, aggregation, value, field, workers):
+    it = iter(source)
+    hdr = tuple(next(it))
+    outhdr = _aggregateheader(key)
+    if isinstance(aggregation, Aggregator):
+        aggs = [aggregation]
+        outhdr.append(field)
+    else:
+        aggregation = _normaggregation(aggregation)
+        _checkmergeable(aggregation)
+        aggs = [aggfun for _, aggfun in aggregation.values()]
+        outhdr.extend(aggregation)
+    yield tuple(outhdr)
+    _, _, finish = _partialsteps(hdr, aggregation, value)
+
+    groups = dict()
+
+    def combine(partial):
+        # N.B., batches are combined in the order they were read, which
+        # matters for aggregators such as First and Last
+        for k, states in partial.items():
+            if k in groups:
+                groups[k] = [agg.merge(state, other) for agg, state, other
+                             in zip(aggs, groups[k], states)]
             else:
-                idx = hdr.index(srcfld)
-                # try using generator comprehension
-                vals = (row[idx] for row in rows)
-                aggval = aggfun(vals)
-                outrow.append(aggval)
-        yield tuple(outrow)
+                groups[k] = states
+
+    pending = deque()
+    pool = multiprocessing.Pool(workers)
+    try:
+        rows = readchunk(it, config.aggregate_batchsize)
+        while rows:
+            pending.append(pool.apply_async(
+                _aggregatebatch, (hdr, key, aggregation, value, rows)
+            ))
+            # don't let the reader run too far ahead of the workers
+            while len(pending) > workers:
+                combine(pending.popleft().get())
+            rows = readchunk(it, config.aggregate_batchsize)
+        while pending:
+            combine(pending.popleft().get())
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    debug('merged partial aggregates for %s groups', len(groups))
+
+    if key is None and not groups and isinstance(aggregation, Aggregator):
+        # like aggregating an empty sequence of values
+        yield aggregation.finalize(aggregation.init()),
+    for k in sorted(groups, key=Comparable):
+        yield _aggregatekey(key, k) + finish(groups.pop(k))
+
+
+def groupingsets(table, sets, aggregation=None, value=None, field='value',
+                 groupingid='grouping_id', missing=None, buffersize=None,
+                 tempdir=None):
+    """Aggregate under several keys (grouping sets) in a single pass over the
+    table. E.g.::
+
+        >>> import petl as etl
+        >>> from petl.aggregators import Sum
+        >>> table1 = [['region', 'country', 'sales'],
+        ...           ['eu', 'fr', 3],
+        ...           ['eu', 'de', 4],
+        ...           ['us', 'us', 7],
+        ...           ['eu', 'fr', 2]]
+        >>> table2 = etl.groupingsets(table1, [('region', 'country'),
+        ...                                    ('country',), ()],
+        ...                           Sum(), 'sales')
+        >>> table2.lookall()
+        +--------+---------+-------------+-------+
+        | region | country | grouping_id | value |
+        +========+=========+=============+=======+
+        | 'eu'   | 'de'    |           0 |     4 |
+        +--------+---------+-------------+-------+
+        | 'eu'   | 'fr'    |           0 |     5 |
+        +--------+---------+-------------+-------+
+        | 'us'   | 'us'    |           0 |     7 |
+        +--------+---------+-------------+-------+
+        | None   | 'de'    |           2 |     4 |
+        +--------+---------+-------------+-------+
+        | None   | 'fr'    |           2 |     5 |
+        +--------+---------+-------------+-------+
+        | None   | 'us'    |           2 |     7 |
+        +--------+---------+-------------+-------+
+        | None   | None    |           3 |    16 |
+        +--------+---------+-------------+-------+
+
+    Each of the `sets` is a field or a list or tuple of fields, and the
+    output has a row for each group under each set, in the order of the
+    sets, then sorted by key. The output fields are those used by any set,
+    in order of first appearance, where fields not in a row's set have the
+    value `missing`, followed by a `groupingid` field (omitted if
+    `groupingid` is `None`), then the aggregated fields. The grouping id is
+    a bit mask of the fields not in the set, with the first field the most
+    significant bit, like SQL's ``GROUPING_ID()``.
+
+    The `aggregation`, `value` and `field` arguments are as for
+    :func:`aggregate`. For aggregators (see :mod:`petl.aggregators`), each
+    row updates the states of one group per set. Otherwise the values for
+    every group are held in memory until the table has been read, and if
+    more than `buffersize` values are held at once, the table is instead
+    aggregated under each set in turn with ``aggregate(...,
+    strategy='sort')``. Once there are `buffersize` groups in total, rows
+    are hash-partitioned into temporary files in `tempdir` as with
+    ``aggregate(..., strategy='hash')``. As in SQL, there is a row for the
+    empty set (the grand total) even if the table has no rows.
+
+    See also :func:`rollup` and :func:`cube`.
+
+    """
+
+    return GroupingSetsView(table, sets, aggregation=aggregation, value=value,
+                            field=field, groupingid=groupingid,
+                            missing=missing, buffersize=buffersize,
+                            tempdir=tempdir)
+
+
+Table.groupingsets = groupingsets
+
+
+def rollup(table, key, aggregation=None, value=None, field='value',
+           groupingid='grouping_id', missing=None, buffersize=None,
+           tempdir=None):
+    """Aggregate under the `key` fields and each of their prefixes, down to
+    the grand total, e.g., ``rollup(table, ('region', 'country'), ...)`` is
+    ``groupingsets(table, [('region', 'country'), ('region',), ()], ...)``.
+    See :func:`groupingsets`."""
+
+    key = _fieldlist(key)
+    sets = [key[:n] for n in range(len(key), -1, -1)]
+    return groupingsets(table, sets, aggregation=aggregation, value=value,
+                        field=field, groupingid=groupingid, missing=missing,
+                        buffersize=buffersize, tempdir=tempdir)
+
+
+Table.rollup = rollup
+
+
+def cube(table, key, aggregation=None, value=None, field='value',
+         groupingid='grouping_id', missing=None, buffersize=None,
+         tempdir=None):
+    """Aggregate under every combination of the `key` fields, from all of
+    them down to the grand total. See :func:`groupingsets`."""
+
+    key = _fieldlist(key)
+    sets = [list(s) for n in range(len(key), -1, -1)
+            for s in itertools.combinations(key, n)]
+    return groupingsets(table, sets, aggregation=aggregation, value=value,
+                        field=field, groupingid=groupingid, missing=missing,
+                        buffersize=buffersize, tempdir=tempdir)
+
+
+Table.cube = cube
+
+
+def _fieldlist(fields):
+    if isinstance(fields, (list, tuple)):
+        return list(fields)
+    return [fields]
+
+
+class GroupingSetsView(Table):
+
+    def __init__(self, source, sets, aggregation=None, value=None,
+                 field='value', groupingid='grouping_id', missing=None,
+                 buffersize=None, tempdir=None):
+        self.source = source
+        self.sets = [_fieldlist(s) for s in sets]
+        if not self.sets:
+            raise ArgumentError('at least one grouping set is required')
+        if callable(aggregation):
+            self.aggregation = aggregation
+        elif aggregation is None:
+            self.aggregation = OrderedDict()
+        elif isinstance(aggregation, (list, tuple)):
+            self.aggregation = OrderedDict()
+            for t in aggregation:
+                self.aggregation[t[0]] = t[1:]
+        elif isinstance(aggregation, dict):
+            self.aggregation = aggregation
+        else:
+            raise ArgumentError('expected aggregation is callable, list, '
+                                'tuple, dict or None')
+        self.value = value
+        self.field = field
+        self.groupingid = groupingid
+        self.missing = missing
+        self.buffersize = buffersize
+        self.tempdir = tempdir
+
+    def __iter__(self):
+        return itergroupingsets(self.source, self.sets, self.aggregation,
+                                self.value, self.field, self.groupingid,
+                                self.missing, self.buffersize, self.tempdir)
+
+
+def _groupsteps(hdr, aggregation, value, budget):
+    # start, step and finish functions for the aggregated values of a group,
+    # for a single aggregation (with value) or normalised multiple
+    # aggregations, and the state of a group with no rows
+    if aggregation == len:
+        # special case counting
+        aggregation = Count()
+    if isinstance(aggregation, Aggregator):
+        return _partialsteps(hdr, aggregation, value) + \
+            ([aggregation.init()],)
+    if not callable(aggregation) and _allaggregators(aggregation):
+        return _partialsteps(hdr, aggregation, value) + \
+            ([agg.init() for _, agg in aggregation.values()],)
+    if callable(aggregation):
+        getvalue = _hashvaluegetter(hdr, value)
+        aggregate = lambda vals: (aggregation(iter(vals)),)
+    else:
+        flds = list(map(text_type, hdr))
+        getvalue = lambda row: Record(row, flds)
+        aggregate = lambda rows: _multiaggregaterow(hdr, None, aggregation,
+                                                    None, rows)
+
+    def start(row):
+        budget.add()
+        return [getvalue(row)]
+
+    def step(vals, row):
+        budget.add()
+        vals.append(getvalue(row))
+        return vals
+
+    def finish(vals):
+        budget.release(len(vals))
+        return aggregate(vals)
+
+    return start, step, finish, []
+
+
+class _GroupingSets(object):
+    # the output fields of groupingsets() and the output row for a group
+    # under each set
+
+    def __init__(self, sets, aggregation, field, groupingid, missing):
+        # every field used by a set, in order of first appearance
+        keyflds = []
+        for s in sets:
+            for f in s:
+                if f not in keyflds:
+                    keyflds.append(f)
+        outhdr = list(keyflds)
+        if groupingid is not None:
+            outhdr.append(groupingid)
+        if callable(aggregation):
+            outhdr.append(field)
+        else:
+            aggregation = _normaggregation(aggregation)
+            outhdr.extend(aggregation)
+        self.header = tuple(outhdr)
+        self.aggregation = aggregation
+        self.groupingid = groupingid
+        self.missing = missing
+        self.width = len(keyflds)
+        # for each set, the positions of its fields in the output and the
+        # grouping id
+        self.prefixes = []
+        for s in sets:
+            positions = [keyflds.index(f) for f in s]
+            gid = sum(1 << (len(keyflds) - 1 - j)
+                      for j, f in enumerate(keyflds) if f not in s)
+            self.prefixes.append((positions, gid))
+
+    def outrow(self, i, key, values):
+        positions, gid = self.prefixes[i]
+        out = [self.missing] * self.width
+        for p, v in zip(positions, key):
+            out[p] = v
+        if self.groupingid is not None:
+            out.append(gid)
+        return tuple(out) + tuple(values)
+
+
+def itergroupingsets(source, sets, aggregation, value, field, groupingid,
+                     missing, buffersize, tempdir):
+    budget = _RowBudget(buffersize)
+    return _iterhashorsort(
+        lambda: iterhashgroupingsets(source, sets, aggregation, value, field,
+                                     groupingid, missing, buffersize,
+                                     tempdir, budget),
+        lambda: itersortgroupingsets(source, sets, aggregation, value, field,
+                                     groupingid, missing, buffersize,
+                                     tempdir)
+    )
+
+
+def iterhashgroupingsets(source, sets, aggregation, value, field, groupingid,
+                         missing, buffersize, tempdir, budget):
+    it = iter(source)
+    hdr = next(it)
+    gs = _GroupingSets(sets, aggregation, field, groupingid, missing)
+    yield gs.header
+
+    # for each set, the key getter
+    getkeys = []
+    for s in sets:
+        indices = asindices(hdr, s)
+        if len(indices) > 1:
+            getkeys.append(operator.itemgetter(*indices))
+        elif indices:
+            i = indices[0]
+            getkeys.append(lambda row, i=i: (row[i],))
+        else:
+            getkeys.append(lambda row: ())
+
+    start, step, finish, empty = _groupsteps(hdr, gs.aggregation, value,
+                                             budget)
+    nrows = [0]
+
+    def expand():
+        # one item per set for each row, so each row updates a group under
+        # every set
+        setkeys = list(enumerate(getkeys))
+        for row in it:
+            nrows[0] += 1
+            for i, getkey in setkeys:
+                yield (i, getkey(row)), row
+
+    for row in hashreduce(expand(), operator.itemgetter(0),
+                          lambda item: start(item[1]),
+                          lambda state, item: step(state, item[1]),
+                          lambda k, state: gs.outrow(k[0], k[1],
+                                                     finish(state)),
+                          buffersize, tempdir):
+        yield row
+
+    # like SQL, there's a grand total even if there are no rows
+    if not nrows[0]:
+        for i, s in enumerate(sets):
+            if not s:
+                yield gs.outrow(i, (), finish(empty))
+
+
+def itersortgroupingsets(source, sets, aggregation, value, field, groupingid,
+                         missing, buffersize, tempdir):
+    # aggregate under each set in turn, sorting the table for each
+    gs = _GroupingSets(sets, aggregation, field, groupingid, missing)
+    yield gs.header
+    for i, s in enumerate(sets):
+        key = tuple(s) if len(s) > 1 else s[0] if s else None
+        it = iter(aggregate(source, key, gs.aggregation, value,
+                            buffersize=buffersize, tempdir=tempdir))
+        next(it)
+        for row in it:
+            yield gs.outrow(i, row[:len(s)], row[len(s):])
 
 
 def groupcountdistinctvalues(table, key, value):
@@ -402,7 +1137,7 @@ Table.groupcountdistinctvalues = groupcountdistinctvalues
 
 
 def groupselectfirst(table, key, presorted=False, buffersize=None,
-                     tempdir=None, cache=True):
+                     tempdir=None, cache=True, strategy='sort'):
     """Group by the `key` field then return the first row within each group.
     E.g.::
 
@@ -424,11 +1159,20 @@ def groupselectfirst(table, key, presorted=False, buffersize=None,
         | 'C' |   7 | False |
         +-----+-----+-------+
 
+    If `strategy` is 'hash', the table is not sorted, instead the first row
+    for each key value is kept in a dictionary, see
+    :func:`petl.transform.reductions.aggregate`.
+
     See also :func:`petl.transform.reductions.groupselectlast`,
     :func:`petl.transform.dedup.distinct`.
 
     """
 
+    _checkstrategy(strategy)
+    if strategy == 'hash':
+        return HashGroupSelectView(table, key, 'first',
+                                   buffersize=buffersize, tempdir=tempdir)
+
     def _reducer(k, rows):
         return next(rows)
 
@@ -440,7 +1184,7 @@ Table.groupselectfirst = groupselectfirst
 
 
 def groupselectlast(table, key, presorted=False, buffersize=None,
-                    tempdir=None, cache=True):
+                    tempdir=None, cache=True, strategy='sort'):
     """Group by the `key` field then return the last row within each group.
     E.g.::
 
@@ -462,6 +1206,9 @@ def groupselectlast(table, key, presorted=False, buffersize=None,
         | 'C' |   9 | True  |
         +-----+-----+-------+
 
+    The `strategy` argument is as for
+    :func:`petl.transform.reductions.groupselectfirst`.
+
     See also :func:`petl.transform.reductions.groupselectfirst`,
     :func:`petl.transform.dedup.distinct`.
 
@@ -469,6 +1216,11 @@ def groupselectlast(table, key, presorted=False, buffersize=None,
 
     """
 
+    _checkstrategy(strategy)
+    if strategy == 'hash':
+        return HashGroupSelectView(table, key, 'last',
+                                   buffersize=buffersize, tempdir=tempdir)
+
     def _reducer(k, rows):
         row = None
         for row in rows:
@@ -483,11 +1235,17 @@ Table.groupselectlast = groupselectlast
 
 
 def groupselectmin(table, key, value, presorted=False, buffersize=None,
-                   tempdir=None, cache=True):
+                   tempdir=None, cache=True, strategy='sort'):
     """Group by the `key` field then return the row with the minimum of the
     `value` field within each group. N.B., will only return one row for each
-    group, even if multiple rows have the same (minimum) value."""
-
+    group, even if multiple rows have the same (minimum) value. If `strategy`
+    is 'hash' neither sort is needed, see
+    :func:`petl.transform.reductions.groupselectfirst`."""
+
+    _checkstrategy(strategy)
+    if strategy == 'hash':
+        return HashGroupSelectView(table, key, 'min', value=value,
+                                   buffersize=buffersize, tempdir=tempdir)
     return groupselectfirst(sort(table, value, reverse=False), key,
                             presorted=presorted, buffersize=buffersize,
                             tempdir=tempdir, cache=cache)
@@ -497,11 +1255,17 @@ Table.groupselectmin = groupselectmin
 
     
 def groupselectmax(table, key, value, presorted=False, buffersize=None,
-                   tempdir=None, cache=True):
+                   tempdir=None, cache=True, strategy='sort'):
     """Group by the `key` field then return the row with the maximum of the
     `value` field within each group. N.B., will only return one row for each
-    group, even if multiple rows have the same (maximum) value."""
-
+    group, even if multiple rows have the same (maximum) value. If `strategy`
+    is 'hash' neither sort is needed, see
+    :func:`petl.transform.reductions.groupselectfirst`."""
+
+    _checkstrategy(strategy)
+    if strategy == 'hash':
+        return HashGroupSelectView(table, key, 'max', value=value,
+                                   buffersize=buffersize, tempdir=tempdir)
     return groupselectfirst(sort(table, value, reverse=True), key,
                             presorted=presorted, buffersize=buffersize,
                             tempdir=tempdir, cache=cache)
@@ -510,8 +1274,69 @@ def groupselectmax(table, key, value, presorted=False, buffersize=None,
 Table.groupselectmax = groupselectmax
 
 
+class HashGroupSelectView(Table):
+
+    def __init__(self, table, key, select, value=None, buffersize=None,
+                 tempdir=None):
+        self.table = table
+        self.key = key
+        self.select = select
+        self.value = value
+        self.buffersize = buffersize
+        self.tempdir = tempdir
+
+    def __iter__(self):
+        return iterhashgroupselect(self.table, self.key, self.select,
+                                   self.value, self.buffersize, self.tempdir)
+
+
+def iterhashgroupselect(table, key, select, value, buffersize, tempdir):
+    it = iter(table)
+    hdr = next(it)
+    yield tuple(hdr)
+
+    if select == 'first':
+        def step(acc, row):
+            return acc
+    elif select == 'last':
+        def step(acc, row):
+            return row
+    else:
+        # compare as sort() would, keeping the earliest row of any ties
+        getvalue = operator.itemgetter(*asindices(hdr, value))
+        if select == 'min':
+            def better(v, best):
+                return v < best
+        else:
+            def better(v, best):
+                return v > best
+
+        def step(acc, row):
+            v = Comparable(getvalue(row))
+            if better(v, acc[0]):
+                return v, row
+            return acc
+
+    if select in ('first', 'last'):
+        def start(row):
+            return row
+
+        def finish(k, row):
+            return tuple(row)
+    else:
+        def start(row):
+            return Comparable(getvalue(row)), row
+
+        def finish(k, acc):
+            return tuple(acc[1])
+
+    for outrow in hashreduce(it, _hashkeygetter(hdr, key), start, step,
+                             finish, buffersize, tempdir):
+        yield outrow
+
+
 def mergeduplicates(table, key, missing=None, presorted=False, buffersize=None,
-                    tempdir=None, cache=True):
+                    tempdir=None, cache=True, strategy='sort'):
     """
     Merge duplicate rows under the given key. E.g.::
 
@@ -547,13 +1372,17 @@ def mergeduplicates(table, key, missing=None, presorted=False, buffersize=None,
     `buffersize`, `tempdir` and `cache` arguments under the
     :func:`petl.transform.sorts.sort` function.
 
+    If `strategy` is 'hash', the table is not sorted, instead the values for
+    each key are merged in a dictionary, see
+    :func:`petl.transform.reductions.aggregate`.
+
     See also :func:`petl.transform.dedup.conflicts`.
 
     """
 
     return MergeDuplicatesView(table, key, missing=missing, presorted=presorted,
                                buffersize=buffersize, tempdir=tempdir,
-                               cache=cache)
+                               cache=cache, strategy=strategy)
 
 
 Table.mergeduplicates = mergeduplicates
@@ -562,22 +1391,27 @@ Table.mergeduplicates = mergeduplicates
 class MergeDuplicatesView(Table):
 
     def __init__(self, table, key, missing=None, presorted=False,
-                 buffersize=None, tempdir=None, cache=True):
-        if presorted:
+                 buffersize=None, tempdir=None, cache=True, strategy='sort'):
+        _checkstrategy(strategy)
+        if presorted or strategy == 'hash':
             self.table = table
         else:
             self.table = sort(table, key, buffersize=buffersize,
                               tempdir=tempdir, cache=cache)
         self.key = key
         self.missing = missing
+        self.strategy = strategy
+        self.buffersize = buffersize
+        self.tempdir = tempdir
 
     def __iter__(self):
+        if self.strategy == 'hash':
+            return iterhashmergeduplicates(self.table, self.key, self.missing,
+                                           self.buffersize, self.tempdir)
         return itermergeduplicates(self.table, self.key, self.missing)
 
 
-def itermergeduplicates(table, key, missing):
-    it = iter(table)
-    hdr, it = iterpeek(it)
+def _mergeduplicatesheader(hdr, key):
     flds = list(map(text_type, hdr))
 
     # determine output fields
@@ -590,6 +1424,20 @@ def itermergeduplicates(table, key, missing):
     valflds = [f for f in flds if f not in keyflds]
     valfldidxs = [flds.index(f) for f in valflds]
     outhdr.extend(valflds)
+    return outhdr, valfldidxs
+
+
+def _normmergedvalues(mergedvals, missing):
+    return [vals.pop() if len(vals) == 1
+            else missing if len(vals) == 0
+            else Conflict(vals)
+            for vals in mergedvals]
+
+
+def itermergeduplicates(table, key, missing):
+    it = iter(table)
+    hdr, it = iterpeek(it)
+    outhdr, valfldidxs = _mergeduplicatesheader(hdr, key)
     yield tuple(outhdr)
 
     # do the work
@@ -602,14 +1450,38 @@ def itermergeduplicates(table, key, missing):
         mergedvals = [set(row[i] for row in grp
                           if len(row) > i and row[i] != missing)
                       for i in valfldidxs]
-        normedvals = [vals.pop() if len(vals) == 1
-                      else missing if len(vals) == 0
-                      else Conflict(vals)
-                      for vals in mergedvals]
-        outrow.extend(normedvals)
+        outrow.extend(_normmergedvalues(mergedvals, missing))
         yield tuple(outrow)
 
 
+def iterhashmergeduplicates(table, key, missing, buffersize, tempdir):
+    it = iter(table)
+    hdr = next(it)
+    outhdr, valfldidxs = _mergeduplicatesheader(hdr, key)
+    yield tuple(outhdr)
+
+    def step(mergedvals, row):
+        n = len(row)
+        for vals, i in zip(mergedvals, valfldidxs):
+            if n > i and row[i] != missing:
+                vals.add(row[i])
+        return mergedvals
+
+    def start(row):
+        return step([set() for _ in valfldidxs], row)
+
+    if isinstance(key, string_types):
+        def finish(k, mergedvals):
+            return tuple([k] + _normmergedvalues(mergedvals, missing))
+    else:
+        def finish(k, mergedvals):
+            return tuple(list(k) + _normmergedvalues(mergedvals, missing))
+
+    for outrow in hashreduce(it, _hashkeygetter(hdr, key), start, step,
+                             finish, buffersize, tempdir):
+        yield outrow
+
+
 def merge(*tables, **kwargs):
     """
     Convenience function to combine multiple tables (via
@@ -661,7 +1533,7 @@ class Conflict(frozenset):
 
 
 def fold(table, key, f, value=None, presorted=False, buffersize=None,
-         tempdir=None, cache=True):
+         tempdir=None, cache=True, strategy='sort'):
     """
     Reduce rows recursively via the Python standard :func:`reduce` function.
     E.g.::
@@ -684,13 +1556,18 @@ def fold(table, key, f, value=None, presorted=False, buffersize=None,
         |   2 |    12 |
         +-----+-------+
 
+    If `strategy` is 'hash', the table is not sorted, instead the running
+    value for each key is kept in a dictionary, see
+    :func:`petl.transform.reductions.aggregate`.
+
     See also :func:`petl.transform.reductions.aggregate`,
     :func:`petl.transform.reductions.rowreduce`.
 
     """
 
     return FoldView(table, key, f, value=value, presorted=presorted,
-                    buffersize=buffersize, tempdir=tempdir, cache=cache)
+                    buffersize=buffersize, tempdir=tempdir, cache=cache,
+                    strategy=strategy)
 
 
 Table.fold = fold
@@ -699,8 +1576,9 @@ Table.fold = fold
 class FoldView(Table):
 
     def __init__(self, table, key, f, value=None, presorted=False,
-                 buffersize=None, tempdir=None, cache=True):
-        if presorted:
+                 buffersize=None, tempdir=None, cache=True, strategy='sort'):
+        _checkstrategy(strategy)
+        if presorted or strategy == 'hash':
             self.table = table
         else:
             self.table = sort(table, key, buffersize=buffersize,
@@ -708,8 +1586,14 @@ class FoldView(Table):
         self.key = key
         self.f = f
         self.value = value
+        self.strategy = strategy
+        self.buffersize = buffersize
+        self.tempdir = tempdir
 
     def __iter__(self):
+        if self.strategy == 'hash':
+            return iterhashfold(self.table, self.key, self.f, self.value,
+                                self.buffersize, self.tempdir)
         return iterfold(self.table, self.key, self.f, self.value)
 
 
@@ -717,3 +1601,171 @@ def iterfold(table, key, f, value):
     yield ('key', 'value')
     for k, grp in rowgroupby(table, key, value):
         yield k, reduce(f, grp)
+
+
+def iterhashfold(table, key, f, value, buffersize, tempdir):
+    it = iter(table)
+    hdr = next(it)
+    yield ('key', 'value')
+    getvalue = _hashvaluegetter(hdr, value)
+
+    def start(row):
+        return getvalue(row)
+
+    def step(acc, row):
+        return f(acc, getvalue(row))
+
+    def finish(k, acc):
+        return k, acc
+
+    for outrow in hashreduce(it, _hashkeygetter(hdr, key), start, step,
+                             finish, buffersize, tempdir):
+        yield outrow
+
+
+def _checkstrategy(strategy):
+    if strategy not in ('sort', 'hash'):
+        raise ArgumentError('strategy must be \'sort\' or \'hash\', found '
+                            '%r' % strategy)
+
+
+def _hashkeygetter(hdr, key):
+    # get the same key values from rows as rowgroupby()
+    if callable(key):
+        flds = list(map(text_type, hdr))
+        return lambda row: key(Record(row, flds))
+    return operator.itemgetter(*asindices(hdr, key))
+
+
+def _hashvaluegetter(hdr, value):
+    # get the same values from rows as rowgroupby()
+    if value is None:
+        flds = list(map(text_type, hdr))
+        return lambda row: Record(row, flds)
+    elif callable(value):
+        flds = list(map(text_type, hdr))
+        return lambda row: value(Record(row, flds))
+    return operator.itemgetter(*asindices(hdr, value))
+
+
+class _HashBufferFull(Exception):
+    pass
+
+
+class _RowBudget(object):
+    # count of the rows buffered in the groups held in memory by
+    # hashreduce(), where rows are counted when added to a group and
+    # released when the group is finished, and at most maxrows may be
+    # held at once (by default petl.config.sort_buffersize, so no more than
+    # a sort would hold), N.B., there's no sort to fall back on for callable
+    # keys so their rows aren't limited
+
+    def __init__(self, buffersize, key=None):
+        if buffersize is None:
+            buffersize = config.sort_buffersize
+        self.maxrows = None if callable(key) else buffersize
+        self.nrows = 0
+
+    def add(self):
+        self.nrows += 1
+        if self.maxrows is not None and self.nrows > self.maxrows:
+            raise _HashBufferFull(self.nrows)
+
+    def release(self, n):
+        self.nrows -= n
+
+
+def _iterhashorsort(iterhash, itersort):
+    # yield the rows from the hash strategy, unless too many rows are
+    # buffered, in which case start again with the sort strategy, which
+    # spills, N.B., hashreduce() reads the whole table before yielding
+    # anything, so only the header can have been yielded already
+    n = 0
+    try:
+        for row in iterhash():
+            yield row
+            n += 1
+    except _HashBufferFull as e:
+        debug('%s rows buffered for hash grouping, sorting instead', e)
+        for row in itertools.islice(itersort(), n, None):
+            yield row
+
+
+_hashpartitions = 16
+_hashmaxdepth = 3
+
+
+def hashreduce(rows, getkey, start, step, finish, buffersize=None,
+               tempdir=None):
+    """Group `rows` by the value returned by `getkey` for each row using a
+    dictionary, and return an iterator over the output rows for each group,
+    sorted by key. For each group, the accumulator is ``start(row)`` for the
+    first row, then ``step(accumulator, row)`` for each further row, and
+    the output row is ``finish(key, accumulator)``.
+
+    At most `buffersize` groups are held in memory (by default
+    `petl.config.sort_buffersize`). Rows for further groups are
+    hash-partitioned into temporary files in `tempdir`, and the partitions
+    grouped in turn once all the rows have been read, with their output
+    rows written to temporary files, then merged in key order."""
+
+    if buffersize is None:
+        buffersize = config.sort_buffersize
+    return (outrow for _, outrow in _hashreduce(iter(rows), getkey, start,
+                                                step, finish, buffersize,
+                                                getcodec(), tempdir, 0))
+
+
+def _hashreduce(it, getkey, start, step, finish, buffersize, codec, tempdir,
+                depth):
+    # yield (key, output row) pairs in key order
+    groups = dict()
+    # don't split partitions that are still too big forever, e.g., where
+    # most rows share one key
+    limit = buffersize if depth < _hashmaxdepth else None
+
+    def absorb():
+        # update accumulators in memory, passing on rows for other groups
+        for row in it:
+            k = getkey(row)
+            if k in groups:
+                groups[k] = step(groups[k], row)
+            elif limit is None or len(groups) < limit:
+                groups[k] = start(row)
+            else:
+                yield row
+
+    parts = partitionrows(absorb(), getkey, _hashpartitions, codec, tempdir,
+                          salt=depth)
+    parts = [p for p in parts if p is not None]
+    if limit is None and buffersize is not None \
+            and len(groups) > buffersize:
+        warning('%s groups held in memory after %s partitioning passes',
+                len(groups), depth)
+
+    # only the groups need sorting
+    result = [(k, finish(k, groups.pop(k)))
+              for k in sorted(groups, key=Comparable)]
+    if not parts:
+        for item in result:
+            yield item
+        return
+
+    debug('grouped %s keys in memory, %s partitions to go, depth %s',
+          len(result), len(parts), depth)
+    runs = [result]
+    while parts:
+        # N.B., each partition file is deleted once its groups are written
+        p = parts.pop(0)
+        out = _hashreduce(iterchunk(p.name, codec), getkey, start, step,
+                          finish, buffersize, codec, tempdir, depth + 1)
+        runs.append(_iterrun(NamedTempFileDeleteOnGC(
+            dumpchunk(out, codec, tempdir)), codec))
+    for item in _mergesorted(lambda item: Comparable(item[0]), False, *runs):
+        yield item
+
+
+def _iterrun(f, codec):
+    # N.B., hold a reference to the file so it isn't deleted until read
+    for item in iterchunk(f.name, codec):
+        yield item
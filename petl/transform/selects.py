@@ -8,6 +8,7 @@ from petl.comparison import Comparable
 
 from petl.errors import ArgumentError
 from petl.util.base import asindices, expr, Table, values, Record
+from petl.transform.sorts import getsortedby
 
 
 def select(table, *args, **kwargs):
@@ -91,6 +92,10 @@ class RowSelectView(Table):
         self.missing = missing
         self.complement = complement
 
+    @property
+    def sortedby(self):
+        return getsortedby(self.source)
+
     def __iter__(self):
         return iterrowselect(self.source, self.where, self.missing,
                              self.complement)
@@ -105,6 +110,10 @@ class FieldSelectView(Table):
         self.complement = complement
         self.missing = missing
 
+    @property
+    def sortedby(self):
+        return getsortedby(self.source)
+
     def __iter__(self):
         return iterfieldselect(self.source, self.field, self.where,
                                self.complement, self.missing)
@@ -415,6 +424,10 @@ class SelectUsingContextView(Table):
         self.table = table
         self.query = query
 
+    @property
+    def sortedby(self):
+        return getsortedby(self.table)
+
     def __iter__(self):
         return iterselectusingcontext(self.table, self.query)
 
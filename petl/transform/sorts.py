@@ -2,18 +2,26 @@ from __future__ import absolute_import, print_function, division
 
 
 import os
+import sys
 import heapq
-from tempfile import NamedTemporaryFile
+import hashlib
 import itertools
 import logging
-from collections import namedtuple
+import multiprocessing
+from tempfile import NamedTemporaryFile
+from collections import namedtuple, deque
 import operator
-from petl.compat import pickle, next, text_type
+from petl.compat import next, text_type, string_types, integer_types, \
+    numeric_types
 
 
 import petl.config as config
-from petl.comparison import comparable_itemgetter
+from petl.comparison import sortable_itemgetter, sample_keytypes, \
+    peek_sample, directional_itemgetter
 from petl.util.base import Table, asindices
+from petl.errors import ArgumentError
+from petl.spill import getcodec, dumpchunk, iterchunk, readchunk, \
+    parsesize, rowsize, NamedTempFileDeleteOnGC, SpillCodec
 
 
 logger = logging.getLogger(__name__)
@@ -23,7 +31,9 @@ debug = logger.debug
 
 
 def sort(table, key=None, reverse=False, buffersize=None, tempdir=None,
-         cache=True):
+         cache=True, workers=None, spill_codec=None, memory_limit=None,
+         persist=None, persist_token=None, merge_fanin=None,
+         algorithm=None):
     """
     Sort the table. Field names or indices (from zero) can be used to specify
     the key. E.g.::
@@ -85,9 +95,33 @@ def sort(table, key=None, reverse=False, buffersize=None, tempdir=None,
         | 'F' |   1 |
         +-----+-----+
 
+    The `reverse` argument may also be given as a sequence with one item per
+    key field, to sort some fields in ascending and others in descending
+    order, e.g.::
+
+        >>> table5 = etl.sort(table1, key=['foo', 'bar'],
+        ...                   reverse=[False, True])
+        >>> table5
+        +-----+-----+
+        | foo | bar |
+        +=====+=====+
+        | 'A' |   9 |
+        +-----+-----+
+        | 'A' |   6 |
+        +-----+-----+
+        | 'C' |   2 |
+        +-----+-----+
+        | 'D' |  10 |
+        +-----+-----+
+        | 'F' |   1 |
+        +-----+-----+
+
+    This works for values of any type, and both in memory and when sorting
+    in chunks, without extra passes over the data.
+
     The `buffersize` argument should be an `int` or `None`.
 
-    If the number of rows in the table is less than `buffersize`, the table
+    If the number of rows in the table is no more than `buffersize`, the table
     will be sorted in memory. Otherwise, the table is sorted in chunks of
     no more than `buffersize` rows, each chunk is written to a temporary file,
     and then a merge sort is performed on the temporary files.
@@ -102,29 +136,157 @@ def sort(table, key=None, reverse=False, buffersize=None, tempdir=None,
     If `petl.config.sort_buffersize` is set to `None`, this forces
     all sorting to be done entirely in memory.
 
+    Alternatively the sort buffer can be limited by memory rather than by a
+    number of rows, by giving a `memory_limit` as a number of bytes or a
+    string such as ``'512MB'`` or ``'2G'`` (units are powers of 1024). The
+    in-memory size of each row is estimated as it is read, and a chunk is
+    written to a temporary file once the estimated size of the rows buffered
+    reaches the limit. If `memory_limit` is `None`, the value of
+    `petl.config.sort_memory_limit` will be used, which by default is `None`
+    (buffer by number of rows). When a memory limit is in effect
+    `petl.config.sort_buffersize` is ignored, although chunks are still
+    limited to `buffersize` rows if that argument is given. The size of each
+    chunk is reported through the debug logger.
+
+    If `persist` is given as the path of a directory, the sorted output is
+    also written to a compressed run file in that directory, and any later
+    sort of the same source by the same key, in this or another process,
+    streams rows straight from that file without sorting again. The run file
+    is named after a fingerprint of the source and the `key` and `reverse`
+    arguments. If the table was read directly from a local file (e.g., via
+    :func:`petl.io.csv.fromcsv`), the fingerprint is derived from the path,
+    size and modification time of the file and the arguments it was read
+    with. Otherwise, or to control when the run file is reused, give a
+    `persist_token` which identifies the contents of the source, e.g., a
+    version or date stamp. Run files are never deleted by petl.
+
     By default the results of the sort will be cached, and so a second pass over
     the sorted table will yield rows from the cache and will not repeat the
     sort operation. To turn off caching, set the `cache` argument to `False`.
 
+    The `workers` argument should be an `int` or `None`. When the table does
+    not fit within the sort buffer and `workers` is greater than 1, each chunk
+    is sorted and written to its temporary file by a pool of `workers`
+    processes while the source table continues to be read, and the chunk
+    files are then merged as usual. The output is identical to sorting in a
+    single process. At most `workers` chunks are handed to the pool at any one
+    time, so up to ``workers + 1`` chunks may be held in memory. If `workers`
+    is `None`, the value of `petl.config.sort_workers` will be used, which
+    by default is `None` (sort all chunks in the current process).
+
+    The `spill_codec` argument controls how chunks are written to temporary
+    files. It may be a :class:`petl.spill.SpillCodec`, or a string naming a
+    serializer ('pickle' or 'marshal') optionally followed by a compression
+    ('zlib', 'lzma' or 'bz2'), e.g., ``'marshal+zlib'``. Rows are written
+    in blocks of `petl.config.spill_blocksize` rows. If `spill_codec` is
+    `None`, the value of `petl.config.spill_codec` will be used, which by
+    default is ``'pickle'`` (uncompressed).
+
+    When more than `merge_fanin` chunk files are written, consecutive groups
+    of `merge_fanin` chunks are first merged into larger chunk files, and so
+    on until no more than `merge_fanin` chunks remain to be merged into the
+    output, so the number of files open at any one time stays bounded. If
+    `merge_fanin` is `None`, the value of `petl.config.sort_merge_fanin` will
+    be used, which by default is 256.
+
+    The `algorithm` argument selects how a table which fits within the sort
+    buffer is sorted. With ``'comparison'`` rows are sorted by comparing key
+    values with :meth:`list.sort`. With ``'radix'`` the key values, which
+    must all be integers (e.g., surrogate keys or epoch timestamps), are
+    copied into arrays and sorted with :func:`numpy.argsort`, which is
+    typically faster for large tables and requires `numpy
+    <http://www.numpy.org>`_ to be installed. With ``'auto'`` the radix
+    engine is used if numpy is installed and every key value sampled from
+    the table is a number, falling back to comparison sorting if any key
+    value turns out not to be an integer. The output is the same whichever
+    engine is used. Tables which do not fit within the sort buffer are
+    always sorted in chunks by comparison. If `algorithm` is `None`, the
+    value of `petl.config.sort_algorithm` will be used, which by default is
+    ``'auto'``.
+
+    If the table is already known to be sorted by the given key, e.g.,
+    because it is the result of a previous sort or merge sort by the same key
+    (or by a key which starts with the same fields), possibly passed through
+    transformations which preserve the order of rows and the key values such
+    as :func:`petl.transform.selects.select`,
+    :func:`petl.transform.basics.cut`, :func:`petl.transform.headers.rename`
+    or :func:`petl.transform.conversions.convert` on other fields, the table
+    is returned unchanged. Functions that sort their inputs unless
+    ``presorted=True`` rely on this to avoid sorting the same table twice.
+    The ordering known for a table is given by its `sortedby` attribute, see
+    :func:`petl.transform.sorts.getsortedby`.
+
     """
 
+    if _satisfiessort(getsortedby(table), key, reverse):
+        debug('table already sorted by %r, not sorting again', key)
+        return table
+
     return SortView(table, key=key, reverse=reverse, buffersize=buffersize,
-                    tempdir=tempdir, cache=cache)
+                    tempdir=tempdir, cache=cache, workers=workers,
+                    spill_codec=spill_codec, memory_limit=memory_limit,
+                    persist=persist, persist_token=persist_token,
+                    merge_fanin=merge_fanin, algorithm=algorithm)
 
 
 Table.sort = sort
 
 
-def _iterchunk(fn):
-    # reopen so iterators from file cache are independent
-    debug('iterchunk, opening %s' % fn)
-    with open(fn, 'rb') as f:
-        try:
-            while True:
-                yield pickle.load(f)
-        except EOFError:
-            pass
-    debug('end of iterchunk, closed %s' % fn)
+def getsortedby(table):
+    """Return a tuple ``(fields, reverse)`` if the rows of `table` are known to
+    be sorted by the given fields (as field names or indices, or `None` for a
+    lexical sort on all fields), otherwise `None`. Views which preserve the
+    order of rows provide this via a `sortedby` attribute."""
+
+    return getattr(table, 'sortedby', None)
+
+
+def _keyfields(key):
+    if key is None:
+        return None
+    if isinstance(key, (list, tuple)):
+        return tuple(key)
+    return key,
+
+
+def _reverses(reverse, n):
+    if isinstance(reverse, (list, tuple)):
+        return tuple(bool(r) for r in reverse)
+    return (bool(reverse),) * n
+
+
+def _satisfiessort(sortedby, key, reverse):
+    if sortedby is None:
+        return False
+    fields, sortedreverse = sortedby
+    req = _keyfields(key)
+    if fields is None or req is None:
+        return (fields is None and req is None
+                and _reverses(sortedreverse, 1) == _reverses(reverse, 1))
+    # sorted by (a, b) implies sorted by (a,) and, because sorts are
+    # stable, a sort by (a,) would not change the order of rows
+    n = len(req)
+    return (0 < n <= len(fields) and fields[:n] == req
+            and _reverses(sortedreverse, len(fields))[:n]
+            == _reverses(reverse, n))
+
+
+def keepsortedby(sortedby, keep):
+    """Helper for views which preserve the order of rows but may remove or
+    change some fields. Return `sortedby` truncated at the first key field for
+    which `keep` returns false."""
+
+    if sortedby is None:
+        return None
+    fields, reverse = sortedby
+    if fields is None:
+        return None
+    kept = tuple(itertools.takewhile(keep, fields))
+    if not kept:
+        return None
+    if isinstance(reverse, (list, tuple)):
+        reverse = tuple(reverse[:len(kept)])
+    return kept, reverse
 
 
 class _Keyed(namedtuple('Keyed', ['key', 'obj'])):
@@ -204,36 +366,271 @@ def _shortlistmergesorted(key=None, reverse=False, *iterables):
             del iterators[nextidx]
 
 
-def _mergesorted(key=None, reverse=False, *iterables):
-    # N.B., I've used heapq for normal merge sort and shortlist merge sort for
-    # reverse merge sort because I've assumed that heapq.merge is faster and
-    # so is preferable but it doesn't support reverse sorting so the shortlist
-    # merge sort has to be used for reverse sorting. Some casual profiling
-    # suggests there isn't much between the two in terms of speed, but might be
-    # worth profiling more carefully
+def _decoratedmergesorted(key=None, reverse=False, *iterables):
+    """Return a single iterator over the given iterables, sorted by the
+    given `key` function, assuming the input iterables are already sorted by
+    the same function. Uses :func:`heapq.merge` with its `key` and `reverse`
+    arguments, which decorates each row with its key in a plain list and
+    breaks ties on the position of the iterable, so the merge is stable."""
 
-    if reverse:
+    return heapq.merge(*iterables, key=key, reverse=reverse)
+
+
+try:
+    # key and reverse arguments were added in Python 3.5
+    heapq.merge([], key=None, reverse=True)
+except TypeError:
+    _heapqmergekey = False
+else:
+    _heapqmergekey = True
+
+
+def _mergesorted(key=None, reverse=False, *iterables):
+    # N.B., where available heapq.merge is used with key and reverse
+    # arguments, this avoids wrapping every row in a _Keyed object and is
+    # much faster than the shortlist merge when there are many iterables.
+    # On older Pythons heapq.merge doesn't support reverse sorting so the
+    # shortlist merge sort has to be used for reverse sorting.
+
+    if _heapqmergekey:
+        return _decoratedmergesorted(key, reverse, *iterables)
+    elif reverse:
         return _shortlistmergesorted(key, True, *iterables)
     else:
         return _heapqmergesorted(key, *iterables)
 
 
+def _getsortkey(keytypes, indices, reverse):
+    # return a key function and the reverse flag to sort with, handling a
+    # separate reverse flag for each key field
+    if isinstance(reverse, (list, tuple)):
+        if len(reverse) != len(indices):
+            raise ArgumentError('reverse must have one item per key field, '
+                                'found %s for %s fields'
+                                % (len(reverse), len(indices)))
+        if all(reverse):
+            reverse = True
+        elif not any(reverse):
+            reverse = False
+        else:
+            return directional_itemgetter(keytypes, reverse, *indices), False
+    return sortable_itemgetter(keytypes, *indices), reverse
+
+
+# smallest table for which the radix engine is picked automatically, below
+# this the cost of building key arrays outweighs any gain
+_radixminrows = 1000
+
+
+def _radixdtype(np, span):
+    for dtype in np.uint8, np.uint16, np.uint32:
+        if span <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def _radixsort(rows, indices, reverse):
+    """Sort `rows` in place by the integer values of the fields at `indices`
+    using numpy, returning `False` without modifying `rows` if any key value
+    is not an integer within the range of a 64-bit integer.
+
+    Each key field is sorted in turn starting from the last with a stable
+    :func:`numpy.argsort`, after shifting key values to start from zero and
+    packing them into the smallest unsigned integer type that will hold
+    them. For keys spanning no more than 65536 values numpy uses a radix
+    sort. Ties keep their original order, as with :meth:`list.sort`."""
+
+    if not rows:
+        return True
+    import numpy as np
+
+    order = None
+    for i, rev in reversed(list(zip(indices,
+                                    _reverses(reverse, len(indices))))):
+        keys = [row[i] for row in rows]
+        if not all(isinstance(k, integer_types) for k in keys):
+            return False
+        lo, hi = min(keys), max(keys)
+        if lo < -2**63 or hi >= 2**63:
+            return False
+        # wrapping arithmetic gives the exact offset as the span fits
+        a = np.array(keys, dtype=np.int64).view(np.uint64)
+        a -= np.uint64(lo % 2**64)
+        span = hi - lo
+        if rev:
+            a = np.uint64(span) - a
+        a = a.astype(_radixdtype(np, span))
+        if order is None:
+            order = np.argsort(a, kind='stable')
+        else:
+            order = order[np.argsort(a[order], kind='stable')]
+    if order is not None:
+        rows[:] = [rows[j] for j in order.tolist()]
+    return True
+
+
+def _sortinmemory(rows, keytypes, indices, reverse, getkey, keyreverse,
+                  algorithm):
+    # sort rows in place with the engine given by algorithm
+    if algorithm == 'radix':
+        if not _radixsort(rows, indices, reverse):
+            raise ArgumentError('radix sort requires integer key values')
+        return
+    if algorithm == 'auto' and len(rows) >= _radixminrows and keytypes \
+            and all(t == tuple(numeric_types) for t in keytypes):
+        try:
+            if _radixsort(rows, indices, reverse):
+                debug('sorted %s rows with radix engine', len(rows))
+                return
+        except ImportError:
+            pass
+    rows.sort(key=getkey, reverse=keyreverse)
+
+
+def _sortdumpchunk(rows, keytypes, indices, reverse, codec, tempdir):
+    # runs in a worker process, key function is rebuilt here because lambdas
+    # cannot be pickled
+    getkey, reverse = _getsortkey(keytypes, indices, reverse)
+    rows.sort(key=getkey, reverse=reverse)
+    return dumpchunk(rows, codec, tempdir)
+
+
+def _sortchunks(rows, it, getkey, reverse, buffersize, memory_limit, codec,
+                tempdir):
+    chunkfiles = []
+    while rows:
+        rows.sort(key=getkey, reverse=reverse)
+        chunkfiles.append(NamedTempFileDeleteOnGC(dumpchunk(rows, codec,
+                                                            tempdir)))
+        # grab the next chunk
+        rows = readchunk(it, buffersize, memory_limit)
+    return chunkfiles
+
+
+def _sortchunksparallel(rows, it, keytypes, indices, reverse, buffersize,
+                        memory_limit, codec, tempdir, workers):
+    chunkfiles = []
+    pending = deque()
+    pool = multiprocessing.Pool(workers)
+    try:
+        while rows:
+            debug('submitting chunk of %s rows to worker pool', len(rows))
+            pending.append(pool.apply_async(
+                _sortdumpchunk,
+                (rows, keytypes, indices, reverse, codec, tempdir)
+            ))
+            # don't let the reader run too far ahead of the workers
+            while len(pending) >= workers:
+                fn = pending.popleft().get()
+                chunkfiles.append(NamedTempFileDeleteOnGC(fn))
+            # grab the next chunk while the workers are busy
+            rows = readchunk(it, buffersize, memory_limit)
+        # N.B., chunk files must be kept in the order the chunks were read
+        # from the source, so the merge is stable
+        while pending:
+            fn = pending.popleft().get()
+            chunkfiles.append(NamedTempFileDeleteOnGC(fn))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return chunkfiles
+
+
+# bump if the format of persistent sort runs changes
+_persistversion = 1
+_persistcodec = SpillCodec('pickle', 'zlib')
+_replace = getattr(os, 'replace', os.rename)
+
+
+def _mergechunks(chunkfiles, getkey, reverse, fanin, codec, tempdir):
+    # merge consecutive groups of chunk files into larger chunk files until
+    # no more than fanin remain, so the final merge (and each intermediate
+    # merge) never has more than fanin files open; consecutive groups keep
+    # the chunks in source order so the overall merge stays stable
+    if fanin < 2:
+        raise ArgumentError('merge fan-in must be at least 2, found %r'
+                            % fanin)
+    while len(chunkfiles) > fanin:
+        debug('merging %s chunk files with fan-in %s', len(chunkfiles),
+              fanin)
+        merged = []
+        for i in range(0, len(chunkfiles), fanin):
+            group = chunkfiles[i:i+fanin]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            chunkiters = [iterchunk(f.name, codec) for f in group]
+            rows = _mergesorted(getkey, reverse, *chunkiters)
+            merged.append(NamedTempFileDeleteOnGC(dumpchunk(rows, codec,
+                                                            tempdir)))
+            # N.B., close files before the group's chunk files are deleted
+            del chunkiters
+            del rows
+            del group
+        chunkfiles = merged
+    return chunkfiles
+
+
+def _sourcefingerprint(source):
+    # identify a table read directly from a local file, by the file's path,
+    # size and modification time, plus the arguments it was read with
+    filesource = getattr(source, 'source', None)
+    filename = getattr(filesource, 'filename', None)
+    if not isinstance(filename, string_types) \
+            or not os.path.isfile(filename):
+        return None
+    st = os.stat(filename)
+    args = sorted((k, repr(v)) for k, v in vars(source).items()
+                  if k != 'source')
+    sourceargs = sorted((k, repr(v)) for k, v in vars(filesource).items())
+    return (type(source).__name__, type(filesource).__name__,
+            os.path.abspath(filename), st.st_size, st.st_mtime, args,
+            sourceargs)
+
+
 class SortView(Table):
     def __init__(self, source, key=None, reverse=False, buffersize=None,
-                 tempdir=None, cache=True):
+                 tempdir=None, cache=True, workers=None, spill_codec=None,
+                 memory_limit=None, persist=None, persist_token=None,
+                 merge_fanin=None, algorithm=None):
         self.source = source
         self.key = key
         self.reverse = reverse
-        if buffersize is None:
+        if memory_limit is None:
+            self.memory_limit = parsesize(config.sort_memory_limit)
+        else:
+            self.memory_limit = parsesize(memory_limit)
+        if buffersize is None and self.memory_limit is None:
             self.buffersize = config.sort_buffersize
         else:
             self.buffersize = buffersize
         self.tempdir = tempdir
         self.cache = cache
+        if workers is None:
+            self.workers = config.sort_workers
+        else:
+            self.workers = workers
+        self.spill_codec = getcodec(spill_codec)
+        self.persist = persist
+        self.persist_token = persist_token
+        if merge_fanin is None:
+            self.merge_fanin = config.sort_merge_fanin
+        else:
+            self.merge_fanin = merge_fanin
+        if algorithm is None:
+            self.algorithm = config.sort_algorithm
+        else:
+            self.algorithm = algorithm
+        if self.algorithm not in ('auto', 'radix', 'comparison'):
+            raise ArgumentError('unknown sort algorithm %r' % self.algorithm)
         self._hdrcache = None
         self._memcache = None
         self._filecache = None
         self._getkey = None
+        self._keyreverse = None
 
     def clearcache(self):
         debug('clear cache')
@@ -241,6 +638,7 @@ class SortView(Table):
         self._memcache = None
         self._filecache = None
         self._getkey = None
+        self._keyreverse = None
 
     def __iter__(self):
         source = self.source
@@ -250,9 +648,75 @@ class SortView(Table):
             return self._iterfrommemcache()
         elif self.cache and self._filecache is not None:
             return self._iterfromfilecache()
+        elif self.persist is not None:
+            return self._iterpersisted(self._persistpath())
         else:
             return self._iternocache(source, key, reverse)
 
+    @property
+    def sortedby(self):
+        return _keyfields(self.key), self.reverse
+
+    def _fitsbuffer(self, n):
+        # whether n rows fit within the buffer of this sort, judging by a
+        # sample of rows if the buffer has a memory limit
+        if self.buffersize is not None and n > self.buffersize:
+            return False
+        if self.memory_limit is None:
+            return True
+        it = iter(self.source)
+        next(it, None)
+        sample = list(itertools.islice(it, 0, 100))
+        if not sample:
+            return True
+        nbytes = sum(rowsize(row) for row in sample) / len(sample) * n
+        return nbytes <= self.memory_limit
+
+    def _iscached(self):
+        if self.cache and (self._memcache is not None
+                           or self._filecache is not None):
+            return True
+        return (self.persist is not None
+                and os.path.exists(self._persistpath()))
+
+    def _persistpath(self):
+        if self.persist_token is not None:
+            fingerprint = ('token', repr(self.persist_token))
+        else:
+            fingerprint = _sourcefingerprint(self.source)
+            if fingerprint is None:
+                raise ArgumentError(
+                    'cannot fingerprint the source of a persistent sort, '
+                    'please provide a persist_token'
+                )
+        # N.B., pickles written by Python 3 may not be readable by Python 2
+        h = hashlib.sha1(repr((_persistversion, sys.version_info[0],
+                               fingerprint, self.key,
+                               self.reverse)).encode('utf-8'))
+        return os.path.join(self.persist,
+                            'petl-sort-%s.run' % h.hexdigest())
+
+    def _iterpersisted(self, path):
+        if not os.path.exists(path):
+            debug('writing persistent sort run %s', path)
+            if not os.path.isdir(self.persist):
+                os.makedirs(self.persist)
+            rows = self._iternocache(self.source, self.key, self.reverse)
+            # write to a temporary file then rename, so other processes never
+            # see a partial run
+            with NamedTemporaryFile(dir=self.persist, delete=False,
+                                    suffix='.tmp', mode='wb') as f:
+                try:
+                    _persistcodec.dump(rows, f)
+                except BaseException:
+                    f.close()
+                    os.unlink(f.name)
+                    raise
+            _replace(f.name, path)
+        debug('iterate from persistent sort run %s', path)
+        for row in iterchunk(path, _persistcodec):
+            yield tuple(row)
+
     def _iterfrommemcache(self):
         debug('iterate from memory cache')
         yield tuple(self._hdrcache)
@@ -266,8 +730,8 @@ class SortView(Table):
         filenames = list(map(operator.attrgetter('name'), filecache))
         debug('iterate from file cache: %r', filenames)
         yield tuple(self._hdrcache)
-        chunkiters = [_iterchunk(fn) for fn in filenames]
-        rows = _mergesorted(self._getkey, self.reverse, *chunkiters)
+        chunkiters = [iterchunk(fn, self.spill_codec) for fn in filenames]
+        rows = _mergesorted(self._getkey, self._keyreverse, *chunkiters)
         try:
             for row in rows:
                 yield tuple(row)
@@ -294,19 +758,29 @@ class SortView(Table):
             indices = asindices(hdr, key)
         else:
             indices = range(len(hdr))
-        # now use field indices to construct a _getkey function
-        # TODO check if this raises an exception on short rows
-        getkey = comparable_itemgetter(*indices)
-
-        # TODO support native comparison
 
         # initialise the first chunk
-        rows = list(itertools.islice(it, 0, self.buffersize))
-        rows.sort(key=getkey, reverse=reverse)
+        rows = readchunk(it, self.buffersize, self.memory_limit)
+
+        # now use field indices and the types of the key values found in the
+        # first chunk to construct a _getkey function, values are compared
+        # natively where possible rather than wrapped as Comparable
+        # TODO check if this raises an exception on short rows
+        keytypes = sample_keytypes(rows, indices)
+        getkey, keyreverse = _getsortkey(keytypes, indices, reverse)
 
         # have we exhausted the source iterator?
-        if self.buffersize is None or len(rows) < self.buffersize:
+        try:
+            nxt = next(it)
+        except StopIteration:
+            exhausted = True
+        else:
+            exhausted = False
+            it = itertools.chain([nxt], it)
+        if exhausted:
             # yes, table fits within sort buffer
+            _sortinmemory(rows, keytypes, indices, reverse, getkey,
+                          keyreverse, self.algorithm)
 
             if self.cache:
                 debug('caching mem')
@@ -314,6 +788,7 @@ class SortView(Table):
                 self._memcache = rows
                 # actually not needed to iterate from memcache
                 self._getkey = getkey
+                self._keyreverse = keyreverse
 
             for row in rows:
                 yield tuple(row)
@@ -321,64 +796,159 @@ class SortView(Table):
         else:
             # no, table is too big, need to sort in chunks
 
-            chunkfiles = []
-
-            while rows:
-
-                # dump the chunk
-                with NamedTemporaryFile(dir=self.tempdir, delete=False,
-                                        mode='wb') as f:
-                    # N.B., we **don't** want the file to be deleted on close,
-                    # but we **do** want the file to be deleted when self
-                    # is garbage collected, or when the program exits. When
-                    # all references to the wrapper are gone, the file should
-                    # get deleted.
-                    wrapper = _NamedTempFileDeleteOnGC(f.name)
-                    debug('created temporary chunk file %s' % f.name)
-                    for row in rows:
-                        pickle.dump(row, f, protocol=-1)
-                    f.flush()
-                    chunkfiles.append(wrapper)
-
-                # grab the next chunk
-                rows = list(itertools.islice(it, 0, self.buffersize))
-                rows.sort(key=getkey, reverse=reverse)
+            if self.workers is not None and self.workers > 1:
+                chunkfiles = _sortchunksparallel(rows, it, keytypes, indices,
+                                                 reverse, self.buffersize,
+                                                 self.memory_limit,
+                                                 self.spill_codec,
+                                                 self.tempdir, self.workers)
+            else:
+                chunkfiles = _sortchunks(rows, it, getkey, keyreverse,
+                                         self.buffersize, self.memory_limit,
+                                         self.spill_codec, self.tempdir)
+
+            chunkfiles = _mergechunks(chunkfiles, getkey, keyreverse,
+                                      self.merge_fanin, self.spill_codec,
+                                      self.tempdir)
 
             if self.cache:
                 debug('caching files')
                 self._hdrcache = hdr
                 self._filecache = chunkfiles
                 self._getkey = getkey
+                self._keyreverse = keyreverse
 
-            chunkiters = [_iterchunk(f.name) for f in chunkfiles]
-            for row in _mergesorted(getkey, reverse, *chunkiters):
+            chunkiters = [iterchunk(f.name, self.spill_codec)
+                          for f in chunkfiles]
+            for row in _mergesorted(getkey, keyreverse, *chunkiters):
                 yield tuple(row)
 
 
-class _NamedTempFileDeleteOnGC(object):
+def topk(table, n=5, key=None, reverse=True):
+    """
+    Select the `n` rows with the largest values of the given key. E.g.::
+
+        >>> import petl as etl
+        >>> table1 = [['foo', 'bar'],
+        ...           ['C', 2],
+        ...           ['A', 9],
+        ...           ['A', 6],
+        ...           ['F', 1],
+        ...           ['D', 10]]
+        >>> table2 = etl.topk(table1, 3, 'bar')
+        >>> table2
+        +-----+-----+
+        | foo | bar |
+        +=====+=====+
+        | 'D' |  10 |
+        +-----+-----+
+        | 'A' |   9 |
+        +-----+-----+
+        | 'A' |   6 |
+        +-----+-----+
+
+    The output is the same as ``head(sort(table, key, reverse=reverse), n)``,
+    including the order of rows with equal keys, however only `n` rows are
+    held in memory at any one time and no temporary files are written. If
+    `reverse` is `False` the rows with the smallest values of the key are
+    selected instead (see also :func:`petl.transform.sorts.bottomk`).
+
+    Note that :func:`petl.transform.basics.head` applied directly to the
+    result of :func:`petl.transform.sorts.sort` selects rows in the same
+    way, unless the sort has already been cached.
+
+    """
 
-    def __init__(self, name):
-        self.name = name
+    return TopKView(table, n, key=key, reverse=reverse)
 
-    def delete(self, unlink=os.unlink, log=logger.debug):
-        name = self.name
-        try:
-            log('deleting %s' % name)
-            unlink(name)
-        except Exception as e:
-            log('exception deleting %s: %s' % (name, e))
-            raise
-        else:
-            log('deleted %s' % name)
 
-    def __del__(self):
-        self.delete()
+Table.topk = topk
+
+
+def bottomk(table, n=5, key=None):
+    """
+    Select the `n` rows with the smallest values of the given key. E.g.::
+
+        >>> import petl as etl
+        >>> table1 = [['foo', 'bar'],
+        ...           ['C', 2],
+        ...           ['A', 9],
+        ...           ['A', 6],
+        ...           ['F', 1],
+        ...           ['D', 10]]
+        >>> table2 = etl.bottomk(table1, 2, 'bar')
+        >>> table2
+        +-----+-----+
+        | foo | bar |
+        +=====+=====+
+        | 'F' |   1 |
+        +-----+-----+
+        | 'C' |   2 |
+        +-----+-----+
+
+    The output is the same as ``head(sort(table, key), n)``. See also
+    :func:`petl.transform.sorts.topk`.
+
+    """
+
+    return TopKView(table, n, key=key, reverse=False)
+
+
+Table.bottomk = bottomk
+
+
+class TopKView(Table):
+
+    def __init__(self, source, n, key=None, reverse=True, sortview=None):
+        self.source = source
+        self.n = n
+        self.key = key
+        self.reverse = reverse
+        # the sort this view was derived from, if any
+        self.sortview = sortview
+
+    @property
+    def sortedby(self):
+        return _keyfields(self.key), self.reverse
+
+    def __iter__(self):
+        sortview = self.sortview
+        if sortview is not None and (sortview._iscached()
+                                     or not sortview._fitsbuffer(self.n)):
+            # already sorted, just take the first rows, or the rows wouldn't
+            # fit in the sort's buffer so let the sort spill
+            return itertools.islice(sortview, 0, self.n + 1)
+        return itertopk(self.source, self.n, self.key, self.reverse)
+
+
+def sortedhead(sortview, n):
+    # head of a sort, select rows with a bounded heap rather than sorting the
+    # whole table
+    return TopKView(sortview.source, n, key=sortview.key,
+                    reverse=sortview.reverse, sortview=sortview)
 
-    def __str__(self):
-        return self.name
 
-    def __repr__(self):
-        return self.name
+def itertopk(source, n, key, reverse):
+    it = iter(source)
+    hdr = next(it)
+    yield tuple(hdr)
+
+    if key is not None:
+        indices = asindices(hdr, key)
+    else:
+        indices = range(len(hdr))
+    sample, it = peek_sample(it)
+    getkey, reverse = _getsortkey(sample_keytypes(sample, indices), indices,
+                                  reverse)
+
+    # N.B., heapq.nlargest and heapq.nsmallest are equivalent to sorting and
+    # slicing, so ties come out in the same order as from a stable sort
+    if reverse:
+        rows = heapq.nlargest(n, it, key=getkey)
+    else:
+        rows = heapq.nsmallest(n, it, key=getkey)
+    for row in rows:
+        yield tuple(row)
 
 
 def mergesort(*tables, **kwargs):
@@ -471,6 +1041,10 @@ class MergeSortView(Table):
         self.header = header
         self.reverse = reverse
 
+    @property
+    def sortedby(self):
+        return _keyfields(self.key), self.reverse
+
     def __iter__(self):
         return itermergesort(self.tables, self.key, self.header, self.missing,
                              self.reverse)
@@ -525,10 +1099,13 @@ def itermergesort(sources, key, header, missing, reverse):
         indices = asindices(outhdr, key)
         # now use field indices to construct a _getkey function
         # N.B., this will probably raise an exception on short rows
-        getkey = comparable_itemgetter(*indices)
+        getkey, reverse = _getsortkey([None] * len(indices), indices, reverse)
+    elif isinstance(reverse, (list, tuple)):
+        indices = range(len(outhdr))
+        getkey, reverse = _getsortkey([None] * len(indices), indices, reverse)
 
     # OK, do the merge sort
-    for row in _shortlistmergesorted(getkey, reverse, *sits):
+    for row in _mergesorted(getkey, reverse, *sits):
         yield row
 
 
@@ -552,6 +1129,18 @@ def issorted(table, key=None, reverse=False, strict=False):
 
     """
 
+    it = iter(table)
+    flds = [text_type(f) for f in next(it)]
+    if key is None and isinstance(reverse, (list, tuple)):
+        key = list(range(len(flds)))
+    if key is None:
+        getkey = None
+    else:
+        indices = asindices(flds, key)
+        sample, it = peek_sample(it)
+        getkey, reverse = _getsortkey(sample_keytypes(sample, indices),
+                                      indices, reverse)
+
     # determine the operator to use when comparing rows
     if reverse and strict:
         op = operator.lt
@@ -562,16 +1151,13 @@ def issorted(table, key=None, reverse=False, strict=False):
     else:
         op = operator.ge
 
-    it = iter(table)
-    flds = [text_type(f) for f in next(it)]
-    if key is None:
+    if getkey is None:
         prev = next(it)
         for curr in it:
             if not op(curr, prev):
                 return False
             prev = curr
     else:
-        getkey = comparable_itemgetter(*asindices(flds, key))
         prev = next(it)
         prevkey = getkey(prev)
         for curr in it:
@@ -0,0 +1,477 @@
+from __future__ import absolute_import, print_function, division
+
+
+import itertools
+import operator
+from collections import OrderedDict, deque
+from petl.compat import next, text_type
+
+
+from petl.errors import ArgumentError
+from petl.util.base import Table, Record, asindices
+from petl.aggregators import Aggregator, Count, Sum, Mean, Min, Max
+from petl.transform.sorts import sort
+
+
+def window(table, partition_by, order_by, functions, presorted=False,
+           reverse=False, buffersize=None, tempdir=None, cache=True):
+    """Add fields computed by window functions over the rows of each
+    partition, in the order given by `order_by`. E.g.::
+
+        >>> import petl as etl
+        >>> from collections import OrderedDict
+        >>> from petl.aggregators import Sum, Mean
+        >>> table1 = [['region', 'day', 'sales'],
+        ...           ['east', 1, 10],
+        ...           ['west', 1, 5],
+        ...           ['east', 2, 30],
+        ...           ['east', 3, 20],
+        ...           ['west', 2, 5]]
+        >>> functions = OrderedDict()
+        >>> functions['total'] = etl.cumulative('sales', Sum())
+        >>> functions['avg2'] = etl.rolling('sales', Mean(), preceding=1)
+        >>> functions['prev'] = etl.lag('sales')
+        >>> functions['next'] = etl.lead('sales', default=0)
+        >>> functions['rank'] = etl.rank()
+        >>> table2 = etl.window(table1, 'region', 'sales', functions)
+        >>> table2
+        +--------+-----+-------+-------+------+------+------+------+
+        | region | day | sales | total | avg2 | prev | next | rank |
+        +========+=====+=======+=======+======+======+======+======+
+        | 'east' |   1 |    10 |    10 | 10.0 | None |   20 |    1 |
+        +--------+-----+-------+-------+------+------+------+------+
+        | 'east' |   3 |    20 |    30 | 15.0 |   10 |   30 |    2 |
+        +--------+-----+-------+-------+------+------+------+------+
+        | 'east' |   2 |    30 |    60 | 25.0 |   20 |    0 |    3 |
+        +--------+-----+-------+-------+------+------+------+------+
+        | 'west' |   1 |     5 |     5 |  5.0 | None |    5 |    1 |
+        +--------+-----+-------+-------+------+------+------+------+
+        | 'west' |   2 |     5 |    10 |  5.0 |    5 |    0 |    1 |
+        +--------+-----+-------+-------+------+------+------+------+
+
+    The `functions` are given as a dictionary or a list of (output field,
+    window function) pairs, where window functions are constructed with
+    :func:`rolling`, :func:`cumulative`, :func:`rownumber`, :func:`rank`,
+    :func:`denserank`, :func:`lag` and :func:`lead`. The output fields are
+    added after the fields of `table`.
+
+    Rows are partitioned by the `partition_by` field or fields, and ordered
+    within each partition by the `order_by` field or fields, either of which
+    may be `None`. The table is sorted by `partition_by` then `order_by`
+    (see :func:`petl.transform.sorts.sort` for the `reverse`, `buffersize`,
+    `tempdir` and `cache` arguments), unless `presorted` is True. Each
+    partition is then read once, holding in memory only as many rows as the
+    functions look ahead, and the values within the frames of
+    :func:`rolling` functions.
+
+    """
+
+    return WindowView(table, partition_by, order_by, functions,
+                      presorted=presorted, reverse=reverse,
+                      buffersize=buffersize, tempdir=tempdir, cache=cache)
+
+
+Table.window = window
+
+
+def _fieldlist(fields):
+    if fields is None:
+        return []
+    elif isinstance(fields, (list, tuple)):
+        return list(fields)
+    else:
+        return [fields]
+
+
+class WindowView(Table):
+
+    def __init__(self, source, partition_by, order_by, functions,
+                 presorted=False, reverse=False, buffersize=None, tempdir=None,
+                 cache=True):
+        key = _fieldlist(partition_by) + _fieldlist(order_by)
+        if presorted or not key:
+            self.source = source
+        else:
+            self.source = sort(source, key, reverse=reverse,
+                               buffersize=buffersize, tempdir=tempdir,
+                               cache=cache)
+        self.partition_by = partition_by
+        self.order_by = order_by
+        if isinstance(functions, dict):
+            functions = list(functions.items())
+        self.functions = OrderedDict()
+        for outfld, f in functions:
+            if not isinstance(f, WindowFunction):
+                raise ArgumentError('expected a window function for field '
+                                    '%r, found %r' % (outfld, f))
+            self.functions[outfld] = f
+
+    def __iter__(self):
+        return iterwindow(self.source, self.partition_by, self.order_by,
+                          self.functions)
+
+
+def iterwindow(source, partition_by, order_by, functions):
+    it = iter(source)
+    hdr = next(it)
+    yield tuple(hdr) + tuple(functions)
+
+    if order_by is None:
+        getorder = None
+    else:
+        getorder = operator.itemgetter(*asindices(hdr, order_by))
+    factories = [f.evaluator(hdr, getorder) for f in functions.values()]
+    # rows after the current row needed to compute its values
+    lookahead = max([f.lookahead for f in functions.values()] + [0])
+
+    if partition_by is None:
+        partitions = [it]
+    else:
+        getpart = operator.itemgetter(*asindices(hdr, partition_by))
+        partitions = (rows for _, rows in itertools.groupby(it, key=getpart))
+
+    for rows in partitions:
+        evals = [factory() for factory in factories]
+        buf = deque()
+        for row in rows:
+            buf.append(row)
+            if len(buf) > lookahead:
+                yield tuple(buf[0]) + tuple(e(buf) for e in evals)
+                buf.popleft()
+        while buf:
+            yield tuple(buf[0]) + tuple(e(buf) for e in evals)
+            buf.popleft()
+
+
+def _valuegetter(hdr, value):
+    if value is None:
+        flds = list(map(text_type, hdr))
+        return lambda row: Record(row, flds)
+    elif callable(value):
+        flds = list(map(text_type, hdr))
+        return lambda row: value(Record(row, flds))
+    return operator.itemgetter(*asindices(hdr, value))
+
+
+class WindowFunction(object):
+    """Base class for the functions computed by :func:`window`.
+    ``evaluator(hdr, getorder)`` returns a function called at the start of
+    each partition, which returns a function called for each row of the
+    partition in turn with a deque holding the current row followed by up to
+    `lookahead` following rows, and returns the value for the current
+    row."""
+
+    lookahead = 0
+
+    def evaluator(self, hdr, getorder):
+        raise NotImplementedError
+
+
+def rolling(value, aggregation, preceding=0, following=0):
+    """Window function aggregating the `value` field (or fields, or the
+    whole row if `None`, or the result of a function called with each row)
+    for the rows from `preceding` rows before to `following` rows after the
+    current row, within the current partition. If `preceding` is `None`, the
+    frame starts at the first row of the partition.
+
+    The `aggregation` may be an aggregator from :mod:`petl.aggregators` or a
+    function called with an iterator over the values in the frame. For
+    :class:`petl.aggregators.Count`, :class:`petl.aggregators.Sum`,
+    :class:`petl.aggregators.Mean`, :class:`petl.aggregators.Min` and
+    :class:`petl.aggregators.Max`, the result is updated as rows enter and
+    leave the frame, in constant amortised time per row (N.B., so sums of
+    floats may differ in the last digits from adding up the frame). Other
+    aggregators are recomputed from the values in the frame for each row, or
+    updated with each row if `preceding` is `None`. Functions are always
+    called with every value in the frame, so with `preceding` `None` the
+    values for the partition so far are held in memory.
+
+    """
+
+    return _Rolling(value, aggregation, preceding, following)
+
+
+def cumulative(value, aggregation):
+    """Window function aggregating the `value` field for the rows from the
+    first row of the partition to the current row, i.e., a running
+    aggregation. Equivalent to ``rolling(value, aggregation,
+    preceding=None)``."""
+
+    return _Rolling(value, aggregation, None, 0)
+
+
+class _Rolling(WindowFunction):
+
+    def __init__(self, value, aggregation, preceding, following):
+        for n in preceding, following:
+            if n is not None and not (isinstance(n, int) and n >= 0):
+                raise ArgumentError('frame bounds must be non-negative '
+                                    'integers, found %r' % n)
+        if following is None:
+            raise ArgumentError('following must be a non-negative integer')
+        self.value = value
+        self.aggregation = aggregation
+        self.preceding = preceding
+        self.following = following
+        self.lookahead = following
+
+    def evaluator(self, hdr, getorder):
+        getvalue = _valuegetter(hdr, self.value)
+        agg = self.aggregation
+        preceding = self.preceding
+        following = self.following
+        if preceding is None and isinstance(agg, Aggregator):
+            frame = lambda: _AggregatorFrame(agg)
+        elif isinstance(agg, (Count, Sum, Mean)):
+            frame = lambda: _SumFrame(agg)
+        elif isinstance(agg, Min):
+            frame = lambda: _ExtremeFrame(operator.gt)
+        elif isinstance(agg, Max):
+            frame = lambda: _ExtremeFrame(operator.lt)
+        else:
+            frame = lambda: _ValuesFrame(agg)
+        return lambda: _RollingEvaluator(getvalue, frame(), preceding,
+                                         following)
+
+
+class _RollingEvaluator(object):
+
+    def __init__(self, getvalue, frame, preceding, following):
+        self.getvalue = getvalue
+        self.frame = frame
+        self.preceding = preceding
+        self.following = following
+        # position of the last row added to the frame relative to the
+        # current row, and number of earlier rows in the frame
+        self.ahead = -1
+        self.behind = 0
+
+    def __call__(self, buf):
+        frame = self.frame
+        end = min(self.following, len(buf) - 1)
+        while self.ahead < end:
+            self.ahead += 1
+            frame.add(self.getvalue(buf[self.ahead]))
+        result = frame.value()
+        # move on to the next row
+        self.ahead -= 1
+        if self.preceding is not None:
+            if self.behind < self.preceding:
+                self.behind += 1
+            else:
+                frame.remove()
+        return result
+
+
+class _AggregatorFrame(object):
+    # frame which only grows, updating an aggregator's state
+
+    def __init__(self, agg):
+        self.agg = agg
+        self.state = agg.init()
+
+    def add(self, v):
+        self.state = self.agg.update(self.state, v)
+
+    def value(self):
+        return self.agg.finalize(self.state)
+
+
+class _SumFrame(object):
+    # count, sum and mean of the values in the frame
+
+    def __init__(self, agg):
+        self.count = isinstance(agg, Count)
+        self.mean = isinstance(agg, Mean)
+        self.values = deque()
+        self.total = 0
+
+    def add(self, v):
+        self.values.append(v)
+        if not self.count:
+            self.total += v
+
+    def remove(self):
+        v = self.values.popleft()
+        if not self.count:
+            self.total -= v
+
+    def value(self):
+        if self.count:
+            return len(self.values)
+        elif self.mean:
+            return self.total / len(self.values)
+        return self.total
+
+
+class _ExtremeFrame(object):
+    # minimum (or maximum) of the values in the frame, using a deque of
+    # values in the frame which are smaller than every later value, so the
+    # front of the deque is the minimum
+
+    def __init__(self, beaten):
+        self.beaten = beaten
+        self.candidates = deque()
+        self.added = 0
+        self.removed = 0
+
+    def add(self, v):
+        candidates = self.candidates
+        beaten = self.beaten
+        while candidates and beaten(candidates[-1][1], v):
+            candidates.pop()
+        candidates.append((self.added, v))
+        self.added += 1
+
+    def remove(self):
+        if self.candidates[0][0] == self.removed:
+            self.candidates.popleft()
+        self.removed += 1
+
+    def value(self):
+        return self.candidates[0][1]
+
+
+class _ValuesFrame(object):
+    # any aggregation, recomputed from all the values in the frame
+
+    def __init__(self, agg):
+        self.agg = agg
+        self.values = deque()
+
+    def add(self, v):
+        self.values.append(v)
+
+    def remove(self):
+        self.values.popleft()
+
+    def value(self):
+        return self.agg(iter(self.values))
+
+
+def rownumber():
+    """Window function numbering the rows of each partition from 1."""
+
+    return _RowNumber()
+
+
+class _RowNumber(WindowFunction):
+
+    def evaluator(self, hdr, getorder):
+        def start():
+            counter = itertools.count(1)
+            return lambda buf: next(counter)
+        return start
+
+
+def rank():
+    """Window function ranking the rows of each partition by the `order_by`
+    fields, where rows with equal values have the same rank, and the rank
+    of the next row counts every row before it, e.g., 1, 2, 2, 4."""
+
+    return _Rank(dense=False)
+
+
+def denserank():
+    """Window function ranking the rows of each partition by the `order_by`
+    fields without gaps, e.g., 1, 2, 2, 3."""
+
+    return _Rank(dense=True)
+
+
+class _Rank(WindowFunction):
+
+    def __init__(self, dense):
+        self.dense = dense
+
+    def evaluator(self, hdr, getorder):
+        if getorder is None:
+            # without an order every row ties
+            return lambda: (lambda buf: 1)
+        return lambda: _RankEvaluator(getorder, self.dense)
+
+
+class _RankEvaluator(object):
+
+    def __init__(self, getorder, dense):
+        self.getorder = getorder
+        self.dense = dense
+        self.n = 0
+        self.rank = 0
+        self.prev = None
+
+    def __call__(self, buf):
+        k = self.getorder(buf[0])
+        self.n += 1
+        if self.n == 1 or k != self.prev:
+            self.rank = self.rank + 1 if self.dense else self.n
+            self.prev = k
+        return self.rank
+
+
+def lag(value, offset=1, default=None):
+    """Window function giving the `value` field of the row `offset` rows
+    before the current row in the partition, or `default` if there is no
+    such row."""
+
+    return _Lag(value, offset, default)
+
+
+class _Lag(WindowFunction):
+
+    def __init__(self, value, offset, default):
+        if not (isinstance(offset, int) and offset >= 1):
+            raise ArgumentError('offset must be a positive integer, found %r'
+                                % offset)
+        self.value = value
+        self.offset = offset
+        self.default = default
+
+    def evaluator(self, hdr, getorder):
+        getvalue = _valuegetter(hdr, self.value)
+        offset = self.offset
+        default = self.default
+
+        def start():
+            history = deque(maxlen=offset)
+
+            def evaluate(buf):
+                result = history[0] if len(history) == offset else default
+                history.append(getvalue(buf[0]))
+                return result
+
+            return evaluate
+
+        return start
+
+
+def lead(value, offset=1, default=None):
+    """Window function giving the `value` field of the row `offset` rows
+    after the current row in the partition, or `default` if there is no
+    such row."""
+
+    return _Lead(value, offset, default)
+
+
+class _Lead(WindowFunction):
+
+    def __init__(self, value, offset, default):
+        if not (isinstance(offset, int) and offset >= 1):
+            raise ArgumentError('offset must be a positive integer, found %r'
+                                % offset)
+        self.value = value
+        self.offset = offset
+        self.default = default
+        self.lookahead = offset
+
+    def evaluator(self, hdr, getorder):
+        getvalue = _valuegetter(hdr, self.value)
+        offset = self.offset
+        default = self.default
+
+        def evaluate(buf):
+            if len(buf) > offset:
+                return getvalue(buf[offset])
+            return default
+
+        return lambda: evaluate
@@ -5,7 +5,7 @@ from petl.util.base import Table, Record, values, header, data, \
     fieldnames, records, dicts, namedtuples, expr, rowgroupby, empty, wrap
 
 from petl.util.lookups import lookup, lookupone, dictlookup, dictlookupone, \
-    recordlookup, recordlookupone
+    recordlookup, recordlookupone, DiskDict
 
 from petl.util.parsers import dateparser, timeparser, datetimeparser, \
     numparser, boolparser
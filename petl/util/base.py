@@ -554,6 +554,10 @@ class Record(tuple):
         self.flds = flds
         self.missing = missing
 
+    def __reduce__(self):
+        # N.B., pickle the fields too, e.g., for a DiskDict
+        return Record, (tuple(self), self.flds, self.missing)
+
     def __getitem__(self, f):
         if isinstance(f, int):
             idx = f
@@ -698,33 +702,25 @@ def rowgroupby(table, key, value=None):
     # wrap rows as records
     it = (Record(row, flds) for row in it)
 
-    # determine key function
+    # determine key function, N.B., grouping only needs equality, which is
+    # the same whether or not values are wrapped as Comparable
     if callable(key):
         getkey = key
-        native_key = True
     else:
         kindices = asindices(hdr, key)
-        getkey = comparable_itemgetter(*kindices)
-        native_key = False
+        getkey = operator.itemgetter(*kindices)
 
     git = groupby(it, key=getkey)
     if value is None:
-        if native_key:
-            return git
-        else:
-            return ((k.inner, vals) for (k, vals) in git)
+        return git
     else:
         if callable(value):
             getval = value
         else:
             vindices = asindices(hdr, value)
             getval = operator.itemgetter(*vindices)
-        if native_key:
-            return ((k, (getval(v) for v in vals))
-                    for (k, vals) in git)
-        else:
-            return ((k.inner, (getval(v) for v in vals))
-                    for (k, vals) in git)
+        return ((k, (getval(v) for v in vals))
+                for (k, vals) in git)
 
 
 Table.rowgroupby = rowgroupby
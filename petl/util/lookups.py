@@ -1,12 +1,23 @@
 from __future__ import absolute_import, print_function, division
 
 
+import os
+import sqlite3
 import operator
-from petl.compat import text_type
-
-
-from petl.errors import DuplicateKeyError
+import tempfile
+import numbers
+from decimal import Decimal
+from collections import OrderedDict
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+from petl.compat import text_type, pickle, BytesIO
+
+
+from petl.errors import DuplicateKeyError, ArgumentError
 from petl.util.base import Table, asindices, asdict, Record, rowgetter
+import petl.config as config
 
 
 def _setup_lookup(table, key, value):
@@ -379,3 +390,227 @@ def recordlookupone(table, key, dictionary=None, strict=False):
 
 
 Table.recordlookupone = recordlookupone
+
+
+def _normkey(key):
+    # a key which is equal to the given key and pickles to the same bytes as
+    # any other equal key, as far as possible, e.g., 1, 1.0 and True are all
+    # 1, so keys match as they would in a dict
+    if isinstance(key, tuple):
+        return tuple(_normkey(k) for k in key)
+    if isinstance(key, numbers.Integral):
+        return int(key)
+    if isinstance(key, (numbers.Real, Decimal)):
+        try:
+            if key == int(key):
+                return int(key)
+        except (OverflowError, ValueError):
+            pass  # infinite or nan
+        try:
+            f = float(key)
+        except (OverflowError, ValueError):
+            return key
+        if f == key:
+            return f
+    return key
+
+
+def _dumpkey(key):
+    # N.B., memoization is turned off so that equal keys always pickle to the
+    # same bytes, whether or not they contain repeated objects
+    f = BytesIO()
+    p = pickle.Pickler(f, 2)
+    p.fast = True
+    p.dump(_normkey(key))
+    return f.getvalue()
+
+
+def _loadvalue(b):
+    return pickle.loads(bytes(b))
+
+
+_absent = object()
+
+
+class DiskDict(MutableMapping):
+    """Dictionary-like object storing its items in an SQLite database file,
+    for use as the `dictionary` argument to functions such as
+    :func:`petl.util.lookups.lookup` where the lookup would not fit in
+    memory. E.g.::
+
+        >>> import petl as etl
+        >>> table1 = [['foo', 'bar'],
+        ...           ['a', 1],
+        ...           ['b', 2],
+        ...           ['b', 3]]
+        >>> lkp = etl.lookup(table1, 'foo', 'bar',
+        ...                  etl.DiskDict('example.db', flag='n'))
+        >>> lkp.close()
+        >>> lkp = etl.DiskDict('example.db', flag='r')
+        >>> lkp['b']
+        [2, 3]
+        >>> lkp.close()
+
+    Keys and values are pickled. Keys are matched by their pickled form,
+    after numbers equal to an integer are converted to :class:`int` and
+    other numbers equal to a :class:`float` to float, including within
+    tuples, which become plain tuples. So as in a :class:`dict`, ``1``,
+    ``1.0`` and ``True`` are the same key, as are a tuple and a
+    :class:`petl.util.base.Record` with the same values, and iterating over
+    the dictionary gives the converted keys. Otherwise, keys which compare
+    equal but pickle differently are different keys.
+
+    Up to `cachesize` recently used items, including keys found to be
+    missing, are held in memory. Items set are only written to the database
+    when they are evicted from the cache or when :meth:`flush` or
+    :meth:`close` is called, so values built up over many rows, such as the
+    lists in a :func:`petl.util.lookups.lookup`, are written once. Note
+    that, as with :mod:`shelve`, a value must be assigned again for changes
+    to it to be saved. If `cachesize` is `None`, the value of
+    `petl.config.diskdict_cachesize` will be used.
+
+    If `path` is `None` the database is written to a temporary file in
+    `tempdir`, which is deleted when the dictionary is closed. Otherwise the
+    database is kept, and can be opened again later. The `flag` argument
+    is 'c' to open the database, creating it if it doesn't exist, 'n' to
+    always start with an empty database, or 'r' to open an existing
+    database read-only.
+
+    """
+
+    def __init__(self, path=None, flag='c', cachesize=None, tempdir=None):
+        if flag not in ('c', 'n', 'r'):
+            raise ArgumentError('invalid flag %r' % flag)
+        self.temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix='.db', dir=tempdir)
+            os.close(fd)
+        elif flag == 'r' and not os.path.exists(path):
+            raise ArgumentError('no such database %r' % path)
+        self.path = path
+        self.flag = flag
+        if cachesize is None:
+            cachesize = config.diskdict_cachesize
+        self.cachesize = max(1, cachesize)
+        self._cache = OrderedDict()
+        self._conn = sqlite3.connect(path)
+        self._conn.text_factory = bytes
+        self._conn.execute('PRAGMA synchronous = OFF')
+        if flag == 'n':
+            self._conn.execute('DROP TABLE IF EXISTS items')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS items '
+                           '(key BLOB PRIMARY KEY, value BLOB)')
+        self._conn.commit()
+
+    def __repr__(self):
+        return 'DiskDict(%r, flag=%r)' % (self.path, self.flag)
+
+    def _touch(self, k, entry):
+        cache = self._cache
+        cache.pop(k, None)
+        cache[k] = entry
+        if len(cache) > self.cachesize:
+            # evict the least recently used tenth of the cache in one go, so
+            # writes are batched
+            n = len(cache) - self.cachesize + self.cachesize // 10
+            evicted = [cache.popitem(last=False) for _ in range(n)]
+            dirty = [(k, v) for k, (v, d) in evicted if d]
+            # N.B., only items which were set need writing, so reading a
+            # read-only database can still evict items
+            if dirty:
+                self._write(dirty)
+
+    def _write(self, items):
+        if self.flag == 'r':
+            raise ArgumentError('database is opened read-only')
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO items (key, value) VALUES (?, ?)',
+            ((sqlite3.Binary(k), sqlite3.Binary(pickle.dumps(v, -1)))
+             for k, v in items if v is not _absent)
+        )
+        self._conn.commit()
+
+    def _get(self, k):
+        entry = self._cache.get(k)
+        if entry is None:
+            row = self._conn.execute('SELECT value FROM items WHERE key = ?',
+                                     (sqlite3.Binary(k),)).fetchone()
+            value = _absent if row is None else _loadvalue(row[0])
+            entry = [value, False]
+        self._touch(k, entry)
+        return entry[0]
+
+    def __getitem__(self, key):
+        value = self._get(_dumpkey(key))
+        if value is _absent:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._get(_dumpkey(key)) is not _absent
+
+    def __setitem__(self, key, value):
+        if self.flag == 'r':
+            raise ArgumentError('database is opened read-only')
+        self._touch(_dumpkey(key), [value, True])
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        k = _dumpkey(key)
+        self._touch(k, [_absent, False])
+        self._conn.execute('DELETE FROM items WHERE key = ?',
+                           (sqlite3.Binary(k),))
+        self._conn.commit()
+
+    def __iter__(self):
+        self.flush()
+        for row in self._conn.execute('SELECT key FROM items'):
+            yield _loadvalue(row[0])
+
+    def __len__(self):
+        self.flush()
+        return self._conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def __bool__(self):
+        self.flush()
+        return self._conn.execute('SELECT 1 FROM items LIMIT 1').fetchone() \
+            is not None
+
+    __nonzero__ = __bool__
+
+    def flush(self):
+        """Write any items set since the last flush to the database."""
+
+        dirty = [(k, entry[0]) for k, entry in self._cache.items()
+                 if entry[1]]
+        if dirty:
+            self._write(dirty)
+            for k, _ in dirty:
+                self._cache[k][1] = False
+
+    def close(self):
+        """Write any items not yet written and close the database, deleting
+        it if it is temporary."""
+
+        if self._conn is None:
+            return
+        if self.flag != 'r':
+            self.flush()
+        self._conn.close()
+        self._conn = None
+        self._cache.clear()
+        if self.temporary:
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass